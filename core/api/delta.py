@@ -0,0 +1,302 @@
+"""
+Quill Delta operations for page content.
+
+A Delta is a list of ops, each one of {'insert': text or embed}, {'retain': n} or
+{'delete': n}, optionally with 'attributes'. A document is a Delta made only of
+inserts. Lengths are counted in UTF-16 code units like Quill and Flutter Quill do,
+so offsets sent by the editor line up with the stored text.
+"""
+
+import json
+import re
+from difflib import SequenceMatcher
+
+INFINITY = float('inf')
+
+
+class InvalidDelta(ValueError):
+    pass
+
+
+def utf16_length(text):
+    return len(text.encode('utf-16-le', 'surrogatepass')) // 2
+
+
+def utf16_slice(text, start, end):
+    encoded = text.encode('utf-16-le', 'surrogatepass')
+    return encoded[start * 2:end * 2].decode('utf-16-le', 'surrogatepass')
+
+
+def op_length(op):
+    if 'delete' in op:
+        return op['delete']
+    if 'retain' in op:
+        return op['retain']
+    if isinstance(op.get('insert'), str):
+        return utf16_length(op['insert'])
+    return 1 if 'insert' in op else 0
+
+
+def op_type(op):
+    if op is None or 'retain' in op:
+        return 'retain'
+    return 'delete' if 'delete' in op else 'insert'
+
+
+def document_ops(content):
+    """The ops of stored page content, which is either a list of ops or {'ops': [...]}"""
+    if isinstance(content, dict):
+        content = content.get('ops')
+    if isinstance(content, list):
+        return [op for op in content if isinstance(op, dict) and 'insert' in op]
+    return []
+
+
+def with_ops(content, ops):
+    """New page content holding ops, in the same shape as content"""
+    if isinstance(content, dict):
+        return dict(content, ops=ops)
+    return ops
+
+
+def validate_ops(ops):
+    """Check that ops is a well-formed Delta made of plain retains, deletes and inserts"""
+    if not isinstance(ops, list):
+        raise InvalidDelta("ops must be a list")
+    for op in ops:
+        if not isinstance(op, dict):
+            raise InvalidDelta(f"Invalid op: {op!r}")
+        kinds = [kind for kind in ('insert', 'retain', 'delete') if kind in op]
+        if len(kinds) != 1:
+            raise InvalidDelta(f"Op must have exactly one of insert, retain or delete: {op!r}")
+        kind = kinds[0]
+        value = op[kind]
+        if kind == 'insert':
+            if not isinstance(value, (str, dict)) or value == '':
+                raise InvalidDelta(f"Insert must be non-empty text or an embed: {op!r}")
+        elif isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise InvalidDelta(f"{kind.capitalize()} must be a positive integer: {op!r}")
+        if 'attributes' in op and (kind == 'delete' or not isinstance(op['attributes'], dict)):
+            raise InvalidDelta(f"Invalid attributes: {op!r}")
+        if set(op) - {kind, 'attributes'}:
+            raise InvalidDelta(f"Unknown op keys: {op!r}")
+
+
+def document_length(ops):
+    return sum(op_length(op) for op in ops)
+
+
+def base_length(ops):
+    """How long a document must be for this change to apply to it"""
+    return sum(op_length(op) for op in ops if 'insert' not in op)
+
+
+def length_change(ops):
+    """How much this change grows (or shrinks) the document"""
+    return sum(op_length(op) for op in ops if 'insert' in op) - sum(op['delete'] for op in ops if 'delete' in op)
+
+
+class OpIterator:
+    def __init__(self, ops):
+        self.ops = ops
+        self.index = 0
+        self.offset = 0
+
+    def has_next(self):
+        return self.peek_length() < INFINITY
+
+    def peek(self):
+        return self.ops[self.index] if self.index < len(self.ops) else None
+
+    def peek_length(self):
+        op = self.peek()
+        return op_length(op) - self.offset if op is not None else INFINITY
+
+    def peek_type(self):
+        return op_type(self.peek())
+
+    def next(self, length=INFINITY):
+        op = self.peek()
+        if op is None:
+            return {'retain': INFINITY}
+
+        offset = self.offset
+        remaining = op_length(op) - offset
+        if length >= remaining:
+            length = remaining
+            self.index += 1
+            self.offset = 0
+        else:
+            self.offset += length
+
+        if 'delete' in op:
+            return {'delete': length}
+        result = {}
+        if 'retain' in op:
+            result['retain'] = length
+        elif isinstance(op['insert'], str):
+            result['insert'] = utf16_slice(op['insert'], offset, offset + length)
+        else:
+            result['insert'] = op['insert']
+        if op.get('attributes'):
+            result['attributes'] = op['attributes']
+        return result
+
+    def rest(self):
+        if not self.has_next():
+            return []
+        if self.offset == 0:
+            return self.ops[self.index:]
+        return [self.next()] + self.ops[self.index:]
+
+
+def compose_attributes(first, second, keep_null):
+    attributes = dict(second or {})
+    if not keep_null:
+        attributes = {key: value for key, value in attributes.items() if value is not None}
+    for key, value in (first or {}).items():
+        if value is not None and key not in (second or {}):
+            attributes[key] = value
+    return attributes or None
+
+
+def push(ops, new_op):
+    """Append an op, merging it into the previous one where Quill would"""
+    new_op = dict(new_op)
+    index = len(ops)
+    last_op = ops[-1] if ops else None
+    if last_op is not None:
+        if 'delete' in new_op and 'delete' in last_op:
+            ops[-1] = {'delete': last_op['delete'] + new_op['delete']}
+            return
+        # Inserts always go before a trailing delete
+        if 'delete' in last_op and 'insert' in new_op:
+            index -= 1
+            last_op = ops[index - 1] if index > 0 else None
+            if last_op is None:
+                ops.insert(0, new_op)
+                return
+        if new_op.get('attributes') == last_op.get('attributes'):
+            merged = None
+            if isinstance(new_op.get('insert'), str) and isinstance(last_op.get('insert'), str):
+                merged = {'insert': last_op['insert'] + new_op['insert']}
+            elif 'retain' in new_op and 'retain' in last_op:
+                merged = {'retain': last_op['retain'] + new_op['retain']}
+            if merged is not None:
+                if new_op.get('attributes'):
+                    merged['attributes'] = new_op['attributes']
+                ops[index - 1] = merged
+                return
+    ops.insert(index, new_op)
+
+
+def chop(ops):
+    if ops and 'retain' in ops[-1] and not ops[-1].get('attributes'):
+        ops.pop()
+    return ops
+
+
+def compose(first, second):
+    """Apply Delta second on top of Delta first, as quill-delta's Delta.compose does"""
+    this_iter = OpIterator(first)
+    other_iter = OpIterator(second)
+    ops = []
+
+    # Skip straight past the unchanged start of the document
+    first_other = other_iter.peek()
+    if first_other is not None and 'retain' in first_other and not first_other.get('attributes'):
+        first_left = first_other['retain']
+        while this_iter.peek_type() == 'insert' and this_iter.peek_length() <= first_left:
+            first_left -= this_iter.peek_length()
+            ops.append(this_iter.next())
+        if first_other['retain'] - first_left > 0:
+            other_iter.next(first_other['retain'] - first_left)
+
+    while this_iter.has_next() or other_iter.has_next():
+        if other_iter.peek_type() == 'insert':
+            push(ops, other_iter.next())
+        elif this_iter.peek_type() == 'delete':
+            push(ops, this_iter.next())
+        else:
+            length = min(this_iter.peek_length(), other_iter.peek_length())
+            this_op = this_iter.next(length)
+            other_op = other_iter.next(length)
+            if 'retain' in other_op:
+                new_op = {}
+                if 'retain' in this_op:
+                    new_op['retain'] = length
+                else:
+                    new_op['insert'] = this_op['insert']
+                attributes = compose_attributes(
+                    this_op.get('attributes'), other_op.get('attributes'), 'retain' in this_op
+                )
+                if attributes:
+                    new_op['attributes'] = attributes
+                push(ops, new_op)
+
+                # The rest of the document is untouched
+                if not other_iter.has_next() and ops[-1] == new_op:
+                    for op in this_iter.rest():
+                        push(ops, op)
+                    return chop(ops)
+            elif 'delete' in other_op and 'retain' in this_op:
+                push(ops, other_op)
+            # Otherwise other deletes something this inserted and they cancel out
+
+    return chop(ops)
+
+
+def diff_tokens(ops):
+    """
+    Split a document into lines (and embeds) for diffing, each with a key that
+    compares equal only for identical text and attributes.
+    """
+    tokens = []
+    for op in ops:
+        attributes = op.get('attributes') or {}
+        attributes_key = json.dumps(attributes, sort_keys=True)
+        insert = op['insert']
+        pieces = [piece for piece in re.split(r'(\n)', insert) if piece] if isinstance(insert, str) else [insert]
+        for piece in pieces:
+            token_op = {'insert': piece}
+            if attributes:
+                token_op['attributes'] = attributes
+            key = piece if isinstance(piece, str) else json.dumps(piece, sort_keys=True)
+            tokens.append(((key, isinstance(piece, str), attributes_key), token_op))
+    return tokens
+
+
+def diff(first, second):
+    """
+    A change that turns document first into document second. Works line by line,
+    so an edit inside a line is stored as that line replaced.
+    """
+    first_tokens = diff_tokens(first)
+    second_tokens = diff_tokens(second)
+    matcher = SequenceMatcher(
+        None, [key for key, _ in first_tokens], [key for key, _ in second_tokens], autojunk=False
+    )
+
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            push(ops, {'retain': document_length(op for _, op in first_tokens[i1:i2])})
+            continue
+        for _, op in second_tokens[j1:j2]:
+            push(ops, op)
+        if i2 > i1:
+            push(ops, {'delete': document_length(op for _, op in first_tokens[i1:i2])})
+    return chop(ops)
+
+
+def normalize(ops):
+    """Canonical form of a document: adjacent inserts with equal attributes merged"""
+    return compose([], ops)
+
+
+def apply(document, change):
+    """Apply a change to a document, refusing changes that don't fit it"""
+    result = compose(document, change)
+    if any('insert' not in op for op in result):
+        raise InvalidDelta("Change does not fit the document")
+    return result
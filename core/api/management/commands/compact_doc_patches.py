@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from api.models import Doc
+
+class Command(BaseCommand):
+    help = 'Fold pending Quill Delta patches into the stored page bodies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-pending', type=int, default=1, help='Only compact pages with at least this many pending patches')
+
+    def handle(self, *args, **options):
+        pages = (
+            Doc.objects.annotate(pending=F('version') - F('content_version'))
+            .filter(pending__gte=max(options['min_pending'], 1))
+            .only('id')
+        )
+
+        compacted = 0
+        for page in pages.iterator():
+            page.compact()
+            compacted += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} pages"))
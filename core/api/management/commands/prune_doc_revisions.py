@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from api.models import DocRevision
+
+class Command(BaseCommand):
+    help = 'Cap stored page history: keep only the newest revisions of each page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=100, help='Revisions to keep per page')
+
+    def handle(self, *args, **options):
+        keep = max(options['keep'], 1)
+        crowded = (
+            DocRevision.objects.values('doc_id')
+            .annotate(revisions=Count('id'))
+            .filter(revisions__gt=keep)
+            .values_list('doc_id', flat=True)
+        )
+
+        deleted_total = 0
+        for doc_id in crowded:
+            with transaction.atomic():
+                versions = list(
+                    DocRevision.objects.filter(doc_id=doc_id)
+                    .order_by('-version').values_list('version', flat=True)[:keep]
+                )
+                oldest_kept = DocRevision.objects.select_for_update().get(doc_id=doc_id, version=versions[-1])
+
+                # The oldest revision left has to stand on its own, so turn it into a snapshot
+                if not oldest_kept.is_snapshot:
+                    oldest_kept.ops = DocRevision.materialize(oldest_kept.doc_id, oldest_kept.version)
+                    oldest_kept.is_snapshot = True
+                    oldest_kept.chain_length = 0
+                    oldest_kept.save(update_fields=['ops', 'is_snapshot', 'chain_length'])
+
+                deleted, _ = DocRevision.objects.filter(doc_id=doc_id, version__lt=oldest_kept.version).delete()
+                deleted_total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted_total} old page revisions, keeping {keep} per page"))
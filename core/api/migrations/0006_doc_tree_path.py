@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_tree_paths(apps, schema_editor):
+    Doc = apps.get_model('api', 'Doc')
+
+    parents = dict(Doc.objects.values_list('id', 'parent_id'))
+    placed = {}
+
+    def place(doc_id):
+        if doc_id not in placed:
+            parent_id = parents[doc_id]
+            if parent_id is None:
+                placed[doc_id] = (f"{doc_id}/", 0)
+            else:
+                parent_path, parent_depth = place(parent_id)
+                placed[doc_id] = (f"{parent_path}{doc_id}/", parent_depth + 1)
+        return placed[doc_id]
+
+    docs = list(Doc.objects.only('id'))
+    for doc in docs:
+        doc.path, doc.depth = place(doc.id)
+    Doc.objects.bulk_update(docs, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_doc_parent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doc',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doc',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='doc',
+            index=models.Index(fields=['path'], name='doc_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='doc',
+            index=models.Index(fields=['owner', 'path'], name='doc_owner_path_idx'),
+        ),
+        migrations.RunPython(backfill_tree_paths, migrations.RunPython.noop),
+    ]
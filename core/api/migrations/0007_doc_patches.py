@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of the api.delta helpers, so later changes there can't alter this migration
+def document_ops(content):
+    if isinstance(content, dict):
+        content = content.get('ops')
+    if isinstance(content, list):
+        return [op for op in content if isinstance(op, dict) and 'insert' in op]
+    return []
+
+
+def document_length(ops):
+    """Length in UTF-16 code units, like Quill counts it; embeds count as one"""
+    length = 0
+    for op in ops:
+        insert = op['insert']
+        length += len(insert.encode('utf-16-le', 'surrogatepass')) // 2 if isinstance(insert, str) else 1
+    return length
+
+
+def backfill_content_length(apps, schema_editor):
+    Doc = apps.get_model('api', 'Doc')
+
+    docs = []
+    for doc in Doc.objects.only('id', 'content').iterator():
+        doc.content_length = document_length(document_ops(doc.content))
+        docs.append(doc)
+    Doc.objects.bulk_update(docs, ['content_length'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_doc_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doc',
+            name='content_length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doc',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doc',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='DocPatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('ops', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doc', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patches', to='api.doc')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doc', 'version'), name='unique_doc_patch_version')],
+            },
+        ),
+        migrations.RunPython(backfill_content_length, migrations.RunPython.noop),
+    ]
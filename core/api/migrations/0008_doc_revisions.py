@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_doc_patches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('chain_length', models.PositiveSmallIntegerField(default=0)),
+                ('ops', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doc', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='api.doc')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doc', 'version'), name='unique_doc_revision_version')],
+            },
+        ),
+    ]
@@ -13,19 +13,287 @@
 #     def __str__(self):
 #         return self.title
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Concat, Substr
+from django.dispatch import Signal
+from django.utils import timezone
 from accounts.models import CustomUser  # Import the custom user model
+from .delta import (
+    InvalidDelta, apply, base_length, compose, diff, document_length, document_ops, length_change,
+    normalize, validate_ops, with_ops,
+)
+import json
+
+# Sent with the page as `instance` after compact() folds patches into its body,
+# which doesn't go through save()
+page_compacted = Signal()
+
+class VersionConflict(Exception):
+    """A change was made against a version of the page that is no longer current"""
+    def __init__(self, version):
+        super().__init__(f"Page is at version {version}")
+        self.version = version
 
 class Doc(models.Model):
+    # Deepest level a page may sit at; top-level pages are at depth 0
+    MAX_DEPTH = 5
+    # Pending patches are folded into the stored body once this many pile up
+    COMPACT_AFTER = 50
+
     title = models.CharField(max_length=200)
     # Use JSONField to store the Delta JSON data from Flutter Quill.
     content = models.JSONField(blank=True, null=True)
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True)  # Link to CustomUser
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subpages')  # Self-reference for parent-child relationship
+    # Materialized path: the ids from the top-level page down to this one, e.g. "3/17/42/".
+    # A page's subtree is every page whose path starts with its own. Maintained by save().
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Every content change bumps version. content holds the body as of content_version;
+    # the DocPatch rows after it are applied on read until compact() folds them in.
+    version = models.PositiveIntegerField(default=0, editable=False)
+    content_version = models.PositiveIntegerField(default=0, editable=False)
+    # Length of the current document (UTF-16 units), so patches can be checked without loading it
+    content_length = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Prefix (LIKE 'path%') lookups for subtrees
+            models.Index(fields=['path'], name='doc_path_idx', opclasses=['varchar_pattern_ops']),
+            # A user's whole tree in path order
+            models.Index(fields=['owner', 'path'], name='doc_owner_path_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored parent so save() can tell when the page moved
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        if creating:
+            self.content_length = document_length(document_ops(self.content))
+        if not creating and self.path and self.parent_id == getattr(self, '_loaded_parent_id', self.parent_id):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.place_in_tree(creating)
+            if creating:
+                ops = document_ops(self.content)
+                DocRevision.record(self, self.version, ops, ops)
+
+    def place_in_tree(self, creating=False):
+        """
+        Recompute this page's path and depth from its parent and carry its subtree
+        along with a single UPDATE.
+        """
+        parent = None
+        if self.parent_id is not None:
+            parent = Doc.objects.only('path', 'depth').get(pk=self.parent_id)
+        new_path = (parent.path if parent else '') + f"{self.pk}/"
+        new_depth = parent.depth + 1 if parent else 0
+
+        old_path = self.path
+        if creating or not old_path:
+            Doc.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        else:
+            Doc.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                depth=F('depth') + (new_depth - self.depth),
+            )
+
+        self.path = new_path
+        self.depth = new_depth
+        self._loaded_parent_id = self.parent_id
+
+    def subtree(self):
+        """This page and everything below it"""
+        return Doc.objects.filter(path__startswith=self.path)
+
+    def descendants(self):
+        return self.subtree().exclude(pk=self.pk)
+
+    def is_ancestor_of(self, other):
+        """True if other is this page or sits anywhere below it"""
+        return other.path.startswith(self.path)
+
+    def subtree_height(self):
+        """How many levels of pages sit below this one"""
+        deepest = self.subtree().aggregate(deepest=Max('depth'))['deepest']
+        return (deepest or self.depth) - self.depth
+
+    @classmethod
+    def tree_for(cls, owner):
+        """All of a user's pages in path order, so every parent comes before its children"""
+        return cls.objects.filter(owner=owner).order_by('path')
+
+    def pending_patches(self):
+        return self.patches.filter(version__gt=self.content_version).order_by('version')
+
+    def current_content(self):
+        """The page body with any pending patches applied"""
+        if self.version == self.content_version:
+            return self.content
+        ops = document_ops(self.content)
+        for patch in self.pending_patches():
+            ops = apply(ops, patch.ops)
+        return with_ops(self.content, ops)
+
+    def replace_content(self, content):
+        """
+        Set the whole body, superseding any pending patches. Call inside a transaction
+        and save content, content_length, version and content_version afterwards.
+        """
+        current = Doc.objects.select_for_update().only('version', 'content_version', 'content').get(pk=self.pk)
+        if current.version != current.content_version:
+            # Fold pending patches in first, so the edits they hold get a revision of their own
+            self.compact()
+            current.refresh_from_db(fields=['content'])
+        new_ops = document_ops(content)
+        DocRevision.record(self, current.version + 1, diff(document_ops(current.content), new_ops), new_ops)
+
+        self.content = content
+        self.content_length = document_length(document_ops(content))
+        self.version = current.version + 1
+        self.content_version = self.version
+        self.patches.all().delete()
+
+    @classmethod
+    def apply_patch(cls, pk, owner, base_version, ops):
+        """
+        Record a Quill Delta change made against base_version and return the new version.
+
+        Only the change and a few counters are written, so the cost follows the size of
+        the edit rather than of the document. Raises VersionConflict when the page has
+        moved on since base_version and InvalidDelta when the change doesn't fit it.
+        """
+        validate_ops(ops)
+        with transaction.atomic():
+            doc = cls.objects.select_for_update().only(
+                'id', 'version', 'content_version', 'content_length'
+            ).get(pk=pk, owner=owner)
+            if base_version != doc.version:
+                raise VersionConflict(doc.version)
+            if base_length(ops) > doc.content_length:
+                raise InvalidDelta("Change does not fit the document")
+
+            doc.version += 1
+            doc.content_length += length_change(ops)
+            DocPatch.objects.create(doc=doc, version=doc.version, ops=ops)
+            cls.objects.filter(pk=pk).update(
+                version=doc.version,
+                content_length=doc.content_length,
+                updated_at=timezone.now(),
+            )
+
+            if doc.version - doc.content_version >= cls.COMPACT_AFTER:
+                doc.compact()
+        return doc.version
+
+    def compact(self):
+        """Fold pending patches into the stored body in canonical form and drop them"""
+        with transaction.atomic():
+            doc = Doc.objects.select_for_update().get(pk=self.pk)
+            if doc.version == doc.content_version:
+                return
+
+            ops = document_ops(doc.content)
+            change = []
+            for patch in doc.pending_patches():
+                ops = apply(ops, patch.ops)
+                change = compose(change, patch.ops)
+            ops = normalize(ops)
+            DocRevision.record(doc, doc.version, change, ops)
+
+            Doc.objects.filter(pk=doc.pk).update(
+                content=with_ops(doc.content, ops),
+                content_version=doc.version,
+                content_length=document_length(ops),
+            )
+            doc.patches.filter(version__lte=doc.version).delete()
+
+            doc.refresh_from_db()
+            page_compacted.send(sender=Doc, instance=doc)
+
+
+class DocPatch(models.Model):
+    """A Quill Delta change to a page that hasn't been folded into its body yet"""
+    doc = models.ForeignKey(Doc, on_delete=models.CASCADE, related_name='patches')
+    version = models.PositiveIntegerField()  # The page version this change produced
+    ops = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doc', 'version'], name='unique_doc_patch_version'),
+        ]
+
+    def __str__(self):
+        return f"Patch {self.version} of page {self.doc_id}"
+
+
+class DocRevision(models.Model):
+    """
+    A saved state of a page body. Revisions form chains: a full snapshot followed by
+    deltas that each apply on top of the revision before, so rebuilding any revision
+    reads one snapshot and at most SNAPSHOT_EVERY - 1 deltas.
+    """
+    SNAPSHOT_EVERY = 20
+
+    doc = models.ForeignKey(Doc, on_delete=models.CASCADE, related_name='revisions')
+    version = models.PositiveIntegerField()  # The page version this revision captures
+    is_snapshot = models.BooleanField(default=False)
+    # Deltas since the last snapshot, including this one (0 for a snapshot)
+    chain_length = models.PositiveSmallIntegerField(default=0)
+    # The whole document for a snapshot, otherwise the change from the previous revision
+    ops = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doc', 'version'], name='unique_doc_revision_version'),
+        ]
+
+    def __str__(self):
+        return f"Revision {self.version} of page {self.doc_id}"
+
+    @classmethod
+    def record(cls, doc, version, change, document):
+        """
+        Store a new revision of doc: the change from its previous revision, or a full
+        snapshot when the chain is long enough or the change isn't smaller than the document.
+        """
+        last = cls.objects.filter(doc=doc).only('chain_length').order_by('-version').first()
+        if last is None or last.chain_length + 1 >= cls.SNAPSHOT_EVERY or len(json.dumps(change)) >= len(json.dumps(document)):
+            return cls.objects.create(doc=doc, version=version, is_snapshot=True, chain_length=0, ops=document)
+        return cls.objects.create(doc=doc, version=version, chain_length=last.chain_length + 1, ops=change)
+
+    @classmethod
+    def materialize(cls, doc, version):
+        """The document ops of doc at a recorded version; raises DoesNotExist otherwise"""
+        snapshot = (
+            cls.objects.filter(doc=doc, version__lte=version, is_snapshot=True)
+            .order_by('-version').first()
+        )
+        if snapshot is None:
+            raise cls.DoesNotExist
+        deltas = list(
+            cls.objects.filter(doc=doc, version__gt=snapshot.version, version__lte=version, is_snapshot=False)
+            .order_by('version')
+        )
+        if snapshot.version != version and (not deltas or deltas[-1].version != version):
+            raise cls.DoesNotExist
 
+        ops = snapshot.ops
+        for delta in deltas:
+            ops = apply(ops, delta.ops)
+        return ops
@@ -8,10 +8,12 @@
 #         read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
 
 from rest_framework import serializers
+from django.db import transaction
 import json
 from .models import Doc
+from core.serializers import SparseFieldsMixin
 
-class PageSerializer(serializers.ModelSerializer):
+class PageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Define content as a JSONField with custom handling
     content = serializers.JSONField(required=False)
     parent_id = serializers.IntegerField(required=False, allow_null=True, write_only=True)
@@ -19,36 +21,46 @@ class PageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Doc
-        fields = ['id', 'title', 'content', 'owner', 'parent', 'parent_id', 'subpages', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'owner', 'created_at', 'updated_at', 'subpages']
+        fields = ['id', 'title', 'content', 'owner', 'parent', 'parent_id', 'depth', 'version', 'subpages', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'owner', 'depth', 'version', 'created_at', 'updated_at', 'subpages']
 
     def get_subpages(self, instance):
         """Get direct subpages of this page"""
-        # Get direct subpages
-        subpages = instance.subpages.all().order_by('-created_at')
+        # Get direct subpages; list and detail views prefetch them already ordered
+        subpages = instance.subpages.all()
+        if 'subpages' not in getattr(instance, '_prefetched_objects_cache', {}):
+            subpages = subpages.order_by('-created_at')
         # Return minimal data for each subpage to avoid recursion issues
         return [{'id': subpage.id, 'title': subpage.title} for subpage in subpages]
 
+    def get_requested_fields(self):
+        requested = super().get_requested_fields()
+        # Page lists leave out content unless it is asked for with ?fields=
+        if requested is None and self.context.get('omit_content'):
+            requested = set(self.Meta.fields) - {'content'}
+        return requested
+
     def to_representation(self, instance):
         """Add parent_id to the serialized data for the frontend"""
         data = super().to_representation(instance)
-        # Add parent_id field for the frontend
-        data['parent_id'] = instance.parent.id if instance.parent else None
+        # Add parent_id field for the frontend (unless ?fields= left it out)
+        if 'parent_id' in self.fields:
+            data['parent_id'] = instance.parent_id
 
-        # Debug the content field
+        # Debug the page (content is left out so lists that defer it don't load it)
         print(f"Serializing page: ID={instance.id}, Title='{instance.title}'")
-        print(f"Content type: {type(instance.content)}")
-        print(f"Content (truncated): {str(instance.content)[:100] if instance.content else 'None'}")
 
-        # Ensure content is properly serialized
-        if instance.content is not None:
+        # Ensure content is properly serialized, including patches not yet folded in
+        content = instance.current_content() if 'content' in data else None
+        if content is not None:
+            data['content'] = content
             # If content is already a string, leave it as is
-            if isinstance(instance.content, str):
+            if isinstance(content, str):
                 print("Content is already a string, keeping as is")
             # If content is a dict, convert it to a JSON string
-            elif isinstance(instance.content, dict):
+            elif isinstance(content, dict):
                 print("Content is a dict, converting to JSON string")
-                data['content'] = json.dumps(instance.content)
+                data['content'] = json.dumps(content)
 
         return data
 
@@ -91,11 +103,19 @@ class PageSerializer(serializers.ModelSerializer):
                 # Don't set parent if it doesn't exist
                 pass
 
-        # Update the instance with the remaining validated data
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        with transaction.atomic():
+            # Only write the columns that changed, so renames and moves don't rewrite the body
+            update_fields = ['updated_at']
+            if 'content' in validated_data:
+                instance.replace_content(validated_data.pop('content'))
+                update_fields += ['content', 'content_length', 'version', 'content_version']
+
+            # Update the instance with the remaining validated data
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+                update_fields.append(attr)
 
-        instance.save()
+            instance.save(update_fields=update_fields)
         return instance
 
     def create(self, validated_data):
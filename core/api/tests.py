@@ -1,3 +1,217 @@
-from django.test import TestCase
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from .delta import InvalidDelta, apply, compose, diff, document_length, utf16_length
+from .models import Doc, DocPatch, DocRevision
 
-# Create your tests here.
+
+def text(ops):
+    return ''.join(op['insert'] for op in ops)
+
+
+class DeltaTests(SimpleTestCase):
+    def test_lengths_are_utf16_code_units(self):
+        # Emoji outside the BMP take two units, like in Quill
+        self.assertEqual(utf16_length('a😀b'), 4)
+        self.assertEqual(document_length([{'insert': 'a😀'}, {'insert': {'image': 'x.png'}}]), 4)
+
+    def test_offsets_after_astral_characters(self):
+        document = [{'insert': '😀 hi\n'}]
+        self.assertEqual(text(apply(document, [{'retain': 3}, {'insert': 'oh '}])), '😀 oh hi\n')
+        self.assertEqual(text(apply(document, [{'retain': 2}, {'delete': 1}])), '😀hi\n')
+
+    def test_compose_keeps_attributes(self):
+        composed = compose([{'insert': 'Hello\n'}], [{'retain': 5, 'attributes': {'bold': True}}])
+        self.assertEqual(composed, [{'insert': 'Hello', 'attributes': {'bold': True}}, {'insert': '\n'}])
+
+    def test_changes_that_do_not_fit_are_rejected(self):
+        with self.assertRaises(InvalidDelta):
+            apply([{'insert': 'abc\n'}], [{'retain': 10}, {'insert': 'x'}])
+        with self.assertRaises(InvalidDelta):
+            apply([{'insert': 'abc\n'}], [{'retain': 2}, {'delete': 5}])
+
+    def test_diff_turns_one_document_into_the_other(self):
+        first = [{'insert': 'one\ntwo\n'}, {'insert': 'three', 'attributes': {'bold': True}}, {'insert': '\n'}]
+        second = [{'insert': 'one\n2\n'}, {'insert': 'three', 'attributes': {'italic': True}}, {'insert': '\nfour\n'}]
+        self.assertEqual(apply(first, diff(first, second)), compose([], second))
+
+
+class DocPatchTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='writer@example.com', full_name='Writer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.page = Doc.objects.create(owner=self.user, title='Notes', content=[{'insert': 'hello\n'}])
+
+    def patch(self, base_version, ops):
+        return self.client.patch(
+            f'/pages/{self.page.pk}/delta/', {'base_version': base_version, 'ops': ops}, format='json'
+        )
+
+    def test_patch_is_stored_and_read_back_while_pending(self):
+        response = self.patch(0, [{'retain': 5}, {'insert': ' world'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 1)
+
+        self.page.refresh_from_db()
+        self.assertEqual((self.page.version, self.page.content_version, self.page.content_length), (1, 0, 12))
+        # The stored body is untouched until compaction; reads apply the pending patch
+        self.assertEqual(self.page.content, [{'insert': 'hello\n'}])
+        self.assertEqual(self.client.get(f'/pages/{self.page.pk}/content/').json(), [{'insert': 'hello world\n'}])
+        self.assertEqual(self.client.get(f'/pages/{self.page.pk}/').data['content'], [{'insert': 'hello world\n'}])
+
+    def test_stale_base_version_conflicts(self):
+        self.patch(0, [{'insert': 'a'}])
+        response = self.patch(0, [{'insert': 'b'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(DocPatch.objects.count(), 1)
+
+    def test_changes_that_do_not_fit_are_refused(self):
+        self.assertEqual(self.patch(0, [{'retain': 7}, {'insert': 'x'}]).status_code, 400)
+        self.assertEqual(self.patch(0, [{'retain': 0}]).status_code, 400)
+        self.assertEqual(self.patch(0, 'not ops').status_code, 400)
+        self.assertEqual(self.client.patch(f'/pages/{self.page.pk}/delta/', {'ops': []}, format='json').status_code, 400)
+        self.assertFalse(DocPatch.objects.exists())
+
+    def test_patches_are_compacted(self):
+        for version in range(Doc.COMPACT_AFTER):
+            self.assertEqual(self.patch(version, [{'insert': 'x'}]).status_code, 200)
+
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.version, Doc.COMPACT_AFTER)
+        self.assertEqual(self.page.content_version, Doc.COMPACT_AFTER)
+        self.assertEqual(self.page.content, [{'insert': 'x' * Doc.COMPACT_AFTER + 'hello\n'}])
+        self.assertFalse(DocPatch.objects.exists())
+
+    def test_other_users_pages_are_not_found(self):
+        other = CustomUser.objects.create_user(email='other@example.com', full_name='Other')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.patch(0, [{'insert': 'x'}]).status_code, 404)
+
+
+class DocRevisionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='historian@example.com', full_name='Historian')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.page = Doc.objects.create(owner=self.user, title='Notes', content=[{'insert': 'hello\n'}])
+
+    def put(self, content):
+        return self.client.put(f'/pages/{self.page.pk}/', {'title': 'Notes', 'content': content}, format='json')
+
+    def revision_text(self, version):
+        return text(self.client.get(f'/pages/{self.page.pk}/revisions/{version}/').data['content'])
+
+    def test_replacing_content_keeps_pending_edits_in_history(self):
+        self.client.patch(
+            f'/pages/{self.page.pk}/delta/', {'base_version': 0, 'ops': [{'retain': 5}, {'insert': ' world'}]}, format='json'
+        )
+        self.assertEqual(self.put([{'insert': 'goodbye\n'}]).status_code, 200)
+
+        versions = [revision['version'] for revision in self.client.get(f'/pages/{self.page.pk}/revisions/').data]
+        self.assertEqual(versions, [2, 1, 0])
+        self.assertEqual(self.revision_text(0), 'hello\n')
+        self.assertEqual(self.revision_text(1), 'hello world\n')
+        self.assertEqual(self.revision_text(2), 'goodbye\n')
+        self.assertFalse(DocPatch.objects.exists())
+
+    def test_revisions_rebuild_across_snapshots(self):
+        body = 'line\n' * 30
+        self.page = Doc.objects.create(owner=self.user, title='Notes', content=[{'insert': body}])
+        for version in range(1, DocRevision.SNAPSHOT_EVERY + 5):
+            body = f'{version}\n' + body
+            self.assertEqual(self.put([{'insert': body}]).status_code, 200)
+
+        revisions = DocRevision.objects.filter(doc=self.page)
+        self.assertEqual(list(revisions.filter(is_snapshot=True).values_list('version', flat=True)), [0, DocRevision.SNAPSHOT_EVERY])
+        for version in (0, 1, DocRevision.SNAPSHOT_EVERY - 1, DocRevision.SNAPSHOT_EVERY, DocRevision.SNAPSHOT_EVERY + 4):
+            self.assertTrue(DocRevision.materialize(self.page, version)[0]['insert'].startswith(f'{version}\n' if version else 'line'))
+        with self.assertRaises(DocRevision.DoesNotExist):
+            DocRevision.materialize(self.page, DocRevision.SNAPSHOT_EVERY + 5)
+
+    def test_pruning_keeps_the_newest_revisions_rebuildable(self):
+        body = 'line\n' * 30
+        self.page = Doc.objects.create(owner=self.user, title='Notes', content=[{'insert': body}])
+        for version in range(1, 8):
+            body = f'{version}\n' + body
+            self.put([{'insert': body}])
+        expected = {version: DocRevision.materialize(self.page, version) for version in (5, 6, 7)}
+
+        call_command('prune_doc_revisions', keep=3, stdout=StringIO())
+
+        revisions = DocRevision.objects.filter(doc=self.page).order_by('version')
+        self.assertEqual(list(revisions.values_list('version', 'is_snapshot')), [(5, True), (6, False), (7, False)])
+        for version, ops in expected.items():
+            self.assertEqual(DocRevision.materialize(self.page, version), ops)
+
+
+class PageTreeTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='gardener@example.com', full_name='Gardener')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, title, parent=None):
+        return Doc.objects.create(owner=self.user, title=title, parent=parent, content=[])
+
+    def move(self, page, parent):
+        return self.client.put(f'/pages/{page.pk}/', {'title': page.title, 'parent_id': parent.pk}, format='json')
+
+    def placement(self, page):
+        page.refresh_from_db()
+        return page.path, page.depth
+
+    def test_moving_a_page_carries_its_subtree(self):
+        home, archive = self.page('Home'), self.page('Archive')
+        project = self.page('Project', home)
+        notes = self.page('Notes', project)
+        draft = self.page('Draft', notes)
+
+        self.assertEqual(self.move(project, archive).status_code, 200)
+
+        self.assertEqual(self.placement(project), (f'{archive.pk}/{project.pk}/', 1))
+        self.assertEqual(self.placement(notes), (f'{archive.pk}/{project.pk}/{notes.pk}/', 2))
+        self.assertEqual(self.placement(draft), (f'{archive.pk}/{project.pk}/{notes.pk}/{draft.pk}/', 3))
+        self.assertEqual(self.placement(home), (f'{home.pk}/', 0))
+        self.assertEqual(list(archive.descendants().order_by('depth')), [project, notes, draft])
+
+    def test_moves_past_the_maximum_depth_are_refused(self):
+        chain = [self.page('Level 0')]
+        for depth in range(1, Doc.MAX_DEPTH + 1):
+            chain.append(self.page(f'Level {depth}', chain[-1]))
+        subtree = self.page('Subtree')
+        self.page('Child', subtree)
+
+        # The page itself would fit at the deepest level's parent, but its child wouldn't
+        response = self.move(subtree, chain[Doc.MAX_DEPTH - 1])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.placement(subtree), (f'{subtree.pk}/', 0))
+        self.assertEqual(self.move(subtree, chain[Doc.MAX_DEPTH - 2]).status_code, 200)
+
+    def test_pages_cannot_move_under_themselves(self):
+        top = self.page('Top')
+        middle = self.page('Middle', top)
+        bottom = self.page('Bottom', middle)
+
+        self.assertEqual(self.move(top, bottom).status_code, 400)
+        self.assertEqual(self.move(top, top).status_code, 400)
+        self.assertEqual(self.placement(top), (f'{top.pk}/', 0))
+        self.assertEqual(self.placement(bottom), (f'{top.pk}/{middle.pk}/{bottom.pk}/', 2))
+
+    def test_tree_etag_ignores_content_edits(self):
+        page = self.page('Journal')
+        self.page('Monday', page)
+        response = self.client.get('/pages/tree/')
+        self.assertEqual([node['title'] for node in response.data[0]['children']], ['Monday'])
+        etag = response['ETag']
+
+        self.client.patch(f'/pages/{page.pk}/delta/', {'base_version': 0, 'ops': [{'insert': 'Dear diary\n'}]}, format='json')
+        self.assertEqual(self.client.get('/pages/tree/', headers={'If-None-Match': etag}).status_code, 304)
+
+        self.client.put(f'/pages/{page.pk}/', {'title': 'Diary'}, format='json')
+        renamed = self.client.get('/pages/tree/', headers={'If-None-Match': etag})
+        self.assertEqual(renamed.status_code, 200)
+        self.assertNotEqual(renamed['ETag'], etag)
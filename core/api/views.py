@@ -22,19 +22,167 @@
 
 
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, TextField
+from django.db.models.functions import Cast
+from django.http import Http404, HttpResponse
+from django.utils.http import http_date, parse_etags, quote_etag
+import hashlib
 import json
-from .models import Doc
+from .delta import InvalidDelta, with_ops
+from .models import Doc, DocRevision, VersionConflict
 from .serializers import PageSerializer
 
+# Only the structure: content edits bump updated_at and mustn't invalidate the tree's ETag
+TREE_FIELDS = ('id', 'title', 'parent_id', 'depth')
+
+def build_page_tree(rows):
+    """
+    Nest flat page rows into a list of top-level pages, each with a `children`
+    list. Siblings are newest first, like the page list.
+    """
+    nodes = {row['id']: dict(row, children=[]) for row in rows}
+    roots = []
+    for node in sorted(nodes.values(), key=lambda node: node['id'], reverse=True):
+        parent = nodes.get(node['parent_id'])
+        (parent['children'] if parent else roots).append(node)
+    return roots
+
 class PageViewSet(viewsets.ModelViewSet):
     serializer_class = PageSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         print(f"Current user: {self.request.user}")  # Debugging line
-        return Doc.objects.filter(owner=self.request.user).order_by('-created_at')
+        # Subpage links for every page in the response come from one extra query
+        subpages = Doc.objects.only('id', 'title', 'parent_id').order_by('-created_at')
+        queryset = Doc.objects.filter(owner=self.request.user).prefetch_related(
+            Prefetch('subpages', queryset=subpages)
+        ).order_by(*self.ordering)
+        if self.omit_content():
+            queryset = queryset.defer('content')
+        return queryset
+
+    def omit_content(self):
+        """
+        Lists don't carry page bodies, so their cost doesn't grow with document size.
+        Clients load a page's content from its detail or content endpoint, or ask for
+        it in the list with ?fields=...,content.
+        """
+        if self.action != 'list':
+            return False
+        fields = self.request.query_params.get('fields', '')
+        return 'content' not in {name.strip() for name in fields.split(',')}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['omit_content'] = self.omit_content()
+        return context
+
+    @action(detail=True, methods=['get'])
+    def content(self, request, pk=None):
+        """
+        The page's Quill Delta exactly as stored, passed through as JSON text without
+        being decoded and re-encoded. Honours If-None-Match against the page version.
+        """
+        row = (
+            Doc.objects.filter(owner=request.user, pk=pk)
+            .annotate(raw_content=Cast('content', output_field=TextField()))
+            .values_list('raw_content', 'version', 'content_version', 'updated_at')
+            .first()
+        )
+        if row is None:
+            raise Http404
+        raw_content, version, content_version, updated_at = row
+
+        etag = quote_etag(f"{pk}-{version}")
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif version != content_version:
+            # Patches not yet folded into the stored body have to be applied first
+            content = Doc.objects.get(pk=pk).current_content()
+            response = HttpResponse(json.dumps(content), content_type='application/json')
+        else:
+            response = HttpResponse(raw_content or 'null', content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(updated_at.timestamp())
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """
+        The user's whole page hierarchy for the sidebar, nested and without page
+        content, from a single query. Sends an ETag that only renames, moves,
+        creates and deletes change, and answers a matching If-None-Match with 304.
+        """
+        rows = list(Doc.tree_for(request.user).values(*TREE_FIELDS))
+        body = json.dumps(rows, cls=DjangoJSONEncoder, sort_keys=True)
+        etag = quote_etag(hashlib.sha1(body.encode()).hexdigest())
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(build_page_tree(rows), headers=headers)
+
+    @action(detail=True, methods=['patch'])
+    def delta(self, request, pk=None):
+        """
+        Apply a Quill Delta change to the page's content.
+
+        Expects {"base_version": <version the change was made against>, "ops": [...]}
+        and returns the new version. If the page has changed since base_version the
+        change is refused with 409 and the current version, so the editor can reload
+        or rebase and retry.
+        """
+        base_version = request.data.get('base_version')
+        if isinstance(base_version, bool) or not isinstance(base_version, int):
+            return Response({"error": "base_version is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            version = Doc.apply_patch(pk, request.user, base_version, request.data.get('ops'))
+        except Doc.DoesNotExist:
+            raise Http404
+        except VersionConflict as e:
+            return Response(
+                {"error": "Page has changed since base_version", "version": e.version},
+                status=status.HTTP_409_CONFLICT
+            )
+        except InvalidDelta as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"id": int(pk), "version": version})
+
+    @action(detail=True, methods=['get'])
+    def revisions(self, request, pk=None):
+        """The page's saved revisions, newest first, without their content"""
+        page = self.get_object()
+        revisions = page.revisions.order_by('-version').values('version', 'is_snapshot', 'created_at')
+        return Response(list(revisions))
+
+    @action(detail=True, methods=['get'], url_path=r'revisions/(?P<version>\d+)')
+    def revision(self, request, pk=None, version=None):
+        """The page content as it was at one of its revisions"""
+        page = self.get_object()
+        try:
+            ops = DocRevision.materialize(page, int(version))
+        except DocRevision.DoesNotExist:
+            return Response({"error": "Revision not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        created_at = page.revisions.filter(version=version).values_list('created_at', flat=True).first()
+        return Response({
+            "id": page.id,
+            "version": int(version),
+            "created_at": created_at,
+            "content": with_ops(page.content, ops),
+        })
 
     def create(self, request, *args, **kwargs):
         print(f"Creating page for user: {request.user}")
@@ -51,19 +199,12 @@ class PageViewSet(viewsets.ModelViewSet):
                     print(f"Found parent page with ID: {parent.id}, title: {parent.title}")
 
                     # Check if this would create a deeper nesting than allowed
-                    nesting_level = 1  # Start with this new page
-                    current_parent = parent
-                    max_nesting = 5  # Maximum allowed nesting level
-
-                    while current_parent.parent is not None:
-                        nesting_level += 1
-                        if nesting_level > max_nesting:
-                            print(f"Error: Maximum nesting level ({max_nesting}) exceeded")
-                            return Response(
-                                {"error": f"Maximum nesting level ({max_nesting}) exceeded"},
-                                status=status.HTTP_400_BAD_REQUEST
-                            )
-                        current_parent = current_parent.parent
+                    if parent.depth + 1 > Doc.MAX_DEPTH:
+                        print(f"Error: Maximum nesting level ({Doc.MAX_DEPTH}) exceeded")
+                        return Response(
+                            {"error": f"Maximum nesting level ({Doc.MAX_DEPTH}) exceeded"},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
 
                 except Doc.DoesNotExist:
                     print(f"Parent page with ID {parent_id} not found or doesn't belong to user")
@@ -130,20 +271,23 @@ class PageViewSet(viewsets.ModelViewSet):
                     parent = Doc.objects.get(id=parent_id, owner=request.user)
                     print(f"Found parent page with ID: {parent.id}, title: {parent.title}")
 
-                    # Check if this would create a deeper nesting than allowed
-                    nesting_level = 1  # Start with this page
-                    current_parent = parent
-                    max_nesting = 5  # Maximum allowed nesting level
-
-                    while current_parent.parent is not None:
-                        nesting_level += 1
-                        if nesting_level > max_nesting:
-                            print(f"Error: Maximum nesting level ({max_nesting}) exceeded")
+                    # Moving a page under one of its own subpages would detach a cycle
+                    if instance.is_ancestor_of(parent):
+                        print("Error: Circular reference detected - page cannot be moved under its own subpage")
+                        return Response(
+                            {"error": "A page cannot be moved under one of its own subpages"},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
+                    # Check if this would create a deeper nesting than allowed, counting
+                    # the pages that move along with this one
+                    if parent.id != instance.parent_id:
+                        if parent.depth + 1 + instance.subtree_height() > Doc.MAX_DEPTH:
+                            print(f"Error: Maximum nesting level ({Doc.MAX_DEPTH}) exceeded")
                             return Response(
-                                {"error": f"Maximum nesting level ({max_nesting}) exceeded"},
+                                {"error": f"Maximum nesting level ({Doc.MAX_DEPTH}) exceeded"},
                                 status=status.HTTP_400_BAD_REQUEST
                             )
-                        current_parent = current_parent.parent
 
                 except Doc.DoesNotExist:
                     print(f"Parent page with ID {parent_id} not found or doesn't belong to user")
@@ -0,0 +1,112 @@
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination used by every list endpoint.
+
+    Pagination is opt-in so existing clients that expect a plain list keep working:
+    a list is paginated once the request carries `page_size` or `cursor`, and the
+    response then has the usual {"next", "previous", "results"} shape. Pages are
+    fetched with WHERE (<ordering fields>) < <position> instead of OFFSET, so the
+    cost of a page does not depend on how deep into the list it is.
+
+    Views choose the keyset with an `ordering` attribute (a field, or a tuple of
+    fields); the primary key is used otherwise. The ordering must be unique, so a
+    tuple ends with the primary key, e.g. ('-created_at', '-id'). The cursor holds
+    every field of the ordering, unlike DRF's, which keeps only the first and
+    pages through rows sharing it by offset.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-pk'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (False, None) if self.cursor is None else (self.cursor.reverse, self.cursor.position)
+
+        # A reverse cursor reads backwards from its position, for previous pages
+        ordering = [reverse_field(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(after_position(ordering, self.parse_position(position)))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        self.current_position = position
+        self.display_page_controls = (self.has_previous or self.has_next) and self.template is not None
+        return self.page
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.page_size_query_param in params or self.cursor_query_param in params
+
+    def get_ordering(self, request, queryset, view):
+        view_ordering = getattr(view, 'ordering', None)
+        if view_ordering:
+            return (view_ordering,) if isinstance(view_ordering, str) else tuple(view_ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.current_position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.current_position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def parse_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(None if value is None else str(value))
+        return json.dumps(values, separators=(',', ':'))
+
+
+def reverse_field(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def after_position(ordering, values):
+    """
+    Rows that come after `values` in `ordering`: the row-value comparison
+    (a, b, c) > (x, y, z) spelled out as a OR (a = x AND b) OR ..., per direction.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
@@ -0,0 +1,39 @@
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+
+class SparseFieldsMixin:
+    """
+    Let clients ask for a subset of a serializer's fields with `?fields=id,title`.
+
+    Only applies to the top-level serializer of a read request, so nested
+    serializers and writes are unaffected. Dropped fields are never evaluated,
+    which also skips the work behind expensive SerializerMethodFields.
+    """
+    fields_query_param = 'fields'
+
+    @cached_property
+    def fields(self):
+        fields = super().fields
+        requested = self.get_requested_fields()
+        if requested:
+            for name in set(fields) - requested:
+                fields.pop(name)
+        return fields
+
+    def get_requested_fields(self):
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+
+        # With many=True the serializer's parent is the ListSerializer for the response
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None
+
+        value = request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+        return {name.strip() for name in value.split(',') if name.strip()}
@@ -50,10 +50,31 @@ INSTALLED_APPS = [
     'notifications.apps.NotificationsConfig',
     'work',
     'project_tasks', # Add the new project tasks app
+    'search',
     'rest_framework_nested', # Add nested routers back
 ]
 
 ASGI_APPLICATION = 'core.asgi.application'
+
+# Channel layer used to push notifications to connected WebSocket clients.
+# The in-memory layer only works within a single process; use channels_redis
+# (BACKEND 'channels_redis.core.RedisChannelLayer') when running several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Cache for calendar month listings (events/cache.py). Like the channel layer, the
+# local-memory cache is per process; use a shared one (BACKEND
+# 'django.core.cache.backends.redis.RedisCache') when running several workers so
+# an event change invalidates every worker's copy.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+CALENDAR_MONTH_CACHE_TIMEOUT = 60 * 60 * 24
 # JWT Authentication settings
 # REST_FRAMEWORK = {
 #     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -68,6 +89,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Keyset pagination for list endpoints, enabled per request with ?page_size= or ?cursor=
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetCursorPagination',
 }
 
 
@@ -123,6 +146,10 @@ DATABASES = {
     }
 }
 
+# Search backend; picked from the database when unset (PostgreSQL full-text search,
+# otherwise the in-process index in search.backends.memory)
+# SEARCH_BACKEND = 'search.backends.memory.InMemoryBackend'
+
 
 
 # Password validation
@@ -174,6 +201,10 @@ import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Threads generating diary image thumbnails in each web process (see diary/thumbnails.py);
+# 0 generates them inline once the upload commits
+DIARY_THUMBNAIL_WORKERS = 2
+
 # CORS Settings - Maximum permissiveness for development
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from diary.models import DiaryImage, ImageBlob
+from diary.thumbnails import THUMBNAIL_SIZES, THUMBNAIL_DIR
+
+class Command(BaseCommand):
+    help = 'Delete diary image blobs that no image references any more, optionally moving older images into blobs first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=60, help='Only delete blobs unreferenced for at least this many minutes')
+        parser.add_argument('--adopt', action='store_true', help='Move images stored before deduplication into blobs, removing duplicate files')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be done')
+
+    def handle(self, *args, **options):
+        if options['adopt']:
+            self.adopt(options['dry_run'])
+
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        unreferenced = ImageBlob.objects.filter(ref_count=0, images__isnull=True).filter(
+            Q(released_at__lt=cutoff) | Q(released_at__isnull=True, created_at__lt=cutoff)
+        )
+
+        if options['dry_run']:
+            rows = list(unreferenced.values_list('sha256', 'size'))
+            self.stdout.write(f"Would delete {len(rows)} blobs ({sum(size for _, size in rows)} bytes)")
+            return
+
+        with transaction.atomic():
+            # A blob picked up by an upload in the meantime has a reference again and is skipped
+            blobs = list(unreferenced.select_for_update(skip_locked=True, of=('self',)).filter(ref_count=0))
+            ImageBlob.objects.filter(pk__in=[blob.pk for blob in blobs], ref_count=0).delete()
+
+        # Files go only after their rows, so a failure here leaves stray files rather than broken images
+        for blob in blobs:
+            default_storage.delete(blob.file.name)
+            for width in THUMBNAIL_SIZES:
+                default_storage.delete(f"{THUMBNAIL_DIR}{blob.sha256}_{width}.webp")
+
+        freed = sum(blob.size for blob in blobs)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {len(blobs)} blobs, freeing {freed} bytes"))
+
+    def adopt(self, dry_run):
+        """Hash images that own their file and point them at the shared blob instead"""
+        adopted = 0
+        for image in DiaryImage.objects.filter(blob__isnull=True).iterator():
+            old_name = image.image.name
+            if not old_name or not default_storage.exists(old_name):
+                self.stdout.write(self.style.WARNING(f"Image {image.pk}: file {old_name!r} is missing"))
+                continue
+            if dry_run:
+                adopted += 1
+                continue
+
+            with transaction.atomic(), default_storage.open(old_name, 'rb') as file:
+                blob = ImageBlob.store(file)
+                DiaryImage.objects.filter(pk=image.pk).update(blob=blob, image=blob.file.name)
+            if old_name != blob.file.name:
+                default_storage.delete(old_name)
+            adopted += 1
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(f"{verb} {adopted} images into blobs")
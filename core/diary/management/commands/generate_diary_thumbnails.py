@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from diary.models import DiaryImage
+from diary.thumbnails import generate_thumbnails, thumbnail_jobs
+
+class Command(BaseCommand):
+    help = 'Generate WebP thumbnails for diary images that are missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry images whose thumbnails failed before')
+        parser.add_argument('--all', action='store_true', help='Regenerate thumbnails for every image, e.g. after changing the sizes')
+
+    def handle(self, *args, **options):
+        images = DiaryImage.objects.all()
+        if not options['all']:
+            statuses = [DiaryImage.THUMBNAILS_PENDING]
+            if options['retry_failed']:
+                statuses.append(DiaryImage.THUMBNAILS_FAILED)
+            images = images.filter(thumbnail_status__in=statuses)
+
+        ids = list(images.order_by('pk').values_list('pk', flat=True))
+        # Images sharing a blob get their thumbnails from one render
+        for image_id in thumbnail_jobs(ids):
+            generate_thumbnails(image_id, force=options['all'])
+
+        failed = DiaryImage.objects.filter(pk__in=ids, thumbnail_status=DiaryImage.THUMBNAILS_FAILED).count()
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} images could not be thumbnailed"))
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {len(ids) - failed} images"))
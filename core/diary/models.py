@@ -1,7 +1,15 @@
-from django.db import models
+import hashlib
+import os
+import re
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
 from accounts.models import CustomUser
 
+SHA256_RE = re.compile(r'^[0-9a-f]{64}')
+
 
 class Diary(models.Model):
     MOOD_CHOICES = [
@@ -27,15 +35,108 @@ class Diary(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # The timeline: a user's entries newest first, filtered by date range and paged by (date, id)
+            models.Index(fields=['user', '-date', '-id'], name='diary_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date}"
 
 
+class ImageBlob(models.Model):
+    """
+    One stored image file, named by the SHA-256 of its contents so identical uploads
+    share it. ref_count is the number of DiaryImages using it; blobs that drop to zero
+    are removed by `manage.py gc_diary_blobs`.
+    """
+    BLOB_DIR = 'diary_images/blobs/'
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time ref_count dropped to zero, so GC can leave recently freed blobs alone
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.sha256
+
+    @staticmethod
+    def hash_upload(upload):
+        """SHA-256 of an uploaded file, read in the upload handler's chunks"""
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        upload.seek(0)
+        return digest.hexdigest()
+
+    @classmethod
+    def public_name(cls, name):
+        """
+        The name a content-addressed file (a blob or a blob's thumbnail) is served under
+        by the blob view, or None for other files
+        """
+        base = os.path.basename(name)
+        if name.startswith(cls.BLOB_DIR) or (name.startswith(DiaryImage.THUMBNAIL_DIR) and SHA256_RE.match(base)):
+            return base
+        return None
+
+    @classmethod
+    def storage_name(cls, sha256, filename):
+        extension = os.path.splitext(filename)[1].lower()
+        return f"{cls.BLOB_DIR}{sha256[:2]}/{sha256}{extension}"
+
+    @classmethod
+    def store(cls, upload):
+        """
+        The blob holding upload's contents, with a reference taken on it. The file is
+        only written when no blob has these contents yet.
+        """
+        sha256 = cls.hash_upload(upload)
+        with transaction.atomic():
+            # Taking the reference first means GC, which only deletes rows still at zero, can't remove the blob under us
+            if cls.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1, released_at=None):
+                return cls.objects.get(sha256=sha256)
+
+            name = cls.storage_name(sha256, upload.name)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, upload)
+            blob, created = cls.objects.get_or_create(
+                sha256=sha256, defaults={'file': name, 'size': upload.size, 'ref_count': 1}
+            )
+            if not created:
+                # Someone stored the same contents at the same time
+                cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, released_at=None)
+            return blob
+
+    @classmethod
+    def release(cls, blob_id):
+        """Drop one reference to a blob"""
+        cls.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1, released_at=timezone.now())
+
+
 class DiaryImage(models.Model):
+    THUMBNAILS_PENDING = 'pending'
+    THUMBNAILS_READY = 'ready'
+    THUMBNAILS_FAILED = 'failed'
+    THUMBNAIL_STATUS_CHOICES = [
+        (THUMBNAILS_PENDING, 'Pending'),
+        (THUMBNAILS_READY, 'Ready'),
+        (THUMBNAILS_FAILED, 'Failed'),
+    ]
+    THUMBNAIL_DIR = 'diary_images/thumbs/'
+
     diary = models.ForeignKey(Diary, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='diary_images/')
+    image = models.ImageField(upload_to='diary_images/', max_length=255)
+    # Images uploaded before content-addressed storage have no blob and own their file
+    blob = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='images')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Storage names of the WebP thumbnails keyed by their width, e.g. {"320": "diary_images/thumbs/7_320.webp"};
+    # filled in by diary.thumbnails after upload
+    thumbnails = models.JSONField(default=dict, blank=True)
+    thumbnail_status = models.CharField(max_length=10, choices=THUMBNAIL_STATUS_CHOICES, default=THUMBNAILS_PENDING)
 
     def __str__(self):
         return f"Image for {self.diary.title} uploaded on {self.uploaded_at}"
\ No newline at end of file
@@ -1,11 +1,58 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Diary, DiaryImage
+from .models import Diary, DiaryImage, ImageBlob
+from core.serializers import SparseFieldsMixin
+
+def media_url(name, request):
+    """
+    URL of a stored diary file. Content-addressed files go through the blob view,
+    which serves them with immutable cache headers.
+    """
+    public_name = ImageBlob.public_name(name)
+    url = reverse('diary-blob', args=[public_name]) if public_name else default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
 
 class DiaryImageSerializer(serializers.ModelSerializer):
+    # URLs of the WebP thumbnails by width; empty until they have been generated
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = DiaryImage
-        fields = ['id', 'diary', 'image', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at']
+        fields = ['id', 'diary', 'image', 'uploaded_at', 'thumbnails', 'thumbnail_status']
+        read_only_fields = ['id', 'uploaded_at', 'thumbnail_status']
+
+    def get_thumbnails(self, obj):
+        request = self.context.get('request')
+        return {width: media_url(name, request) for width, name in (obj.thumbnails or {}).items()}
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.image and ImageBlob.public_name(instance.image.name):
+            data['image'] = media_url(instance.image.name, self.context.get('request'))
+        return data
+
+    def create(self, validated_data):
+        upload = validated_data.pop('image')
+        with transaction.atomic():
+            blob = ImageBlob.store(upload)
+            return DiaryImage.objects.create(blob=blob, image=blob.file.name, **validated_data)
+
+    def update(self, instance, validated_data):
+        upload = validated_data.pop('image', None)
+        if upload is None:
+            return super().update(instance, validated_data)
+        with transaction.atomic():
+            previous_blob_id = instance.blob_id
+            blob = ImageBlob.store(upload)
+            validated_data.update(
+                blob=blob, image=blob.file.name, thumbnails={}, thumbnail_status=DiaryImage.THUMBNAILS_PENDING
+            )
+            instance = super().update(instance, validated_data)
+            if previous_blob_id is not None:
+                ImageBlob.release(previous_blob_id)
+            return instance
 
 # class DiarySerializer(serializers.ModelSerializer):
 #     images = DiaryImageSerializer(many=True, read_only=True)  # Nested serializer for related images
@@ -30,7 +77,7 @@ class DiaryImageSerializer(serializers.ModelSerializer):
 
     #     return Diary.objects.create(user=user, **validated_data)
 
-class DiarySerializer(serializers.ModelSerializer):
+class DiarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Use a nested serializer for images with many=True, read_only=True, and required=False
     images = DiaryImageSerializer(many=True, read_only=True, required=False)
 
@@ -42,13 +89,6 @@ class DiarySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-    def to_representation(self, instance):
-        """Override to add debugging for title and content"""
-        print(f"Serializing diary entry: ID={instance.id}, Title='{instance.title}', Content='{instance.content[:50]}...'")
-        data = super().to_representation(instance)
-        print(f"Serialized data: {data}")
-        return data
-
     def validate_background_color(self, value):
         if value is None:
             print('Background color is None, defaulting to white')
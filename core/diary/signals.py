@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import DiaryImage, ImageBlob
+
+@receiver(post_delete, sender=DiaryImage)
+def release_image_blob(sender, instance, **kwargs):
+    """
+    Give back a deleted image's reference to its blob, including images removed
+    along with their diary entry. The file itself is left to gc_diary_blobs.
+    """
+    if instance.blob_id is not None:
+        ImageBlob.release(instance.blob_id)
@@ -1,3 +1,263 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from .models import Diary, DiaryImage, ImageBlob
+from .thumbnails import generate_thumbnails, render_thumbnails, thumbnail_names
 
-# Create your tests here.
+
+def image_file(name='photo.jpg', size=(2000, 1500), format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{format.lower()}')
+
+
+@override_settings(DIARY_THUMBNAIL_WORKERS=0)
+class DiaryImageUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = CustomUser.objects.create_user(email='writer@example.com', full_name='Writer')
+        self.diary = Diary.objects.create(user=self.user, title='Holiday', content='', date=date(2024, 8, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, files, diary=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f'/diary/entries/{(diary or self.diary).pk}/images/', {'images': files}, format='multipart'
+            )
+
+    def test_batch_upload_generates_webp_thumbnails(self):
+        response = self.upload([image_file('a.jpg'), image_file('b.png', size=(300, 200), format='PNG')])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+
+        images = list(DiaryImage.objects.filter(diary=self.diary).order_by('pk'))
+        self.assertTrue(all(image.thumbnail_status == DiaryImage.THUMBNAILS_READY for image in images))
+        self.assertEqual(set(images[0].thumbnails), {'320', '640', '1280'})
+        for width, name in images[0].thumbnails.items():
+            with Image.open(images[0].image.storage.open(name)) as thumbnail:
+                self.assertEqual(thumbnail.format, 'WEBP')
+                self.assertEqual(thumbnail.width, int(width))
+        # Small images are never scaled up
+        with Image.open(images[1].image.storage.open(images[1].thumbnails['1280'])) as thumbnail:
+            self.assertEqual(thumbnail.width, 300)
+
+    def test_list_returns_thumbnail_urls(self):
+        self.upload([image_file()])
+        response = self.client.get('/diary/entries/')
+        thumbnails = response.data[0]['images'][0]['thumbnails']
+        self.assertTrue(thumbnails['320'].startswith('http://testserver/diary/blobs/'))
+
+    def test_invalid_file_rejects_the_whole_batch(self):
+        bad = SimpleUploadedFile('notes.jpg', b'not an image', content_type='image/jpeg')
+        response = self.upload([image_file(), bad])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('notes.jpg', response.data['files'])
+        self.assertFalse(DiaryImage.objects.exists())
+
+    def test_cannot_upload_to_another_users_entry(self):
+        other = CustomUser.objects.create_user(email='other@example.com', full_name='Other')
+        entry = Diary.objects.create(user=other, title='Private', content='', date=date(2024, 8, 1))
+        self.assertEqual(self.upload([image_file()], diary=entry).status_code, 404)
+
+
+@override_settings(DIARY_THUMBNAIL_WORKERS=0)
+class ImageBlobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = CustomUser.objects.create_user(email='writer@example.com', full_name='Writer')
+        self.entries = [
+            Diary.objects.create(user=self.user, title=f'Day {i}', content='', date=date(2024, 8, i + 1))
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, diary, *files):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/diary/entries/{diary.pk}/images/', {'images': list(files)}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def test_identical_uploads_share_one_blob(self):
+        self.upload(self.entries[0], image_file('IMG_1.jpg'))
+        self.upload(self.entries[1], image_file('copy of IMG_1.JPG'))
+        self.upload(self.entries[1], image_file('other.jpg', size=(800, 600)))
+
+        first, copy, other = DiaryImage.objects.order_by('pk')
+        self.assertEqual(ImageBlob.objects.count(), 2)
+        self.assertEqual(first.blob_id, copy.blob_id)
+        self.assertEqual(first.image.name, copy.image.name)
+        self.assertEqual(first.thumbnails, copy.thumbnails)
+        self.assertEqual(ImageBlob.objects.get(pk=first.blob_id).ref_count, 2)
+        self.assertNotEqual(other.blob_id, first.blob_id)
+
+    def test_identical_images_in_one_batch_render_once(self):
+        with patch('diary.thumbnails.render_thumbnails', wraps=render_thumbnails) as render:
+            self.upload(self.entries[0], image_file('a.jpg'), image_file('b.jpg'))
+        self.assertEqual(render.call_count, 1)
+
+        first, second = DiaryImage.objects.order_by('pk')
+        names = thumbnail_names(first)
+        self.assertEqual((first.thumbnails, second.thumbnails), (names, names))
+        self.assertEqual(second.thumbnail_status, DiaryImage.THUMBNAILS_READY)
+        storage = first.image.storage
+        self.assertEqual(sorted(storage.listdir(DiaryImage.THUMBNAIL_DIR)[1]), sorted(name.rsplit('/', 1)[1] for name in names.values()))
+
+    def test_thumbnails_written_concurrently_keep_their_names(self):
+        image_id = self.upload(self.entries[0], image_file()).data[0]['id']
+        image = DiaryImage.objects.get(pk=image_id)
+        storage = image.image.storage
+        real_save = storage.save
+
+        def racing_save(name, content):
+            # Another worker stores the same thumbnail between the existence check and the save
+            real_save(name, ContentFile(content.read()))
+            content.seek(0)
+            return real_save(name, content)
+
+        with patch.object(default_storage, 'save', racing_save):
+            generate_thumbnails(image_id, force=True)
+
+        image.refresh_from_db()
+        self.assertEqual(image.thumbnails, thumbnail_names(image))
+        self.assertEqual(len(storage.listdir(DiaryImage.THUMBNAIL_DIR)[1]), len(image.thumbnails))
+
+    def test_replacing_an_image_makes_new_thumbnails(self):
+        image_id = self.upload(self.entries[0], image_file()).data[0]['id']
+        old = DiaryImage.objects.get(pk=image_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/diary/images/{image_id}/', {'image': image_file('new.png', size=(900, 700), format='PNG')}, format='multipart'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        image = DiaryImage.objects.get(pk=image_id)
+        self.assertNotEqual(image.blob_id, old.blob_id)
+        self.assertEqual(image.thumbnail_status, DiaryImage.THUMBNAILS_READY)
+        self.assertEqual(set(image.thumbnails), {'320', '640', '1280'})
+        self.assertNotEqual(image.thumbnails, old.thumbnails)
+        self.assertTrue(all(image.image.storage.exists(name) for name in image.thumbnails.values()))
+
+    def test_gc_removes_blobs_once_unreferenced(self):
+        self.upload(self.entries[0], image_file())
+        self.upload(self.entries[1], image_file())
+        blob = ImageBlob.objects.get()
+        storage = blob.file.storage
+        thumbnail = DiaryImage.objects.first().thumbnails['320']
+
+        self.entries[0].delete()
+        call_command('gc_diary_blobs', '--min-age', '0', stdout=StringIO())
+        self.assertTrue(storage.exists(blob.file.name))
+
+        DiaryImage.objects.get().delete()
+        self.assertEqual(ImageBlob.objects.get().ref_count, 0)
+        call_command('gc_diary_blobs', '--min-age', '0', stdout=StringIO())
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(storage.exists(blob.file.name))
+        self.assertFalse(storage.exists(thumbnail))
+
+    def test_gc_adopts_images_stored_before_deduplication(self):
+        for diary in self.entries:
+            image = DiaryImage(diary=diary)
+            image.image.save('legacy.jpg', image_file())
+        legacy_names = [image.image.name for image in DiaryImage.objects.all()]
+
+        call_command('gc_diary_blobs', '--adopt', stdout=StringIO())
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(set(DiaryImage.objects.values_list('image', flat=True)), {blob.file.name})
+        self.assertFalse(any(blob.file.storage.exists(name) for name in legacy_names))
+
+    def test_blobs_are_served_with_immutable_cache_headers(self):
+        image_id = self.upload(self.entries[0], image_file()).data[0]['id']
+        data = self.client.get(f'/diary/images/{image_id}/').data
+        self.assertIn('/diary/blobs/', data['image'])
+
+        response = self.client.get(data['image'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+        thumbnail = self.client.get(data['thumbnails']['320'])
+        self.assertEqual(thumbnail['Content-Type'], 'image/webp')
+        thumbnail.close()
+
+        revalidated = self.client.get(data['image'], HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(self.client.get('/diary/blobs/not-a-hash.jpg').status_code, 404)
+
+
+class DiaryTimelineTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='writer@example.com', full_name='Writer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_entries(self, days, images_each=2):
+        for day in days:
+            diary = Diary.objects.create(user=self.user, title=f'{day}', content='Notes', date=day)
+            for i in range(images_each):
+                DiaryImage.objects.create(diary=diary, image=f'diary_images/{day}-{i}.jpg')
+
+    def test_list_query_count_is_constant(self):
+        self.create_entries([date(2024, 1, day) for day in range(1, 3)])
+        # Entries, then their images in one prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get('/diary/entries/')
+        self.assertEqual(len(response.data), 2)
+
+        self.create_entries([date(2024, 2, day) for day in range(1, 29)])
+        with self.assertNumQueries(2):
+            response = self.client.get('/diary/entries/')
+        self.assertEqual(len(response.data), 30)
+        self.assertTrue(all(len(entry['images']) == 2 for entry in response.data))
+
+    def test_month_and_year_filters(self):
+        self.create_entries([date(2023, 12, 31), date(2024, 1, 1), date(2024, 1, 31), date(2024, 2, 1)], images_each=0)
+
+        response = self.client.get('/diary/entries/', {'year': 2024, 'month': 1})
+        self.assertEqual([entry['date'] for entry in response.data], ['2024-01-31', '2024-01-01'])
+        response = self.client.get('/diary/entries/', {'year': 2023, 'month': 12})
+        self.assertEqual([entry['date'] for entry in response.data], ['2023-12-31'])
+        response = self.client.get('/diary/entries/', {'year': 2024})
+        self.assertEqual(len(response.data), 3)
+
+        self.assertEqual(self.client.get('/diary/entries/', {'year': 2024, 'month': 13}).status_code, 400)
+        self.assertEqual(self.client.get('/diary/entries/', {'month': 1}).status_code, 400)
+
+    def test_keyset_pages_cover_every_entry_once(self):
+        # Several entries share a day, so pages must not split or repeat them
+        self.create_entries([date(2024, 3, day) for day in (1, 1, 1, 2, 2, 3, 4, 4, 4, 5)], images_each=1)
+
+        seen = []
+        url, params = '/diary/entries/', {'page_size': 3}
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, params)
+            seen += [entry['id'] for entry in response.data['results']]
+            url, params = response.data['next'], None
+        expected = list(Diary.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
@@ -0,0 +1,152 @@
+"""
+WebP thumbnails for diary images.
+
+Thumbnails are made after the upload's transaction commits, on a small thread pool,
+so uploading a batch of photos only costs the time to store the originals.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from .models import DiaryImage
+
+logger = logging.getLogger(__name__)
+
+# Widths of the generated thumbnails; images narrower than a size keep their own width
+THUMBNAIL_SIZES = (320, 640, 1280)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIR = DiaryImage.THUMBNAIL_DIR
+
+_executor = None
+
+
+def thumbnail_workers():
+    """Worker threads for thumbnail generation; 0 makes them inline (tests, scripts)"""
+    return getattr(settings, 'DIARY_THUMBNAIL_WORKERS', 2)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=thumbnail_workers(), thread_name_prefix='diary-thumbnails')
+    return _executor
+
+
+def render_thumbnails(source):
+    """WebP bytes of each thumbnail of an image file, keyed by width"""
+    with Image.open(source) as original:
+        # Phones store rotation in EXIF, which thumbnails would lose
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+        rendered = {}
+        for width in THUMBNAIL_SIZES:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            thumbnail.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+            rendered[str(width)] = buffer.getvalue()
+        return rendered
+
+
+def thumbnail_names(image):
+    """
+    Storage names of an image's thumbnails by width. Thumbnails of a blob are named
+    after its hash and shared by every image using it.
+    """
+    prefix = image.blob.sha256 if image.blob_id is not None else image.pk
+    return {str(width): f"{THUMBNAIL_DIR}{prefix}_{width}.webp" for width in THUMBNAIL_SIZES}
+
+
+def store_thumbnail(name, data, force=False):
+    """
+    Store one thumbnail under exactly the given name. Blob thumbnails are the same
+    bytes whoever renders them, so one written concurrently under the name is kept.
+    """
+    if force and default_storage.exists(name):
+        default_storage.delete(name)
+    if default_storage.exists(name):
+        return
+    saved = default_storage.save(name, ContentFile(data))
+    if saved != name:
+        # Someone else stored it between the check and the save, and the storage
+        # picked another name for ours; that name would never be served or collected
+        default_storage.delete(saved)
+
+
+def generate_thumbnails(image_id, force=False):
+    """
+    Render and store the thumbnails of one DiaryImage, recording the outcome on it and
+    on every other image sharing its blob. Blob thumbnails that already exist are
+    reused unless force is set.
+    """
+    image = DiaryImage.objects.select_related('blob').filter(pk=image_id).first()
+    if image is None:
+        return
+
+    if image.blob_id is not None:
+        images = DiaryImage.objects.filter(blob_id=image.blob_id)
+    else:
+        images = DiaryImage.objects.filter(pk=image_id)
+    names = thumbnail_names(image)
+    shared = image.blob_id is not None and not force and all(default_storage.exists(name) for name in names.values())
+    if shared:
+        images.update(thumbnails=names, thumbnail_status=DiaryImage.THUMBNAILS_READY)
+        return
+
+    try:
+        with image.image.open('rb') as source:
+            rendered = render_thumbnails(source)
+        for width, data in rendered.items():
+            store_thumbnail(names[width], data, force=force)
+    except Exception as e:
+        logger.error(f"Error generating thumbnails for diary image {image_id}: {str(e)}")
+        images.update(thumbnail_status=DiaryImage.THUMBNAILS_FAILED)
+        return
+
+    images.update(thumbnails=names, thumbnail_status=DiaryImage.THUMBNAILS_READY)
+
+
+def _run_in_worker(image_id):
+    try:
+        generate_thumbnails(image_id)
+    finally:
+        # Worker threads hold their own database connection
+        close_old_connections()
+
+
+def thumbnail_jobs(image_ids):
+    """One image per blob among the given ones, plus every image without a blob"""
+    jobs, blobs = [], set()
+    for image_id, blob_id in DiaryImage.objects.filter(pk__in=image_ids).order_by('pk').values_list('pk', 'blob_id'):
+        if blob_id is not None:
+            if blob_id in blobs:
+                continue
+            blobs.add(blob_id)
+        jobs.append(image_id)
+    return jobs
+
+
+def queue_thumbnails(image_ids):
+    """Generate thumbnails for the given images once the current transaction commits"""
+    image_ids = list(image_ids)
+
+    def submit():
+        # Images sharing a blob share its thumbnails; rendering them once keeps
+        # two workers from writing the same files
+        jobs = thumbnail_jobs(image_ids)
+        if thumbnail_workers() == 0:
+            for image_id in jobs:
+                generate_thumbnails(image_id)
+            return
+        executor = get_executor()
+        for image_id in jobs:
+            executor.submit(_run_in_worker, image_id)
+
+    transaction.on_commit(submit)
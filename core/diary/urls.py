@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DiaryViewSet, DiaryImageViewSet
+from .views import DiaryViewSet, DiaryImageViewSet, blob
 
 router = DefaultRouter()
 router.register(r'entries', DiaryViewSet, basename='diary-entry')
 router.register(r'images', DiaryImageViewSet, basename='diary-image')
 
 urlpatterns = [
+    path('blobs/<str:name>', blob, name='diary-blob'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,9 +1,24 @@
 
+import mimetypes
+import re
+from datetime import date
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.views.decorators.http import require_safe
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from .models import Diary, DiaryImage
+from .models import Diary, DiaryImage, ImageBlob
 from .serializers import DiarySerializer, DiaryImageSerializer
+from .thumbnails import queue_thumbnails
+
+# Most files accepted by one batch upload
+MAX_IMAGES_PER_UPLOAD = 20
+
+# Blob and blob thumbnail names as served by the blob view: <sha256>.<ext> and <sha256>_<width>.webp
+BLOB_NAME_RE = re.compile(r'^(?P<sha256>[0-9a-f]{64})(?:_(?P<width>\d+)\.webp|(?P<extension>\.[a-z0-9]+)?)$')
 
 
 class DiaryViewSet(viewsets.ModelViewSet):
@@ -12,24 +27,38 @@ class DiaryViewSet(viewsets.ModelViewSet):
     """
     serializer_class = DiarySerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Keyset for ?cursor= pagination; id breaks ties between entries on the same day
+    ordering = ('-date', '-id')
 
     def get_queryset(self):
         """
-        Returns the list of diaries for the currently authenticated user.
+        Returns the list of diaries for the currently authenticated user, optionally
+        limited to one month (?year=2024&month=5) or year (?year=2024).
         """
-        user = self.request.user
-        print(f"Getting diary entries for user: {user.email}")
-
-        queryset = Diary.objects.filter(user=user)
-        print(f"Found {queryset.count()} diary entries")
-
-        # Debug the first entry if available
-        if queryset.exists():
-            first_entry = queryset.first()
-            print(f"First entry: ID={first_entry.id}, Title='{first_entry.title}', Content='{first_entry.content[:50]}...'")
-
+        queryset = Diary.objects.filter(user=self.request.user).order_by(*self.ordering).prefetch_related('images')
+        if self.action == 'list':
+            queryset = self.filter_by_period(queryset)
         return queryset
 
+    def filter_by_period(self, queryset):
+        params = self.request.query_params
+        if 'year' not in params:
+            if 'month' in params:
+                raise ValidationError({'error': 'month needs a year'})
+            return queryset
+        try:
+            year = int(params['year'])
+            month = int(params['month']) if 'month' in params else None
+            if month is None:
+                start, end = date(year, 1, 1), date(year + 1, 1, 1)
+            else:
+                start = date(year, month, 1)
+                end = date(year + (month == 12), month % 12 + 1, 1)
+        except (ValueError, OverflowError):
+            raise ValidationError({'error': 'year and month must be a valid year and month number'})
+        # A plain range rather than __year/__month so the (user, date) index is used
+        return queryset.filter(date__gte=start, date__lt=end)
+
     def perform_create(self, serializer):
         print("Creating diary with data:", serializer.validated_data)  # Log the data
         try:
@@ -79,6 +108,44 @@ class DiaryViewSet(viewsets.ModelViewSet):
             print(f"Error updating diary: {e}")
             raise
 
+    @action(detail=True, methods=['post'], url_path='images')
+    def upload_images(self, request, pk=None):
+        """
+        Attach several images to an entry in one request.
+
+        POST /diary/entries/{id}/images/ as multipart with one or more `images` files.
+        Thumbnails are generated in the background; the response lists the new images
+        with thumbnail_status "pending".
+        """
+        diary = self.get_object()
+        files = request.FILES.getlist('images')
+        if not files:
+            return Response({'error': 'images is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > MAX_IMAGES_PER_UPLOAD:
+            return Response(
+                {'error': f"At most {MAX_IMAGES_PER_UPLOAD} images can be uploaded at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Check every file before storing any, so a bad file doesn't leave half a batch behind
+        uploads = [
+            DiaryImageSerializer(data={'diary': diary.pk, 'image': upload}, context=self.get_serializer_context())
+            for upload in files
+        ]
+        errors = {upload.name: serializer.errors for upload, serializer in zip(files, uploads) if not serializer.is_valid()}
+        if errors:
+            return Response({'error': 'Invalid images', 'files': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are already on disk and are copied to storage in chunks
+            images = [serializer.save() for serializer in uploads]
+            queue_thumbnails(image.pk for image in images)
+
+        return Response(
+            DiaryImageSerializer(images, many=True, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED
+        )
+
     @action(detail=False, methods=['get'])
     def moods(self, request):
         """
@@ -135,9 +202,52 @@ class DiaryImageViewSet(viewsets.ModelViewSet):
         """
         diary_id = self.request.data.get('diary')
         if not diary_id:
-            return Response({'error': 'Diary ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({'error': 'Diary ID is required'})
         try:
             diary = Diary.objects.get(id=diary_id, user=self.request.user)
         except Diary.DoesNotExist:
-            return Response({'error': 'Diary not found or not owned by the user'}, status=status.HTTP_404_NOT_FOUND)
-        serializer.save(diary=diary)
\ No newline at end of file
+            raise NotFound({'error': 'Diary not found or not owned by the user'})
+        image = serializer.save(diary=diary)
+        queue_thumbnails([image.pk])
+
+    def perform_update(self, serializer):
+        """
+        Replacing the file resets the thumbnails, so make new ones for it.
+        """
+        image = serializer.save()
+        if 'image' in self.request.data:
+            queue_thumbnails([image.pk])
+
+
+@require_safe
+def blob(request, name):
+    """
+    Serve a content-addressed diary image or thumbnail. The name is derived from the
+    file's contents, so responses never change and are cached for a year. Like files
+    under MEDIA_URL, blobs are public to anyone who knows their name.
+    """
+    match = BLOB_NAME_RE.match(name)
+    if match is None:
+        raise Http404
+    sha256 = match['sha256']
+    if match['width']:
+        storage_name = f"{DiaryImage.THUMBNAIL_DIR}{name}"
+    else:
+        storage_name = ImageBlob.storage_name(sha256, name)
+
+    etag = f'"{name}"'
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    try:
+        file = default_storage.open(storage_name, 'rb')
+    except FileNotFoundError:
+        raise Http404
+    response = FileResponse(file, content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CalendarEvent
+from .models import CalendarEvent, CalendarFeed
 
 @admin.register(CalendarEvent)
 class CalendarEventAdmin(admin.ModelAdmin):
@@ -7,3 +7,9 @@ class CalendarEventAdmin(admin.ModelAdmin):
     list_filter = ('date', 'user')
     search_fields = ('title', 'description')
     date_hierarchy = 'date'
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created_at')
+    search_fields = ('user__email',)
+    exclude = ('token',)
@@ -0,0 +1,102 @@
+"""
+The calendar agenda: everything with a date in a window, in one time-ordered list.
+
+Each source is a single indexed range query already ordered by time, so the
+sources are combined with a k-way merge instead of a sort over everything.
+"""
+
+import heapq
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from goals.models import Goal, Task as GoalTask
+from task.models import Task as IndependentTask
+from .models import CalendarEvent
+from .recurrence import expand
+
+KIND_EVENT = 'event'
+KIND_TASK_DUE = 'task_due'
+KIND_GOAL_TASK_DUE = 'goal_task_due'
+KIND_GOAL_DUE = 'goal_due'
+KIND_REMINDER = 'reminder'
+KINDS = (KIND_EVENT, KIND_TASK_DUE, KIND_GOAL_TASK_DUE, KIND_GOAL_DUE, KIND_REMINDER)
+
+# Models with reminders, by the name clients use for them
+REMINDER_SOURCES = {
+    'task': IndependentTask,
+    'goal_task': GoalTask,
+    'goal': Goal,
+}
+
+
+def item(day, at, kind, object_id, **fields):
+    """
+    An agenda item. Items without a time (due dates) sort first on their day;
+    the kind and id break ties so the order is stable.
+    """
+    key = (day, at is not None, at or time.min, KINDS.index(kind), object_id)
+    return key, {'kind': kind, 'id': object_id, 'date': day.isoformat(), 'time': at.isoformat() if at else None, **fields}
+
+
+def event_items(user, start, end):
+    events = CalendarEvent.objects.filter(CalendarEvent.in_window(start, end), user=user)
+    for day, event in expand(events, start, end):
+        yield item(
+            day, event.start_time, KIND_EVENT, event.pk,
+            title=event.title, end_time=event.end_time.isoformat(), color=event.color,
+            recurring=bool(event.recurrence),
+        )
+
+
+def due_items(queryset, field, kind, start, end, **extra):
+    rows = (
+        queryset.filter(**{f'{field}__gte': start, f'{field}__lte': end})
+        .order_by(field, 'pk')
+        .values('pk', 'title', field, *extra.values())
+    )
+    for row in rows.iterator():
+        yield item(row[field], None, kind, row['pk'], title=row['title'], **{name: row[column] for name, column in extra.items()})
+
+
+def reminder_items(user, model, target, start, end):
+    # Reminders are stored as instants; show them on the calendar in the site's time zone
+    zone = timezone.get_current_timezone()
+    window_start = timezone.make_aware(datetime.combine(start, time.min), zone)
+    window_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), zone)
+    rows = (
+        model.objects.filter(
+            user=user, has_reminder=True,
+            reminder_date_time__gte=window_start, reminder_date_time__lt=window_end,
+        )
+        .order_by('reminder_date_time', 'pk')
+        .values('pk', 'title', 'reminder_date_time')
+    )
+    for row in rows.iterator():
+        local = timezone.localtime(row['reminder_date_time'], zone)
+        yield item(local.date(), local.time(), KIND_REMINDER, row['pk'], title=row['title'], target=target)
+
+
+def agenda(user, start, end, kinds=KINDS):
+    """
+    Yield the user's agenda items between start and end inclusive, ordered by date
+    and time. One query per source.
+    """
+    streams = []
+    if KIND_EVENT in kinds:
+        streams.append(event_items(user, start, end))
+    if KIND_TASK_DUE in kinds:
+        streams.append(due_items(
+            IndependentTask.objects.filter(user=user), 'due_date', KIND_TASK_DUE, start, end, status='status'
+        ))
+    if KIND_GOAL_TASK_DUE in kinds:
+        streams.append(due_items(
+            GoalTask.objects.filter(user=user), 'due_date', KIND_GOAL_TASK_DUE, start, end, status='status', goal_id='goal_id'
+        ))
+    if KIND_GOAL_DUE in kinds:
+        streams.append(due_items(
+            Goal.objects.filter(user=user), 'completion_date', KIND_GOAL_DUE, start, end, is_completed='is_completed'
+        ))
+    if KIND_REMINDER in kinds:
+        streams += [reminder_items(user, model, target, start, end) for target, model in REMINDER_SOURCES.items()]
+
+    for _, entry in heapq.merge(*streams, key=lambda pair: pair[0]):
+        yield entry
@@ -1,15 +1,16 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q
 from datetime import datetime, timedelta
 from .models import CalendarEvent
 from .serializers import CalendarEventSerializer
+from .views import OccurrencesMixin
 
-class CalendarEventAPIViewSet(viewsets.ModelViewSet):
+class CalendarEventAPIViewSet(OccurrencesMixin, viewsets.ModelViewSet):
     """API ViewSet for calendar events"""
     serializer_class = CalendarEventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ('date', 'start_time', 'id')
     
     def get_queryset(self):
         """Return events for the current user"""
@@ -35,9 +36,7 @@ class CalendarEventAPIViewSet(viewsets.ModelViewSet):
         try:
             year = int(request.query_params.get('year', datetime.now().year))
             month = int(request.query_params.get('month', datetime.now().month))
-            
-            print(f"Getting events for year={year}, month={month}")
-            
+
             # Get the first and last day of the month
             first_day = datetime(year, month, 1).date()
             if month == 12:
@@ -46,15 +45,7 @@ class CalendarEventAPIViewSet(viewsets.ModelViewSet):
                 last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
             
             # Get events for the month
-            events = self.get_queryset().filter(
-                date__gte=first_day,
-                date__lte=last_day
-            )
-            
-            print(f"Found {events.count()} events")
-            
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
+            return self.month_response(year, month, first_day, last_day)
         except (ValueError, TypeError) as e:
             print(f"Error in month action: {e}")
             return Response(
@@ -78,13 +69,7 @@ class CalendarEventAPIViewSet(viewsets.ModelViewSet):
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
             
-            events = self.get_queryset().filter(
-                date__gte=start_date,
-                date__lte=end_date
-            )
-            
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
+            return self.occurrences_response(start_date, end_date)
         except (ValueError, TypeError) as e:
             print(f"Error in range action: {e}")
             return Response(
@@ -103,10 +88,7 @@ class CalendarEventAPIViewSet(viewsets.ModelViewSet):
             else:
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
             
-            events = self.get_queryset().filter(date=date_obj)
-            
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
+            return self.occurrences_response(date_obj, date_obj)
         except (ValueError, TypeError) as e:
             print(f"Error in day action: {e}")
             return Response(
@@ -0,0 +1,54 @@
+"""
+Cached month listings for the calendar.
+
+Keys carry a per-user version that is bumped whenever one of the user's events
+changes, so stale months are never read again and simply expire. A single bump
+covers every month at once, which recurring events need: one series edit can
+change any month it reaches.
+"""
+
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(user_id):
+    return f"calendar:version:{user_id}"
+
+
+def user_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # Start from the clock rather than 1, so a version evicted from the cache
+        # can never come back with a number some stale month was stored under
+        version = time.time_ns()
+        cache.add(version_key(user_id), version, timeout=None)
+        version = cache.get(version_key(user_id), version)
+    return version
+
+
+def month_key(user_id, year, month):
+    return f"calendar:month:{user_id}:{user_version(user_id)}:{year}-{month:02d}"
+
+
+def cached_month(user_id, year, month, build):
+    """The month's serialized occurrences, built with build() on a cache miss"""
+    key = month_key(user_id, year, month)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout=getattr(settings, 'CALENDAR_MONTH_CACHE_TIMEOUT', 60 * 60 * 24))
+    return data
+
+
+def invalidate_user(user_id):
+    """Retire every cached month of a user once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(version_key(user_id))
+        except ValueError:
+            # No version stored yet: the next read starts a fresh one
+            pass
+
+    transaction.on_commit(bump)
@@ -0,0 +1,127 @@
+"""
+Free/busy computation over calendar events.
+
+Event occurrences become [start, end) intervals. One sort plus a sweep merges them
+into busy blocks, finds overlapping events, and leaves the gaps as free time. The
+work is O(n log n) in the occurrences inside the window, whatever the size of
+anyone's calendar.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from .models import CalendarEvent
+from .recurrence import expand
+
+
+def occurrence_intervals(events, start, end):
+    """
+    (start, end, event) for each occurrence between the start and end dates. Events
+    that end at or before their start time are taken to run past midnight.
+    """
+    for day, event in expand(events, start, end):
+        begins = datetime.combine(day, event.start_time)
+        ends = datetime.combine(day, event.end_time)
+        if ends <= begins:
+            ends += timedelta(days=1)
+        yield begins, ends, event
+
+
+def merge_intervals(intervals):
+    """Merge (start, end, ...) intervals into disjoint, sorted [start, end] busy blocks"""
+    blocks = []
+    for begins, ends, *_ in sorted(intervals, key=lambda interval: interval[:2]):
+        if blocks and begins <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], ends)
+        else:
+            blocks.append([begins, ends])
+    return blocks
+
+
+def find_conflicts(intervals):
+    """
+    Periods where two or more events overlap, with the events involved. A sweep over
+    start and end points keeps the set of events running at each moment.
+    """
+    points = []
+    for begins, ends, event in intervals:
+        points.append((begins, 1, event.pk))
+        points.append((ends, 0, event.pk))
+    # Ends sort before starts at the same instant, so back-to-back events don't conflict
+    points.sort()
+
+    conflicts = []
+    active = set()
+    current = None
+    for at, is_start, event_id in points:
+        if is_start:
+            active.add(event_id)
+            if len(active) == 2:
+                current = {'start': at, 'event_ids': set(active)}
+            elif len(active) > 2:
+                current['event_ids'].add(event_id)
+        else:
+            active.discard(event_id)
+            if len(active) == 1:
+                conflicts.append({'start': current['start'], 'end': at, 'event_ids': sorted(current['event_ids'])})
+                current = None
+    return conflicts
+
+
+def free_slots(busy, start, end, day_start, day_end, min_duration):
+    """
+    Gaps of at least min_duration between busy blocks, within working hours
+    (day_start to day_end) on each date from start to end.
+    """
+    slots = []
+    index = 0
+    day = start
+    while day <= end:
+        window_start = datetime.combine(day, day_start)
+        window_end = datetime.combine(day, day_end)
+        # Blocks are sorted, so skip the ones that ended before today's window
+        while index < len(busy) and busy[index][1] <= window_start:
+            index += 1
+
+        cursor = window_start
+        position = index
+        while position < len(busy) and busy[position][0] < window_end:
+            block_start, block_end = busy[position]
+            if block_start - cursor >= min_duration:
+                slots.append([cursor, block_start])
+            cursor = max(cursor, block_end)
+            position += 1
+        if window_end - cursor >= min_duration:
+            slots.append([cursor, window_end])
+        day += timedelta(days=1)
+    return slots
+
+
+def as_periods(blocks):
+    return [{'start': begins, 'end': ends} for begins, ends in blocks]
+
+
+def free_busy(users, start, end, day_start, day_end, min_duration):
+    """
+    Busy blocks and conflicts for each user, plus the combined busy blocks and the
+    free slots everyone shares. All events come from one query.
+    """
+    events = CalendarEvent.objects.filter(CalendarEvent.in_window(start, end), user__in=users)
+    intervals_by_user = defaultdict(list)
+    for interval in occurrence_intervals(events, start, end):
+        intervals_by_user[interval[2].user_id].append(interval)
+
+    combined = merge_intervals(interval for intervals in intervals_by_user.values() for interval in intervals)
+    return {
+        'users': [
+            {
+                'id': user.pk,
+                'email': user.email,
+                'full_name': user.full_name,
+                'busy': as_periods(merge_intervals(intervals_by_user[user.pk])),
+                'conflicts': find_conflicts(intervals_by_user[user.pk]),
+            }
+            for user in users
+        ],
+        'busy': as_periods(combined),
+        'free': as_periods(free_slots(combined, start, end, day_start, day_end, min_duration)),
+    }
@@ -0,0 +1,122 @@
+"""
+iCalendar (RFC 5545) export of a user's calendar.
+
+The feed is produced line by line from database iterators so a large calendar is
+streamed to the client rather than built in memory. Event times are written as
+floating local times, the same way they are stored.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Count, Max
+from task.models import Task
+from .models import CalendarEvent
+from .recurrence import RecurrenceRule
+
+PRODUCT_ID = '-//NeoNote//Calendar Feed//EN'
+UID_DOMAIN = 'neonote'
+# Lines longer than this many octets are folded (RFC 5545 section 3.1)
+LINE_LIMIT = 75
+
+
+def escape_text(value):
+    return (
+        (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into CRLF-terminated lines of at most 75 octets"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_LIMIT:
+        return line + '\r\n'
+    parts = []
+    limit = LINE_LIMIT
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never cut a multi-byte character in half
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        # Continuation lines start with a space, which counts towards their length
+        limit = LINE_LIMIT - 1
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def utc_stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(event):
+    begins = datetime.combine(event.date, event.start_time)
+    ends = datetime.combine(event.date, event.end_time)
+    if ends <= begins:
+        ends += timedelta(days=1)
+
+    yield 'BEGIN:VEVENT'
+    yield f"UID:event-{event.pk}@{UID_DOMAIN}"
+    yield f"DTSTAMP:{utc_stamp(event.updated_at)}"
+    yield f"LAST-MODIFIED:{utc_stamp(event.updated_at)}"
+    yield f"DTSTART:{begins:%Y%m%dT%H%M%S}"
+    yield f"DTEND:{ends:%Y%m%dT%H%M%S}"
+    yield f"SUMMARY:{escape_text(event.title)}"
+    if event.description:
+        yield f"DESCRIPTION:{escape_text(event.description)}"
+    if event.recurrence:
+        rule = RecurrenceRule.parse(event.recurrence)
+        rrule = str(rule)
+        if rule.until is not None:
+            # UNTIL has to have the same value type as DTSTART, a local date-time here
+            rrule = rrule.replace(f"UNTIL={rule.until:%Y%m%d}", f"UNTIL={rule.until:%Y%m%d}T235959")
+        yield f"RRULE:{rrule}"
+        for day in event.exdates or []:
+            yield f"EXDATE:{day.replace('-', '')}T{event.start_time:%H%M%S}"
+    yield 'END:VEVENT'
+
+
+def task_lines(task):
+    """Due dates as all-day events, which calendar apps show more widely than VTODO"""
+    yield 'BEGIN:VEVENT'
+    yield f"UID:task-{task.pk}@{UID_DOMAIN}"
+    yield f"DTSTAMP:{utc_stamp(task.updated_at)}"
+    yield f"LAST-MODIFIED:{utc_stamp(task.updated_at)}"
+    yield f"DTSTART;VALUE=DATE:{task.due_date:%Y%m%d}"
+    yield f"DTEND;VALUE=DATE:{task.due_date + timedelta(days=1):%Y%m%d}"
+    yield f"SUMMARY:{escape_text(('Done: ' if task.status == 'completed' else 'Due: ') + task.title)}"
+    yield 'CATEGORIES:Task'
+    yield 'TRANSP:TRANSPARENT'
+    yield 'END:VEVENT'
+
+
+def feed_state(user):
+    """
+    (last modified, etag source) for a user's feed from two aggregate queries. Counts
+    are included because deleting an item doesn't move max(updated_at).
+    """
+    events = CalendarEvent.objects.filter(user=user).aggregate(changed=Max('updated_at'), count=Count('pk'))
+    tasks = Task.objects.filter(user=user, due_date__isnull=False).aggregate(changed=Max('updated_at'), count=Count('pk'))
+    changes = [value for value in (events['changed'], tasks['changed']) if value is not None]
+    last_modified = max(changes) if changes else None
+    stamp = last_modified.timestamp() if last_modified else 0
+    return last_modified, f"{stamp}-{events['count']}-{tasks['count']}"
+
+
+def feed_chunks(user, name):
+    """The feed as a stream of text chunks, one component at a time"""
+    yield fold('BEGIN:VCALENDAR') + fold('VERSION:2.0') + fold(f"PRODID:{PRODUCT_ID}")
+    yield fold('CALSCALE:GREGORIAN') + fold('METHOD:PUBLISH') + fold(f"X-WR-CALNAME:{escape_text(name)}")
+
+    events = CalendarEvent.objects.filter(user=user).order_by('date', 'start_time', 'pk')
+    for event in events.iterator(chunk_size=500):
+        yield ''.join(fold(line) for line in event_lines(event))
+
+    tasks = (
+        Task.objects.filter(user=user, due_date__isnull=False)
+        .only('pk', 'title', 'status', 'due_date', 'updated_at')
+        .order_by('due_date', 'pk')
+    )
+    for task in tasks.iterator(chunk_size=500):
+        yield ''.join(fold(line) for line in task_lines(task))
+
+    yield fold('END:VCALENDAR')
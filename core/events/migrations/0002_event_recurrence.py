@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:57
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_recurrence_end(apps, schema_editor):
+    # Every existing event is a one-off, so its only occurrence is its date
+    CalendarEvent = apps.get_model('events', 'CalendarEvent')
+    CalendarEvent.objects.update(recurrence_end=F('date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='exdates',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_end',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_recurrence_end, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,83 @@
+import secrets
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
+from .recurrence import RecurrenceRule
 
 class CalendarEvent(models.Model):
     """Model for calendar events"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_events')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    date = models.DateField()
+    date = models.DateField()  # The first occurrence of a recurring event
     start_time = models.TimeField()
     end_time = models.TimeField()
     color = models.CharField(max_length=20, default='#3788d8')  # Store color as hex code
+    # RRULE of a recurring event, e.g. "FREQ=WEEKLY;BYDAY=MO,WE" (see events/recurrence.py); empty for one-off events
+    recurrence = models.CharField(max_length=255, blank=True, default='')
+    # Dates ("2024-05-06") skipped by the recurrence
+    exdates = models.JSONField(default=list, blank=True)
+    # Date of the last occurrence, or null for series that never end; kept by save()
+    recurrence_end = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['date', 'start_time']
+        indexes = [
+            # Month, range and day listings of one-off events
+            models.Index(fields=['user', 'date', 'start_time'], name='event_user_date_idx'),
+            # Recurring series are few per user; find the ones still running
+            models.Index(fields=['user', 'recurrence_end'], condition=~Q(recurrence=''), name='event_user_series_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date}"
+
+    def save(self, *args, **kwargs):
+        if self.recurrence:
+            self.recurrence_end = RecurrenceRule.parse(self.recurrence).last_date(self.date)
+        else:
+            self.recurrence_end = self.date
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date', 'recurrence'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'recurrence_end'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def in_window(start, end):
+        """
+        Filter for events with an occurrence that may fall between start and end inclusive.
+        One-off events are a plain date range; series are those started by the end of the
+        window and not finished before it.
+        """
+        one_off = Q(recurrence='', date__gte=start, date__lte=end)
+        series = ~Q(recurrence='') & Q(date__lte=end) & (Q(recurrence_end__gte=start) | Q(recurrence_end__isnull=True))
+        return one_off | series
+
+
+class CalendarFeed(models.Model):
+    """
+    A secret link to a user's calendar as an iCalendar feed, for subscribing from
+    other calendar apps. Anyone holding the token can read the feed; rotating it
+    revokes old links.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar feed for {self.user}"
+
+    @staticmethod
+    def new_token():
+        return secrets.token_urlsafe(32)
+
+    @classmethod
+    def for_user(cls, user, rotate=False):
+        """The user's feed, created on first use; rotate gives it a new token"""
+        feed, created = cls.objects.get_or_create(user=user, defaults={'token': cls.new_token()})
+        if rotate and not created:
+            feed.token = cls.new_token()
+            feed.save(update_fields=['token'])
+        return feed
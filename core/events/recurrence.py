@@ -0,0 +1,280 @@
+"""
+Recurring calendar events.
+
+A recurring CalendarEvent stores its first occurrence in `date` plus an RFC 5545
+RRULE such as "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20241231". The supported
+subset is FREQ (DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL, COUNT, UNTIL, BYDAY
+(with ordinals like 2TU or -1FR for monthly and yearly rules), BYMONTHDAY and
+BYMONTH, with weeks starting on Monday.
+
+Occurrences are never stored: they are generated lazily for the window being
+viewed, jumping straight to it instead of walking from the first occurrence.
+"""
+
+import calendar
+import heapq
+import re
+from datetime import date, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# COUNT rules are expanded from the first occurrence, so keep them bounded
+MAX_COUNT = 1000
+# Periods in a row without an occurrence before a rule is treated as exhausted (e.g. BYMONTH=2;BYMONTHDAY=30)
+MAX_EMPTY_PERIODS = 400
+
+BYDAY_RE = re.compile(r'^([+-]?\d{1,2})?(MO|TU|WE|TH|FR|SA|SU)$')
+
+
+class InvalidRecurrence(ValueError):
+    pass
+
+
+def parse_date(value):
+    """An UNTIL value, given as 20241231, 20241231T235959Z or 2024-12-31"""
+    value = value.replace('-', '')
+    try:
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    except ValueError:
+        raise InvalidRecurrence(f"Invalid UNTIL date: {value}")
+
+
+def add_months(year, month, months):
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+class RecurrenceRule:
+    def __init__(self, freq, interval=1, count=None, until=None, byday=(), bymonthday=(), bymonth=()):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = tuple(byday)  # (ordinal or None, weekday number)
+        self.bymonthday = tuple(bymonthday)
+        self.bymonth = tuple(bymonth)
+
+    @classmethod
+    def parse(cls, text):
+        text = text.strip()
+        if text.upper().startswith('RRULE:'):
+            text = text[6:]
+        parts = {}
+        for part in filter(None, text.upper().split(';')):
+            key, _, value = part.partition('=')
+            if not value or key in parts:
+                raise InvalidRecurrence(f"Invalid rule part: {part}")
+            parts[key] = value
+
+        unknown = set(parts) - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH', 'WKST'}
+        if unknown:
+            raise InvalidRecurrence(f"Unsupported rule parts: {', '.join(sorted(unknown))}")
+        if parts.get('FREQ') not in FREQUENCIES:
+            raise InvalidRecurrence(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+        if parts.get('WKST', 'MO') != 'MO':
+            raise InvalidRecurrence("Only WKST=MO is supported")
+        if 'COUNT' in parts and 'UNTIL' in parts:
+            raise InvalidRecurrence("COUNT and UNTIL can't be combined")
+
+        def integers(key, low, high, allow_negative=False):
+            values = []
+            for item in parts.get(key, '').split(',') if key in parts else []:
+                try:
+                    number = int(item)
+                except ValueError:
+                    raise InvalidRecurrence(f"Invalid {key}: {item}")
+                if not (low <= abs(number) <= high) or (number < 0 and not allow_negative):
+                    raise InvalidRecurrence(f"Invalid {key}: {item}")
+                values.append(number)
+            return values
+
+        byday = []
+        for item in parts.get('BYDAY', '').split(',') if 'BYDAY' in parts else []:
+            match = BYDAY_RE.match(item)
+            if match is None:
+                raise InvalidRecurrence(f"Invalid BYDAY: {item}")
+            ordinal = int(match[1]) if match[1] else None
+            if ordinal is not None and (parts['FREQ'] not in ('MONTHLY', 'YEARLY') or not 1 <= abs(ordinal) <= 5):
+                raise InvalidRecurrence(f"Invalid BYDAY: {item}")
+            byday.append((ordinal, WEEKDAYS.index(match[2])))
+
+        interval = integers('INTERVAL', 1, 1000) or [1]
+        count = integers('COUNT', 1, MAX_COUNT)
+        return cls(
+            parts['FREQ'],
+            interval=interval[0],
+            count=count[0] if count else None,
+            until=parse_date(parts['UNTIL']) if 'UNTIL' in parts else None,
+            byday=byday,
+            bymonthday=integers('BYMONTHDAY', 1, 31, allow_negative=True),
+            bymonth=integers('BYMONTH', 1, 12),
+        )
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until:%Y%m%d}")
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(f"{ordinal or ''}{WEEKDAYS[day]}" for ordinal, day in self.byday))
+        if self.bymonthday:
+            parts.append('BYMONTHDAY=' + ','.join(map(str, self.bymonthday)))
+        if self.bymonth:
+            parts.append('BYMONTH=' + ','.join(map(str, self.bymonth)))
+        return ';'.join(parts)
+
+    def month_days(self, year, month, start):
+        """Candidate days of one month for MONTHLY and YEARLY rules"""
+        days_in_month = calendar.monthrange(year, month)[1]
+        monthdays = set()
+        for day in self.bymonthday:
+            day = day if day > 0 else days_in_month + day + 1
+            if 1 <= day <= days_in_month:
+                monthdays.add(day)
+        weekdays = set()
+        for ordinal, weekday in self.byday:
+            first = (weekday - date(year, month, 1).weekday()) % 7 + 1
+            matching = list(range(first, days_in_month + 1, 7))
+            if ordinal is None:
+                weekdays.update(matching)
+            elif ordinal <= len(matching) and -ordinal <= len(matching):
+                weekdays.add(matching[ordinal - 1] if ordinal > 0 else matching[ordinal])
+
+        if self.bymonthday and self.byday:
+            # Both given: a day has to match both (Friday the 13th)
+            days = monthdays & weekdays
+        elif self.bymonthday or self.byday:
+            days = monthdays | weekdays
+        else:
+            # Like RFC 5545, months without the start's day (the 31st, say) are skipped
+            days = {start.day} if start.day <= days_in_month else set()
+        return [date(year, month, day) for day in sorted(days)]
+
+    def period(self, start, index):
+        """Candidate dates of the index-th period after the one holding start, in order"""
+        if self.freq == 'DAILY':
+            day = start + timedelta(days=index * self.interval)
+            if self.bymonth and day.month not in self.bymonth:
+                return []
+            if self.byday and day.weekday() not in {weekday for _, weekday in self.byday}:
+                return []
+            return [day]
+        if self.freq == 'WEEKLY':
+            monday = start - timedelta(days=start.weekday()) + timedelta(weeks=index * self.interval)
+            weekdays = sorted({weekday for _, weekday in self.byday}) or [start.weekday()]
+            days = [monday + timedelta(days=weekday) for weekday in weekdays]
+            return [day for day in days if not self.bymonth or day.month in self.bymonth]
+        if self.freq == 'MONTHLY':
+            year, month = add_months(start.year, start.month, index * self.interval)
+            if self.bymonth and month not in self.bymonth:
+                return []
+            return self.month_days(year, month, start)
+        year = start.year + index * self.interval
+        if year > date.max.year:
+            return []
+        if self.bymonth:
+            months = sorted(self.bymonth)
+        elif self.byday and not self.bymonthday:
+            # BYDAY alone in a yearly rule means those weekdays in every month of the year
+            months = range(1, 13)
+        else:
+            months = [start.month]
+        return [day for month in months for day in self.month_days(year, month, start)]
+
+    def first_period(self, start, after):
+        """The first period that can hold a date on or after `after`"""
+        if after is None or after <= start:
+            return 0
+        if self.freq == 'DAILY':
+            elapsed = (after - start).days
+        elif self.freq == 'WEEKLY':
+            elapsed = ((after - timedelta(days=after.weekday())) - (start - timedelta(days=start.weekday()))).days // 7
+        elif self.freq == 'MONTHLY':
+            elapsed = (after.year - start.year) * 12 + after.month - start.month
+        else:
+            elapsed = after.year - start.year
+        return elapsed // self.interval
+
+    def dates(self, start, after=None):
+        """
+        Occurrence dates of the series starting on `start`, in order, from `after` on.
+        Rules without COUNT skip straight to the period holding `after`; COUNT rules
+        have to be counted from the start.
+        """
+        index = self.first_period(start, after) if self.count is None else 0
+        produced = 0
+        empty = 0
+        while empty < MAX_EMPTY_PERIODS:
+            try:
+                candidates = self.period(start, index)
+            except (OverflowError, ValueError):
+                return
+            index += 1
+            empty = 0 if candidates else empty + 1
+            for day in candidates:
+                if day < start:
+                    continue
+                if self.until is not None and day > self.until:
+                    return
+                produced += 1
+                if after is None or day >= after:
+                    yield day
+                if self.count is not None and produced >= self.count:
+                    return
+
+    def last_date(self, start):
+        """
+        The date of the final occurrence, or None when the series never ends. COUNT
+        rules are walked (COUNT is capped); UNTIL rules jump to the period holding
+        UNTIL and search back from there, however far away it is.
+        """
+        if self.count is None and self.until is None:
+            return None
+        if self.count is not None:
+            last = None
+            for last in self.dates(start):
+                pass
+            return last
+
+        index = self.first_period(start, self.until)
+        for index in range(index, max(index - MAX_EMPTY_PERIODS, -1), -1):
+            try:
+                candidates = self.period(start, index)
+            except (OverflowError, ValueError):
+                continue
+            candidates = [day for day in candidates if start <= day <= self.until]
+            if candidates:
+                return candidates[-1]
+        # No occurrence close to UNTIL; it still bounds the series
+        return self.until
+
+
+def event_dates(event, start, end):
+    """Dates on which an event occurs between start and end inclusive"""
+    if not event.recurrence:
+        if start <= event.date <= end:
+            yield event.date
+        return
+    excluded = set(event.exdates or [])
+    for day in RecurrenceRule.parse(event.recurrence).dates(event.date, after=start):
+        if day > end:
+            return
+        if day.isoformat() not in excluded:
+            yield day
+
+
+def expand(events, start, end):
+    """
+    Lazily yield (date, event) for every occurrence of the events between start and
+    end inclusive, ordered by date and start time. Each series is its own sorted
+    generator and they are merged with a heap, so only the window is materialized.
+    """
+    def stream(event):
+        for day in event_dates(event, start, end):
+            yield day, event.start_time, event.pk, event
+
+    for day, _, _, event in heapq.merge(*map(stream, events), key=lambda item: item[:3]):
+        yield day, event
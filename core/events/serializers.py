@@ -1,15 +1,19 @@
+from datetime import date
 from rest_framework import serializers
 from .models import CalendarEvent
+from .recurrence import InvalidRecurrence, RecurrenceRule
+from core.serializers import SparseFieldsMixin
 
-class CalendarEventSerializer(serializers.ModelSerializer):
+class CalendarEventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for calendar events"""
     color_name = serializers.SerializerMethodField()
     
     class Meta:
         model = CalendarEvent
         fields = ['id', 'title', 'description', 'date', 'start_time', 'end_time', 
-                  'color', 'color_name', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                  'color', 'color_name', 'recurrence', 'exdates', 'recurrence_end',
+                  'created_at', 'updated_at']
+        read_only_fields = ['id', 'recurrence_end', 'created_at', 'updated_at']
     
     def get_color_name(self, obj):
         """Map hex color to a color name for easier frontend handling"""
@@ -23,6 +27,23 @@ class CalendarEventSerializer(serializers.ModelSerializer):
         }
         return color_map.get(obj.color, 'blue')
     
+    def validate_recurrence(self, value):
+        """Store rules in one canonical form"""
+        if not value:
+            return ''
+        try:
+            return str(RecurrenceRule.parse(value))
+        except InvalidRecurrence as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_exdates(self, value):
+        if not isinstance(value, list):
+            raise serializers.ValidationError("exdates must be a list of YYYY-MM-DD dates")
+        try:
+            return sorted({date.fromisoformat(day).isoformat() for day in value})
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("exdates must be a list of YYYY-MM-DD dates")
+
     def create(self, validated_data):
         """Create a new event with the current user"""
         user = self.context['request'].user
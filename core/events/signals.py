@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import invalidate_user
+from .models import CalendarEvent
+
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+def invalidate_calendar_months(sender, instance, **kwargs):
+    """
+    Any change to an event can change any of its owner's months (recurring events
+    span many), so retire them all.
+    """
+    invalidate_user(instance.user_id)
@@ -0,0 +1,389 @@
+from datetime import date, datetime, time, timezone
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from goals.models import Goal, Task as GoalTask
+from task.models import Task
+from work.models import Project
+from .ics import fold
+from .models import CalendarEvent, CalendarFeed
+from .recurrence import InvalidRecurrence, RecurrenceRule
+
+
+def first_dates(rule, start, after=None, count=5):
+    dates = RecurrenceRule.parse(rule).dates(start, after=after)
+    return [day.isoformat() for day, _ in zip(dates, range(count))]
+
+
+class RecurrenceRuleTests(SimpleTestCase):
+    def test_weekly_with_interval_and_weekdays(self):
+        self.assertEqual(
+            first_dates('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE', date(2024, 1, 3)),
+            ['2024-01-03', '2024-01-15', '2024-01-17', '2024-01-29', '2024-01-31'],
+        )
+
+    def test_monthly_rules(self):
+        self.assertEqual(first_dates('FREQ=MONTHLY;BYDAY=-1FR', date(2024, 1, 1), count=3), ['2024-01-26', '2024-02-23', '2024-03-29'])
+        # Months without a 31st are skipped rather than moved
+        self.assertEqual(first_dates('FREQ=MONTHLY', date(2024, 1, 31), count=3), ['2024-01-31', '2024-03-31', '2024-05-31'])
+        self.assertEqual(first_dates('FREQ=MONTHLY;BYMONTHDAY=13;BYDAY=FR', date(2024, 1, 1), count=2), ['2024-09-13', '2024-12-13'])
+
+    def test_yearly_rules(self):
+        self.assertEqual(first_dates('FREQ=YEARLY', date(2024, 2, 29), count=2), ['2024-02-29', '2028-02-29'])
+        self.assertEqual(first_dates('FREQ=YEARLY;BYMONTH=11;BYDAY=4TH', date(2024, 1, 1), count=2), ['2024-11-28', '2025-11-27'])
+
+    def test_expansion_jumps_to_the_window(self):
+        self.assertEqual(
+            first_dates('FREQ=DAILY;INTERVAL=3', date(2000, 1, 1), after=date(2030, 6, 1), count=2),
+            ['2030-06-01', '2030-06-04'],
+        )
+        # COUNT still counts occurrences before the window
+        self.assertEqual(first_dates('FREQ=DAILY;COUNT=3', date(2024, 1, 1), after=date(2024, 1, 2)), ['2024-01-02', '2024-01-03'])
+
+    def test_last_date(self):
+        self.assertEqual(RecurrenceRule.parse('FREQ=WEEKLY;COUNT=4;BYDAY=TU,TH').last_date(date(2024, 1, 2)), date(2024, 1, 11))
+        self.assertEqual(RecurrenceRule.parse('FREQ=DAILY;UNTIL=20240110T235959Z').last_date(date(2024, 1, 1)), date(2024, 1, 10))
+        self.assertIsNone(RecurrenceRule.parse('FREQ=DAILY').last_date(date(2024, 1, 1)))
+
+    def test_last_date_of_until_rules_matches_the_last_occurrence(self):
+        start = date(2024, 1, 31)
+        for rule in [
+            'FREQ=DAILY;INTERVAL=3;UNTIL=20240301', 'FREQ=WEEKLY;BYDAY=MO,FR;UNTIL=20240617',
+            'FREQ=MONTHLY;UNTIL=20250115', 'FREQ=MONTHLY;BYDAY=-1FR;UNTIL=20241227',
+            'FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=29;UNTIL=20350101', 'FREQ=WEEKLY;BYMONTH=3;UNTIL=20260101',
+        ]:
+            parsed = RecurrenceRule.parse(rule)
+            self.assertEqual(parsed.last_date(start), list(parsed.dates(start))[-1], msg=rule)
+
+    def test_last_date_jumps_to_a_distant_until(self):
+        # Walking every day to year 9999 would take seconds
+        rule = RecurrenceRule.parse('FREQ=DAILY;UNTIL=99991231')
+        self.assertEqual(rule.last_date(date(2024, 1, 1)), date(9999, 12, 31))
+        self.assertEqual(RecurrenceRule.parse('FREQ=WEEKLY;BYDAY=SU;UNTIL=99991231').last_date(date(2024, 1, 1)), date(9999, 12, 26))
+
+    def test_invalid_rules_are_rejected(self):
+        for rule in ['FREQ=HOURLY', 'FREQ=DAILY;COUNT=2;UNTIL=20240101', 'FREQ=WEEKLY;BYDAY=2MO', 'FREQ=DAILY;BYSETPOS=1', 'FREQ=MONTHLY;BYMONTHDAY=0']:
+            with self.assertRaises(InvalidRecurrence, msg=rule):
+                RecurrenceRule.parse(rule)
+
+
+class RecurringEventViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='planner@example.com', full_name='Planner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_event(self, **fields):
+        fields = {'title': 'Standup', 'date': '2024-01-01', 'start_time': '09:00', 'end_time': '09:15', **fields}
+        response = self.client.post('/api/calendar/events/', fields, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_month_expands_recurring_events(self):
+        standup = self.create_event(recurrence='freq=weekly;byday=mo,we', exdates=['2024-02-07'])
+        self.create_event(title='Review', date='2024-02-14', start_time='08:00', end_time='09:00')
+        self.assertEqual(standup['recurrence'], 'FREQ=WEEKLY;BYDAY=MO,WE')
+        self.assertIsNone(standup['recurrence_end'])
+
+        response = self.client.get('/api/calendar/events/month/', {'year': 2024, 'month': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['date'], item['title']) for item in response.data],
+            [
+                ('2024-02-05', 'Standup'), ('2024-02-12', 'Standup'),
+                ('2024-02-14', 'Review'), ('2024-02-14', 'Standup'),
+                ('2024-02-19', 'Standup'), ('2024-02-21', 'Standup'),
+                ('2024-02-26', 'Standup'), ('2024-02-28', 'Standup'),
+            ],
+        )
+        self.assertTrue(all(item['series_start'] in ('2024-01-01', '2024-02-14') for item in response.data))
+
+    def test_finished_series_are_not_loaded(self):
+        event = self.create_event(recurrence='FREQ=DAILY;COUNT=5')
+        self.assertEqual(event['recurrence_end'], '2024-01-05')
+        self.assertEqual(self.client.get('/api/calendar/events/day/', {'date': '2024-01-06'}).data, [])
+        self.assertEqual(len(self.client.get('/api/calendar/events/day/', {'date': '2024-01-05'}).data), 1)
+
+        # Windows are filtered in the database, so only series reaching into them are fetched
+        self.assertEqual(CalendarEvent.objects.filter(CalendarEvent.in_window(date(2024, 2, 1), date(2024, 2, 29))).count(), 0)
+
+    def test_range_limits(self):
+        self.create_event(recurrence='FREQ=DAILY')
+        response = self.client.get('/api/calendar/events/range/', {'start_date': '2024-01-01', 'end_date': '2026-01-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/calendar/events/range/', {'start_date': '2030-01-01', 'end_date': '2030-01-07'})
+        self.assertEqual(len(response.data), 7)
+
+    def test_invalid_recurrence_is_rejected(self):
+        response = self.client.post('/api/calendar/events/', {
+            'title': 'Bad', 'date': '2024-01-01', 'start_time': '09:00', 'end_time': '10:00',
+            'recurrence': 'FREQ=SECONDLY',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recurrence', response.data)
+
+    def test_one_off_events_keep_working(self):
+        CalendarEvent.objects.create(user=self.user, title='Dentist', date=date(2024, 3, 5), start_time=time(15), end_time=time(16))
+        response = self.client.get('/api/calendar/events/range/', {'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+        self.assertEqual([(item['date'], item['series_start']) for item in response.data], [('2024-03-05', '2024-03-05')])
+
+
+class EventListTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='lister@example.com', full_name='Lister')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_keep_events_at_the_same_time_in_order(self):
+        slots = [(date(2024, 6, 1), time(9)), (date(2024, 6, 1), time(9)), (date(2024, 6, 1), time(8)),
+                 (date(2024, 6, 2), time(9)), (date(2024, 6, 1), time(9)), (date(2024, 5, 31), time(23))]
+        for day, start in slots:
+            CalendarEvent.objects.create(user=self.user, title='Slot', date=day, start_time=start, end_time=time(23, 30))
+
+        seen, url, params = [], '/api/calendar/events/', {'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            seen += [(event['date'], event['start_time'], event['id']) for event in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual([event_id for *_, event_id in seen], list(CalendarEvent.objects.order_by('date', 'start_time', 'id').values_list('id', flat=True)))
+
+
+class AgendaTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='planner@example.com', full_name='Planner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        CalendarEvent.objects.create(
+            user=self.user, title='Standup', date=date(2024, 4, 29), start_time=time(9), end_time=time(9, 15),
+            recurrence='FREQ=WEEKLY;BYDAY=MO,WE',
+        )
+        CalendarEvent.objects.create(user=self.user, title='Lunch', date=date(2024, 5, 1), start_time=time(12), end_time=time(13))
+        self.goal = Goal.objects.create(
+            user=self.user, title='Ship v2', start_date=date(2024, 4, 1), completion_date=date(2024, 5, 3),
+            has_reminder=True, reminder_date_time=datetime(2024, 5, 2, 8, 30, tzinfo=timezone.utc),
+        )
+        GoalTask.objects.create(user=self.user, goal=self.goal, title='Write changelog', due_date=date(2024, 5, 1))
+        Task.objects.create(
+            user=self.user, title='Pay rent', due_date=date(2024, 5, 1),
+            has_reminder=True, reminder_date_time=datetime(2024, 5, 1, 7, 0, tzinfo=timezone.utc),
+        )
+        Task.objects.create(user=self.user, title='Someday', due_date=date(2024, 6, 1))
+        other = CustomUser.objects.create_user(email='other@example.com', full_name='Other')
+        Task.objects.create(user=other, title='Not mine', due_date=date(2024, 5, 1))
+
+    def test_items_are_merged_in_time_order(self):
+        # One query per source: events, three kinds of due dates and three kinds of reminders
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/calendar/agenda/', {'start_date': '2024-05-01', 'end_date': '2024-05-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['date'], item['time'], item['kind'], item['title']) for item in response.data['items']],
+            [
+                ('2024-05-01', None, 'task_due', 'Pay rent'),
+                ('2024-05-01', None, 'goal_task_due', 'Write changelog'),
+                ('2024-05-01', '07:00:00', 'reminder', 'Pay rent'),
+                ('2024-05-01', '09:00:00', 'event', 'Standup'),
+                ('2024-05-01', '12:00:00', 'event', 'Lunch'),
+                ('2024-05-02', '08:30:00', 'reminder', 'Ship v2'),
+                ('2024-05-03', None, 'goal_due', 'Ship v2'),
+            ],
+        )
+        reminder = response.data['items'][5]
+        self.assertEqual((reminder['target'], reminder['id']), ('goal', self.goal.pk))
+
+    def test_kinds_filter(self):
+        response = self.client.get('/api/calendar/agenda/', {'start_date': '2024-04-29', 'end_date': '2024-05-05', 'kinds': 'event'})
+        self.assertEqual([item['date'] for item in response.data['items']], ['2024-04-29', '2024-05-01', '2024-05-01'])
+        self.assertEqual(
+            self.client.get('/api/calendar/agenda/', {'start_date': '2024-05-01', 'end_date': '2024-05-03', 'kinds': 'birthdays'}).status_code,
+            400,
+        )
+
+    def test_invalid_ranges(self):
+        self.assertEqual(self.client.get('/api/calendar/agenda/', {'start_date': '2024-05-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/calendar/agenda/', {'start_date': '2024-05-03', 'end_date': '2024-05-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/calendar/agenda/', {'start_date': '2024-01-01', 'end_date': '2025-06-01'}).status_code, 400)
+
+
+class CalendarMonthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='planner@example.com', full_name='Planner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.event = CalendarEvent.objects.create(
+            user=self.user, title='Gym', date=date(2024, 5, 6), start_time=time(18), end_time=time(19),
+            recurrence='FREQ=WEEKLY',
+        )
+
+    def month(self, year=2024, month=5, url='/api/calendar/events/month/'):
+        return self.client.get(url, {'year': year, 'month': month}).data
+
+    def test_repeat_views_are_served_from_cache(self):
+        self.assertEqual(len(self.month()), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.month()), 4)
+        # Both event viewsets share the cached months
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.month(url='/api/calendar/api/events/month/')), 4)
+
+    def test_changes_invalidate_every_month(self):
+        self.month(2024, 5)
+        self.month(2024, 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.exdates = ['2024-05-13', '2024-06-03']
+            self.event.save()
+        self.assertEqual(len(self.month(2024, 5)), 3)
+        self.assertEqual(len(self.month(2024, 6)), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.delete()
+        self.assertEqual(self.month(2024, 6), [])
+
+    def test_other_users_are_unaffected(self):
+        other = CustomUser.objects.create_user(email='other@example.com', full_name='Other')
+        self.month()
+        with self.captureOnCommitCallbacks(execute=True):
+            CalendarEvent.objects.create(user=other, title='Swim', date=date(2024, 5, 7), start_time=time(7), end_time=time(8))
+        with self.assertNumQueries(0):
+            self.month()
+
+
+class FreeBusyTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='lead@example.com', full_name='Lead')
+        self.member = CustomUser.objects.create_user(email='dev@example.com', full_name='Dev')
+        self.outsider = CustomUser.objects.create_user(email='outsider@example.com', full_name='Outsider')
+        self.project = Project.objects.create(user=self.owner, name='Launch', description='')
+        self.project.members.add(self.member)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def event(self, user, day, start, end, **fields):
+        return CalendarEvent.objects.create(
+            user=user, title='Busy', date=day, start_time=time(*start), end_time=time(*end), **fields
+        )
+
+    def periods(self, blocks):
+        return [(block['start'].strftime('%d %H:%M'), block['end'].strftime('%d %H:%M')) for block in blocks]
+
+    def freebusy(self, **params):
+        params = {'start_date': '2024-05-06', 'end_date': '2024-05-06', **params}
+        return self.client.get('/api/calendar/freebusy/', params)
+
+    def test_user_busy_blocks_and_conflicts(self):
+        first = self.event(self.owner, date(2024, 5, 6), (9, 0), (10, 0))
+        second = self.event(self.owner, date(2024, 5, 6), (9, 30), (11, 0))
+        self.event(self.owner, date(2024, 5, 6), (11, 0), (12, 0))
+        self.event(self.owner, date(2024, 5, 6), (14, 0), (15, 0))
+
+        response = self.freebusy()
+        self.assertEqual(response.status_code, 200)
+        mine = response.data['users'][0]
+        self.assertEqual(self.periods(mine['busy']), [('06 09:00', '06 12:00'), ('06 14:00', '06 15:00')])
+        # Back-to-back events are not a conflict
+        self.assertEqual(len(mine['conflicts']), 1)
+        self.assertEqual(mine['conflicts'][0]['event_ids'], [first.pk, second.pk])
+        self.assertEqual(self.periods(mine['conflicts']), [('06 09:30', '06 10:00')])
+        self.assertEqual(self.periods(response.data['free']), [('06 12:00', '06 14:00'), ('06 15:00', '06 17:00')])
+
+    def test_project_members_share_free_slots(self):
+        self.event(self.owner, date(2024, 5, 6), (9, 0), (10, 0))
+        self.event(self.member, date(2024, 5, 6), (10, 0), (12, 30), recurrence='FREQ=DAILY')
+        self.event(self.member, date(2024, 5, 6), (16, 40), (17, 30))
+        self.event(self.outsider, date(2024, 5, 6), (13, 0), (16, 0))
+
+        with self.assertNumQueries(3):
+            response = self.freebusy(project=self.project.pk, end_date='2024-05-07', min_duration=60)
+        self.assertEqual([user['email'] for user in response.data['users']], ['lead@example.com', 'dev@example.com'])
+        self.assertEqual(self.periods(response.data['busy']), [
+            ('06 09:00', '06 12:30'), ('06 16:40', '06 17:30'), ('07 10:00', '07 12:30'),
+        ])
+        # The 20 minutes before 16:40 are too short to count
+        self.assertEqual(self.periods(response.data['free']), [
+            ('06 12:30', '06 16:40'), ('07 09:00', '07 10:00'), ('07 12:30', '07 17:00'),
+        ])
+
+    def test_overnight_events_run_past_midnight(self):
+        self.event(self.owner, date(2024, 5, 6), (22, 0), (2, 0))
+        response = self.freebusy()
+        self.assertEqual(self.periods(response.data['busy']), [('06 22:00', '07 02:00')])
+
+    def test_only_project_members_can_look(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.freebusy(project=self.project.pk).status_code, 404)
+        self.assertEqual(self.freebusy(project='launch').status_code, 400)
+        self.assertEqual(self.freebusy(end_date='2024-08-01').status_code, 400)
+        self.assertEqual(self.freebusy(day_start='18:00').status_code, 400)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='subscriber@example.com', full_name='Subscriber')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.standup = CalendarEvent.objects.create(
+            user=self.user, title='Standup; daily, short', date=date(2024, 4, 29), start_time=time(9), end_time=time(9, 15),
+            recurrence='FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20240630', exdates=['2024-05-01'],
+        )
+        self.task = Task.objects.create(user=self.user, title='Pay rent', due_date=date(2024, 5, 1))
+        Task.objects.create(user=self.user, title='No due date')
+        other = CustomUser.objects.create_user(email='other@example.com', full_name='Other')
+        Task.objects.create(user=other, title='Not mine', due_date=date(2024, 5, 1))
+        self.url = self.client.get('/api/calendar/feed/').data['url']
+
+    def fetch(self, url=None, **extra):
+        return APIClient().get(url or self.url, **extra)
+
+    def test_feed_lists_events_and_due_tasks(self):
+        response = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertIn(f'UID:event-{self.standup.pk}@neonote\r\n', body)
+        self.assertIn('SUMMARY:Standup\\; daily\\, short\r\n', body)
+        self.assertIn('DTSTART:20240429T090000\r\n', body)
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20240630T235959;BYDAY=MO,WE\r\n', body)
+        self.assertIn('EXDATE:20240501T090000\r\n', body)
+        self.assertIn('DTSTART;VALUE=DATE:20240501\r\nDTEND;VALUE=DATE:20240502\r\nSUMMARY:Due: Pay rent\r\n', body)
+        self.assertNotIn('No due date', body)
+        self.assertNotIn('Not mine', body)
+
+    def test_long_lines_are_folded(self):
+        folded = fold('DESCRIPTION:' + 'é' * 100)
+        lines = folded.split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if index else line for index, line in enumerate(lines)), 'DESCRIPTION:' + 'é' * 100)
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.fetch()
+        with self.assertNumQueries(3):
+            not_modified = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.fetch(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_edits_and_deletions_change_the_etag(self):
+        etag = self.fetch()['ETag']
+        self.task.title = 'Pay the rent'
+        self.task.save()
+        edited = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+        self.assertNotEqual(edited['ETag'], etag)
+
+        etag = edited['ETag']
+        self.standup.delete()
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_rotating_the_token_revokes_the_old_link(self):
+        self.assertEqual(self.fetch(self.url.replace('.ics', 'x.ics')).status_code, 404)
+        rotated = self.client.post('/api/calendar/feed/').data['url']
+        self.assertNotEqual(rotated, self.url)
+        self.assertEqual(self.fetch().status_code, 404)
+        self.assertEqual(self.fetch(rotated).status_code, 200)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CalendarEventViewSet
+from .views import AgendaView, CalendarEventViewSet, CalendarFeedView, FreeBusyView, feed
 
 # Try to import the API views if they exist
 try:
@@ -14,6 +14,10 @@ router = DefaultRouter()
 router.register(r'events', CalendarEventViewSet, basename='calendar-events')
 
 urlpatterns = [
+    path('agenda/', AgendaView.as_view(), name='calendar-agenda'),
+    path('freebusy/', FreeBusyView.as_view(), name='calendar-freebusy'),
+    path('feed/', CalendarFeedView.as_view(), name='calendar-feed'),
+    path('feed/<str:token>.ics', feed, name='calendar-feed-ics'),
     path('', include(router.urls)),
 ]
 
@@ -1,15 +1,88 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
 from django.db.models import Q
+from django.http import Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from datetime import datetime, timedelta
-from .models import CalendarEvent
+from work.models import Project
+from .agenda import KINDS as AGENDA_KINDS, agenda
+from .cache import cached_month
+from .freebusy import free_busy
+from .ics import feed_chunks, feed_state
+from .models import CalendarEvent, CalendarFeed
+from .recurrence import expand
 from .serializers import CalendarEventSerializer
 
-class CalendarEventViewSet(viewsets.ModelViewSet):
+# Longest window the month/range/day actions expand recurring events over
+MAX_RANGE_DAYS = 366
+# Longest window for free/busy lookups, which can cover a whole team
+MAX_FREEBUSY_DAYS = 62
+
+
+def parse_window(request, max_days):
+    """The start_date and end_date query parameters, checked to form a window of at most max_days"""
+    try:
+        start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
+    except KeyError:
+        raise ValidationError({"error": "Both start_date and end_date are required"})
+    except ValueError:
+        raise ValidationError({"error": "Invalid date format. Use YYYY-MM-DD"})
+    if end_date < start_date:
+        raise ValidationError({"error": "end_date must not be before start_date"})
+    if (end_date - start_date).days >= max_days:
+        raise ValidationError({"error": f"Date ranges can span at most {max_days} days"})
+    return start_date, end_date
+
+
+class OccurrencesMixin:
+    """Month, range and day listings with recurring events expanded into their occurrences"""
+
+    def occurrences(self, start, end):
+        """
+        Serialized occurrences between start and end inclusive, ordered by date and time.
+        Each series is fetched and serialized once; only the occurrences inside the
+        window are generated. `date` is the occurrence's date and `series_start` the
+        first date of its series.
+        """
+        events = list(self.get_queryset().filter(CalendarEvent.in_window(start, end)))
+        serialized = {item['id']: item for item in self.get_serializer(events, many=True).data}
+        occurrences = []
+        for day, event in expand(events, start, end):
+            item = dict(serialized[event.pk])
+            item['series_start'] = item['date']
+            item['date'] = day.isoformat()
+            occurrences.append(item)
+        return occurrences
+
+    def month_response(self, year, month, start, end):
+        """Like occurrences_response, served from the per-user month cache"""
+        if 'fields' in self.request.query_params:
+            # Sparse field selections aren't worth caching separately
+            return self.occurrences_response(start, end)
+        return Response(cached_month(self.request.user.pk, year, month, lambda: self.occurrences(start, end)))
+
+    def occurrences_response(self, start, end):
+        if end < start:
+            return Response({"error": "end_date must not be before start_date"}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= MAX_RANGE_DAYS:
+            return Response(
+                {"error": f"Date ranges can span at most {MAX_RANGE_DAYS} days"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(self.occurrences(start, end))
+
+
+class CalendarEventViewSet(OccurrencesMixin, viewsets.ModelViewSet):
     """ViewSet for calendar events"""
     serializer_class = CalendarEventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ('date', 'start_time', 'id')
     
     def get_queryset(self):
         """Return events for the current user"""
@@ -31,13 +104,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
                 last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
             
             # Get events for the month
-            events = self.get_queryset().filter(
-                date__gte=first_day,
-                date__lte=last_day
-            )
-            
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
+            return self.month_response(year, month, first_day, last_day)
         except (ValueError, TypeError):
             return Response(
                 {"error": "Invalid year or month parameters"}, 
@@ -60,13 +127,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
             
-            events = self.get_queryset().filter(
-                date__gte=start_date,
-                date__lte=end_date
-            )
-            
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
+            return self.occurrences_response(start_date, end_date)
         except (ValueError, TypeError):
             return Response(
                 {"error": "Invalid date format. Use YYYY-MM-DD"}, 
@@ -84,12 +145,129 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
             else:
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
             
-            events = self.get_queryset().filter(date=date_obj)
-            
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
+            return self.occurrences_response(date_obj, date_obj)
         except (ValueError, TypeError):
             return Response(
                 {"error": "Invalid date format. Use YYYY-MM-DD"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+
+class AgendaView(APIView):
+    """
+    Everything on the user's calendar between two dates, in time order: event
+    occurrences, task, goal task and goal due dates, and reminders.
+
+    GET /api/calendar/agenda/?start_date=2024-05-01&end_date=2024-05-31&kinds=event,reminder
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        start_date, end_date = parse_window(request, MAX_RANGE_DAYS)
+
+        kinds = [kind.strip() for kind in request.query_params.get('kinds', '').split(',') if kind.strip()]
+        unknown = set(kinds) - set(AGENDA_KINDS)
+        if unknown:
+            return Response({"error": f"Unknown kinds: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = list(agenda(request.user, start_date, end_date, kinds=kinds or AGENDA_KINDS))
+        return Response({'start_date': start_date, 'end_date': end_date, 'items': items})
+
+
+class FreeBusyView(APIView):
+    """
+    Busy blocks and shared free time for the user, or for everyone in a project.
+
+    GET /api/calendar/freebusy/?start_date=2024-05-06&end_date=2024-05-10
+        [&project=<id>][&day_start=09:00&day_end=17:00][&min_duration=30]
+
+    Only times are returned for other people, never their event details. Conflicts
+    list overlapping events per person; free slots are the gaps of at least
+    min_duration minutes within working hours when nobody is busy.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        start_date, end_date = parse_window(request, MAX_FREEBUSY_DAYS)
+        params = request.query_params
+        try:
+            day_start = datetime.strptime(params.get('day_start', '09:00'), '%H:%M').time()
+            day_end = datetime.strptime(params.get('day_end', '17:00'), '%H:%M').time()
+        except ValueError:
+            return Response({"error": "day_start and day_end must be times like 09:00"}, status=status.HTTP_400_BAD_REQUEST)
+        if day_end <= day_start:
+            return Response({"error": "day_end must be after day_start"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            min_duration = int(params.get('min_duration', 30))
+        except ValueError:
+            return Response({"error": "min_duration must be a number of minutes"}, status=status.HTTP_400_BAD_REQUEST)
+        min_duration = timedelta(minutes=max(min_duration, 1))
+
+        if 'project' in params:
+            if not params['project'].isdigit():
+                return Response({"error": "project must be a project id"}, status=status.HTTP_400_BAD_REQUEST)
+            visible = Project.objects.filter(Q(user=request.user) | Q(members=request.user)).distinct()
+            project = get_object_or_404(visible.select_related('user').prefetch_related('members'), pk=params['project'])
+            users = [project.user] + sorted(
+                (member for member in project.members.all() if member.pk != project.user_id), key=lambda member: member.pk
+            )
+        else:
+            users = [request.user]
+
+        result = free_busy(users, start_date, end_date, day_start, day_end, min_duration)
+        return Response({'start_date': start_date, 'end_date': end_date, **result})
+
+
+class CalendarFeedView(APIView):
+    """
+    The user's private iCalendar feed link, for subscribing from other calendar apps.
+
+    GET returns the link, creating it on first use; POST replaces it with a new one,
+    so anyone holding the old link loses access.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def feed_response(self, request, feed):
+        url = request.build_absolute_uri(reverse('calendar-feed-ics', args=[feed.token]))
+        return Response({'url': url, 'created_at': feed.created_at})
+
+    def get(self, request):
+        return self.feed_response(request, CalendarFeed.for_user(request.user))
+
+    def post(self, request):
+        return self.feed_response(request, CalendarFeed.for_user(request.user, rotate=True))
+
+
+def feed(request, token):
+    """
+    Serve a user's calendar as iCalendar, authenticated by the feed token in the URL.
+
+    Calendar apps poll feeds often, so the validators come from two aggregate
+    queries and an unchanged calendar is answered with 304 without rendering it.
+    Otherwise the feed is streamed as it is generated.
+    """
+    calendar_feed = CalendarFeed.objects.select_related('user').filter(token=token).first()
+    if calendar_feed is None:
+        raise Http404
+    last_modified, version = feed_state(calendar_feed.user)
+
+    etag = quote_etag(f"{calendar_feed.pk}-{version}")
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        not_modified = etag in parse_etags(if_none_match)
+    else:
+        # If-Modified-Since is only used without If-None-Match, and has one-second resolution
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        not_modified = since is not None and last_modified is not None and int(last_modified.timestamp()) <= since
+    if not_modified:
+        response = HttpResponseNotModified()
+    else:
+        response = StreamingHttpResponse(feed_chunks(calendar_feed.user, 'NeoNote'), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from goals.models import Goal, Task
+
+def task_count(**filters):
+    """Correlated subquery counting a goal's tasks, 0 when it has none"""
+    counts = (
+        Task.objects.filter(goal=OuterRef('pk'), **filters)
+        .order_by().values('goal')
+        .annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+class Command(BaseCommand):
+    help = 'Verify the stored goal task counters against goals.Task and rebuild the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report goals with wrong counters; exit with an error if any')
+
+    def handle(self, *args, **options):
+        drifted = Goal.counted_task_totals().exclude(
+            Q(total_tasks=F('actual_total')) & Q(completed_tasks=F('actual_completed'))
+        )
+        rows = list(drifted.values_list('id', 'total_tasks', 'actual_total', 'completed_tasks', 'actual_completed'))
+
+        for goal_id, total, actual_total, completed, actual_completed in rows:
+            self.stdout.write(
+                f"Goal {goal_id}: total_tasks {total} -> {actual_total}, completed_tasks {completed} -> {actual_completed}"
+            )
+
+        if options['check']:
+            if rows:
+                raise CommandError(f"{len(rows)} goals have wrong task counters")
+            self.stdout.write(self.style.SUCCESS('All goal task counters are correct'))
+            return
+
+        # Recount in the UPDATE itself so tasks changed since the check are included
+        updated = Goal.objects.filter(pk__in=[row[0] for row in rows]).update(
+            total_tasks=task_count(),
+            completed_tasks=task_count(status='completed'),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt task counters for {updated} goals"))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+def backfill_task_counters(apps, schema_editor):
+    Goal = apps.get_model('goals', 'Goal')
+    Task = apps.get_model('goals', 'Task')
+
+    counts = (
+        Task.objects.filter(goal__isnull=False).order_by()
+        .values('goal_id')
+        .annotate(
+            total=models.Count('id'),
+            completed=models.Count('id', filter=models.Q(status='completed')),
+        )
+    )
+    for row in counts:
+        Goal.objects.filter(pk=row['goal_id']).update(
+            total_tasks=row['total'],
+            completed_tasks=row['completed'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0007_task_has_reminder_task_reminder_date_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='completed_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='total_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_task_counters, migrations.RunPython.noop),
+    ]
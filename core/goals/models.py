@@ -59,6 +59,7 @@
 
 
 from django.db import models
+from django.db.models import Count, F, Q
 from accounts.models import CustomUser
 from django.utils import timezone
 
@@ -75,24 +76,80 @@ class Goal(models.Model):
     created_at = models.DateTimeField(default=timezone.now)  # Default value added here
     last_modified_by = models.CharField(max_length=100, null=True, blank=True)
     last_modified_at = models.DateTimeField(auto_now=True)
+    # Kept up to date by the goals.Task signals; rebuild with `manage.py rebuild_goal_counters`
+    total_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Date range lookups for the calendar agenda
+            models.Index(fields=['user', 'completion_date'], name='goal_user_completion_idx'),
+            models.Index(fields=['user', 'reminder_date_time'], condition=Q(has_reminder=True), name='goal_user_reminder_idx'),
+        ]
+
+    # Only ever changed with F() updates, see adjust_task_counters
+    COUNTER_FIELDS = frozenset({'total_tasks', 'completed_tasks'})
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Leave the task counters out of updates: the values held in memory may be
+        stale, and writing them back would undo task changes made since loading.
+        """
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.COUNTER_FIELDS]
+            if not kwargs['update_fields']:
+                return
+        super().save(*args, **kwargs)
+
     def completion_percentage(self):
-        tasks = self.tasks.all()
-        if not tasks:
+        if not self.total_tasks:
             return 0
-        completed_tasks = tasks.filter(status='completed').count()
-        total_tasks = tasks.count()
-        return (completed_tasks / total_tasks) * 100
+        return (self.completed_tasks / self.total_tasks) * 100
 
     def update_completion_status(self):
+        # The counters are changed with F() updates, so the copy in memory may be stale
+        self.refresh_from_db(fields=['total_tasks', 'completed_tasks'])
         self.is_completed = self.completion_percentage() == 100
         if self.is_completed:
             self.completion_time = timezone.now()
         self.save(update_fields=['is_completed', 'completion_time'])
 
+    @classmethod
+    def adjust_task_counters(cls, changes):
+        """
+        Apply task counter changes given as {goal_id: (total_delta, completed_delta)}.
+        Each goal is updated with a single F() expression so concurrent changes can't
+        overwrite each other.
+        """
+        for goal_id, (total_delta, completed_delta) in changes.items():
+            if goal_id is None or (total_delta == 0 and completed_delta == 0):
+                continue
+            cls.objects.filter(pk=goal_id).update(
+                total_tasks=F('total_tasks') + total_delta,
+                completed_tasks=F('completed_tasks') + completed_delta,
+            )
+
+    @classmethod
+    def counted_task_totals(cls):
+        """
+        The task counters computed from goals.Task, for rebuilding or verifying the
+        stored ones. One aggregate query over all goals.
+        """
+        return cls.objects.annotate(
+            actual_total=Count('tasks'),
+            actual_completed=Count('tasks', filter=Q(tasks__status='completed')),
+        )
+
 class Task(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -119,6 +176,12 @@ class Task(models.Model):
     has_reminder = models.BooleanField(default=False)
     reminder_date_time = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Date range lookups for the calendar agenda
+            models.Index(fields=['user', 'due_date'], name='goal_task_user_due_idx'),
+            models.Index(fields=['user', 'reminder_date_time'], condition=Q(has_reminder=True), name='goal_task_user_reminder_idx'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -33,23 +33,33 @@
 
 from rest_framework import serializers
 from .models import Goal, Task
+from core.serializers import SparseFieldsMixin
 from accounts.models import CustomUser
 
 
-class GoalSerializer(serializers.ModelSerializer):
+class GoalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    completion_percentage = serializers.SerializerMethodField()
+
     class Meta:
         model = Goal
         fields = [
             'id', 'title', 'start_date', 'completion_date', 'is_completed',
             'completion_time', 'has_reminder', 'reminder_date_time', 'user',
-            'created_by', 'created_at', 'last_modified_by', 'last_modified_at'
+            'created_by', 'created_at', 'last_modified_by', 'last_modified_at',
+            'total_tasks', 'completed_tasks', 'completion_percentage'
+        ]
+        read_only_fields = [
+            'user', 'created_by', 'created_at', 'last_modified_by', 'last_modified_at',
+            'total_tasks', 'completed_tasks'
         ]
-        read_only_fields = ['user', 'created_by', 'created_at', 'last_modified_by', 'last_modified_at']
+
+    def get_completion_percentage(self, obj):
+        return obj.completion_percentage()
 
 
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     goal = serializers.PrimaryKeyRelatedField(queryset=Goal.objects.all())  # Allow goal to be writable
     user = serializers.PrimaryKeyRelatedField(read_only=True)  # Keep user as read-only
 
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from django.db import models
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import CustomUser
+from .models import Goal, Task
+
+def counted_state(instance):
+    """The fields that decide which goal counters a task contributes to"""
+    return (instance.__dict__.get('goal_id'), instance.__dict__.get('status'))
+
+def counter_changes(previous, current):
+    """
+    The {goal_id: (total_delta, completed_delta)} needed to move a task from its
+    previous counted state to its current one. Either state may be None.
+    """
+    changes = defaultdict(lambda: [0, 0])
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is None:
+            continue
+        goal_id, status = state
+        changes[goal_id][0] += sign
+        changes[goal_id][1] += sign if status == 'completed' else 0
+    return changes
+
+@receiver(post_init, sender=Task)
+def remember_counted_state(sender, instance, **kwargs):
+    """
+    Snapshot the task's goal and status as loaded so saves can tell what changed.
+    """
+    instance._loaded_counted_state = counted_state(instance)
+
+@receiver(post_save, sender=Task)
+def update_goal_counters_on_save(sender, instance, created, **kwargs):
+    """
+    Count a new task towards its goal, or move it between counters when its goal
+    or status changes. Other edits cost no queries.
+    """
+    previous = None if created else getattr(instance, '_loaded_counted_state', None)
+    current = counted_state(instance)
+    instance._loaded_counted_state = current
+    if previous == current:
+        return
+    Goal.adjust_task_counters(counter_changes(previous, current))
+
+@receiver(post_delete, sender=Task)
+def update_goal_counters_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Take a deleted task off its goal's counters. Skipped when the goal or the
+    whole user is being deleted, since the counters go with them.
+    """
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if issubclass(origin_model, (Goal, CustomUser)):
+        return
+    previous = getattr(instance, '_loaded_counted_state', None) or counted_state(instance)
+    Goal.adjust_task_counters(counter_changes(previous, None))
@@ -1,3 +1,42 @@
+from datetime import date
 from django.test import TestCase
+from accounts.models import CustomUser
+from .models import Goal, Task
+
+
+class GoalCounterTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='goals@example.com', full_name='Goals')
+        self.goal = Goal.objects.create(
+            user=self.user, title='Ship v2', start_date=date(2024, 4, 1), completion_date=date(2024, 5, 3)
+        )
+        for title in ('Plan', 'Build', 'Test'):
+            Task.objects.create(user=self.user, goal=self.goal, title=title)
+
+    def counters(self):
+        return tuple(Goal.objects.filter(pk=self.goal.pk).values_list('total_tasks', 'completed_tasks').get())
+
+    def test_tasks_update_the_counters(self):
+        self.assertEqual(self.counters(), (3, 0))
+        task = Task.objects.get(title='Plan')
+        task.status = 'completed'
+        task.save()
+        self.assertEqual(self.counters(), (3, 1))
+        task.delete()
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_saving_a_stale_goal_keeps_the_counters(self):
+        stale = Goal.objects.get(pk=self.goal.pk)
+        Task.objects.create(user=self.user, goal=self.goal, title='Release', status='completed')
+        stale.title = 'Ship version 2'
+        stale.save()
+        self.assertEqual(self.counters(), (4, 1))
+        self.assertEqual(Goal.objects.get(pk=self.goal.pk).title, 'Ship version 2')
+
+    def test_stale_completion_update_keeps_the_counters(self):
+        stale = Goal.objects.get(pk=self.goal.pk)
+        Task.objects.create(user=self.user, goal=self.goal, title='Release')
+        stale.is_completed = True
+        stale.save(update_fields=['is_completed', 'total_tasks'])
+        self.assertEqual(self.counters(), (4, 0))
 
-# Create your tests here.
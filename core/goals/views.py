@@ -12,6 +12,7 @@ from .serializers import GoalSerializer, TaskSerializer
 class GoalViewSet(viewsets.ModelViewSet):
     serializer_class = GoalSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         """
@@ -37,6 +38,7 @@ class GoalViewSet(viewsets.ModelViewSet):
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-date_created', '-id')
 
     def get_queryset(self):
         queryset = Task.objects.all()
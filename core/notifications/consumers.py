@@ -0,0 +1,51 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import NotificationState
+from .realtime import user_group_name
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Per-user WebSocket that pushes notification changes as they happen.
+
+    Each socket joins the user's group; events are sent as
+    {"event": <name>, ...payload} where name is one of notification_created,
+    notification_updated, notification_deleted or unread_count.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            logger.warning("Rejected unauthenticated notification socket")
+            await self.close(code=4401)
+            return
+
+        self.group_name = user_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # Give the client a starting point so it can apply deltas from here on
+        await self.send_json({
+            'event': 'unread_count',
+            'unread_count': await self.get_unread_count(user),
+        })
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        """Clients only listen; a ping keeps intermediaries from closing idle sockets"""
+        if content.get('action') == 'ping':
+            await self.send_json({'event': 'pong'})
+
+    async def notification_event(self, message):
+        """Forward an event sent to the user's group by notifications.realtime"""
+        await self.send_json({'event': message['event'], **message['payload']})
+
+    @database_sync_to_async
+    def get_unread_count(self, user):
+        return NotificationState.unread_count_for(user)
@@ -26,30 +26,21 @@ class Command(BaseCommand):
         
         # For each project, check related notifications
         for project in projects:
-            project_notifications = Notification.objects.filter(
-                source_id=project.id
-            )
+            project_notifications = project.notifications.all()
             self.stdout.write(f"Project {project.id} ({project.name}) has {project_notifications.count()} notifications")
-            
-            # Check if there are any notifications with project name in message
-            project_name_notifications = Notification.objects.filter(
-                message__contains=f"project '{project.name}'"
-            )
-            self.stdout.write(f"  - Notifications mentioning project name: {project_name_notifications.count()}")
-            
+
             # List all these notifications
-            for notification in project_name_notifications:
-                self.stdout.write(f"    - {notification.notification_type}: {notification.message} (source_id: {notification.source_id})")
-        
+            for notification in project_notifications:
+                self.stdout.write(f"    - {notification.notification_type}: {notification.message} (invitation: {notification.invitation_id})")
+
         # Get all invitations
         invitations = TeamInvitation.objects.all()
         self.stdout.write(f"Total invitations: {invitations.count()}")
         
         # For each invitation, check related notifications
         for invitation in invitations:
-            invitation_notifications = Notification.objects.filter(
-                source_id=invitation.id,
-                Q(notification_type='invitation_accepted') | 
+            invitation_notifications = invitation.notifications.filter(
+                Q(notification_type='invitation_accepted') |
                 Q(notification_type='invitation_rejected')
             )
             self.stdout.write(f"Invitation {invitation.id} has {invitation_notifications.count()} notifications")
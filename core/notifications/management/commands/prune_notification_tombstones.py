@@ -0,0 +1,29 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from notifications.models import NotificationState, NotificationTombstone
+
+class Command(BaseCommand):
+    help = 'Delete old notification tombstones; clients with older sync cursors get a full resync'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Keep tombstones newer than this many days')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stale = NotificationTombstone.objects.filter(deleted_at__lt=cutoff)
+
+        with transaction.atomic():
+            # Raise each user's floor first so cursors that needed these tombstones reset
+            floors = stale.values('user_id').annotate(floor=Max('sequence'))
+            for row in floors:
+                NotificationState.objects.filter(
+                    user_id=row['user_id'],
+                    tombstone_floor__lt=row['floor']
+                ).update(tombstone_floor=row['floor'])
+
+            deleted, _ = stale.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} notification tombstones older than {options['days']} days"))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from notifications.scheduler import fire_due_reminders, next_due_at
+
+class Command(BaseCommand):
+    help = 'Run the reminder worker: turn queued goal and task reminders into notifications when they are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Reminders to fire per transaction')
+        parser.add_argument('--interval', type=float, default=30.0, help='Longest time to sleep between checks, in seconds')
+        parser.add_argument('--once', action='store_true', help='Fire everything that is due now and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write(self.style.SUCCESS('Reminder worker started'))
+
+        while True:
+            fired = 0
+            # Drain everything that is due before sleeping
+            while True:
+                processed = fire_due_reminders(batch_size=batch_size)
+                fired += processed
+                if processed < batch_size:
+                    break
+            if fired:
+                self.stdout.write(f"Fired {fired} reminders")
+
+            if options['once']:
+                break
+
+            # Sleep until the next reminder is due, but wake up regularly to pick up new ones
+            sleep_for = options['interval']
+            upcoming = next_due_at()
+            if upcoming is not None:
+                sleep_for = min(sleep_for, max((upcoming - timezone.now()).total_seconds(), 1.0))
+            time.sleep(sleep_for)
@@ -0,0 +1,47 @@
+from urllib.parse import parse_qs
+from django.contrib.auth.models import AnonymousUser
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def get_user_from_token(raw_token):
+    """Resolve a raw JWT access token to a user, or AnonymousUser if it is invalid"""
+    authentication = JWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return authentication.get_user(validated_token)
+    except (InvalidToken, TokenError) as e:
+        logger.warning(f"Rejected WebSocket token: {str(e)}")
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with the same JWT access tokens used by the REST API.
+
+    Browsers can't set an Authorization header on a WebSocket handshake, so the token
+    is read from the `token` query parameter first and the header is used as a fallback.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        raw_token = self.get_raw_token(scope)
+        scope['user'] = await get_user_from_token(raw_token) if raw_token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    def get_raw_token(self, scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+
+        headers = dict(scope.get('headers', []))
+        auth_header = headers.get(b'authorization', b'').decode()
+        if auth_header.startswith('Bearer '):
+            return auth_header.split(' ', 1)[1]
+        return None
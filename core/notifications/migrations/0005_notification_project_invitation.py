@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:30
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+INVITATION_TYPES = ['invitation_accepted', 'invitation_rejected', 'project_invitation']
+PROJECT_NAME = re.compile(r"project '(.*)'")
+
+
+def backfill_project_references(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    TeamInvitation = apps.get_model('work', 'TeamInvitation')
+    Project = apps.get_model('work', 'Project')
+
+    notifications = Notification.objects.filter(notification_type__in=INVITATION_TYPES)
+
+    # Invitation notifications store the invitation id in source_id
+    invitations = {
+        invitation.id: invitation
+        for invitation in TeamInvitation.objects.filter(
+            id__in=notifications.values('source_id')
+        )
+    }
+
+    for notification in notifications.iterator():
+        invitation = invitations.get(notification.source_id)
+        if invitation is not None:
+            notification.invitation_id = invitation.id
+            notification.project_id = invitation.project_id
+        else:
+            # The invitation is gone; fall back to the project name in the message,
+            # but only when it identifies a single project
+            match = PROJECT_NAME.search(notification.message)
+            if not match:
+                continue
+            project_ids = list(Project.objects.filter(name=match.group(1)).values_list('id', flat=True)[:2])
+            if len(project_ids) != 1:
+                continue
+            notification.project_id = project_ids[0]
+        # Queryset update leaves the change sequence alone; clients get the new
+        # fields on their next full sync
+        Notification.objects.filter(pk=notification.pk).update(
+            invitation_id=notification.invitation_id,
+            project_id=notification.project_id
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_indexes_unread_count'),
+        ('work', '0005_alter_teaminvitation_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='invitation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='work.teaminvitation'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='work.project'),
+        ),
+        migrations.RunPython(backfill_project_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def queue_upcoming_reminders(apps, schema_editor):
+    ScheduledReminder = apps.get_model('notifications', 'ScheduledReminder')
+    sources = [
+        ('goal', apps.get_model('goals', 'Goal')),
+        ('goal_task', apps.get_model('goals', 'Task')),
+        ('task', apps.get_model('task', 'Task')),
+    ]
+    now = timezone.now()
+
+    # Reminders that are already due were materialized when they were saved
+    for kind, model in sources:
+        upcoming = model.objects.filter(
+            has_reminder=True,
+            reminder_date_time__gt=now
+        ).values_list('id', 'user_id', 'reminder_date_time')
+        ScheduledReminder.objects.bulk_create(
+            [
+                ScheduledReminder(kind=kind, object_id=object_id, user_id=user_id, due_at=due_at)
+                for object_id, user_id, due_at in upcoming
+            ],
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_project_invitation'),
+        ('goals', '0007_task_has_reminder_task_reminder_date_time'),
+        ('task', '0004_add_reminder_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('goal', 'Goal'), ('goal_task', 'Goal Task'), ('task', 'Task')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('due_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_scheduled_reminder')],
+            },
+        ),
+        migrations.RunPython(queue_upcoming_reminders, migrations.RunPython.noop),
+    ]
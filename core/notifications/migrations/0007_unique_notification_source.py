@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def retype_goal_task_reminders(apps, schema_editor):
+    """
+    Goal task reminders used to share 'task_due' with independent task reminders,
+    although their ids come from a different table. Give them their own type before
+    duplicates are removed, so a goal task and a task with the same id both keep theirs.
+    """
+    Notification = apps.get_model('notifications', 'Notification')
+    GoalTask = apps.get_model('goals', 'Task')
+    IndependentTask = apps.get_model('task', 'Task')
+
+    reminders = Notification.objects.filter(notification_type='task_due', source_id__isnull=False)
+    # Goal tasks with a goal had their own title
+    reminders.filter(title__startswith='Goal Task Reminder: ').update(notification_type='goal_task_due')
+    # The rest belong to a goal task when only a goal task of that user has the id,
+    # or when both do and the title names the goal task
+    rows = reminders.values_list('id', 'user_id', 'source_id', 'title')
+    for notification_id, user_id, source_id, title in rows.iterator():
+        goal_task_title = GoalTask.objects.filter(pk=source_id, user_id=user_id).values_list('title', flat=True).first()
+        if goal_task_title is None:
+            continue
+        task_title = IndependentTask.objects.filter(pk=source_id, user_id=user_id).values_list('title', flat=True).first()
+        if task_title is None or (
+            title == f"Task Reminder: {goal_task_title}" and title != f"Task Reminder: {task_title}"
+        ):
+            Notification.objects.filter(pk=notification_id).update(notification_type='goal_task_due')
+
+
+def remove_duplicate_notifications(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationState = apps.get_model('notifications', 'NotificationState')
+
+    duplicates = (
+        Notification.objects.order_by()
+        .filter(source_id__isnull=False)
+        .values('user_id', 'notification_type', 'source_id')
+        .annotate(keep_id=models.Max('id'), copies=models.Count('id'))
+        .filter(copies__gt=1)
+    )
+    affected_users = set()
+    for row in duplicates:
+        Notification.objects.filter(
+            user_id=row['user_id'],
+            notification_type=row['notification_type'],
+            source_id=row['source_id']
+        ).exclude(id=row['keep_id']).delete()
+        affected_users.add(row['user_id'])
+
+    for user_id in affected_users:
+        NotificationState.objects.filter(user_id=user_id).update(
+            unread_count=Notification.objects.filter(user_id=user_id, is_read=False).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_scheduledreminder'),
+        ('goals', '0007_task_has_reminder_task_reminder_date_time'),
+        ('task', '0004_add_reminder_fields'),
+        ('work', '0005_alter_teaminvitation_unique_together'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('goal_reminder', 'Goal Reminder'), ('task_due', 'Task Due'), ('goal_task_due', 'Goal Task Due'), ('system', 'System Notification'), ('invitation_accepted', 'Invitation Accepted'), ('invitation_rejected', 'Invitation Rejected'), ('project_invitation', 'Project Invitation')], max_length=20),
+        ),
+        migrations.RunPython(retype_goal_task_reminders, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_notifications, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_user_type_source_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('user', 'notification_type', 'source_id'), name='unique_notification_source'),
+        ),
+    ]
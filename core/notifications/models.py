@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from accounts.models import CustomUser
 from goals.models import Goal
@@ -10,6 +10,7 @@ class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('goal_reminder', 'Goal Reminder'),
         ('task_due', 'Task Due'),
+        ('goal_task_due', 'Goal Task Due'),
         ('system', 'System Notification'),
         ('invitation_accepted', 'Invitation Accepted'),
         ('invitation_rejected', 'Invitation Rejected'),
@@ -24,13 +25,71 @@ class Notification(models.Model):
     due_date_time = models.DateTimeField(null=True, blank=True)
     is_read = models.BooleanField(default=False)
     source_id = models.IntegerField(null=True, blank=True)  # ID of the related item (goal, task, etc.)
+    # Typed references for project and invitation notifications, so cleanup uses
+    # indexed lookups and cascades instead of matching project names in `message`
+    project = models.ForeignKey('work.Project', on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    invitation = models.ForeignKey('work.TeamInvitation', on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    sequence = models.BigIntegerField(default=0)  # Per-user change sequence, bumped on every write
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One notification per item and kind; also the index for reminder/invitation
+            # lookups and the conflict target for upserts
+            models.UniqueConstraint(fields=['user', 'notification_type', 'source_id'], name='unique_notification_source'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'sequence', 'id'], name='notif_user_sequence_idx'),
+            # Default list ordering
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # Unread filters only ever touch the (small) unread subset
+            models.Index(
+                fields=['user', 'notification_type'],
+                condition=models.Q(is_read=False),
+                name='notif_user_unread_type_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        """Stamp every write with the user's next change sequence and keep the unread counter current"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'sequence'}
+
+        # Allocating the sequence and writing the row in one transaction keeps the
+        # per-user state locked until commit, so sequences become visible in order
+        # and the unread counter can't drift from the rows
+        with transaction.atomic():
+            self.sequence = NotificationState.next_sequence(self.user_id, unread_delta=self.unread_delta)
+            super().save(*args, **kwargs)
+        # The row now matches the instance, so a later save only reports its own change
+        self._loaded_is_read = self.is_read
+
+    @classmethod
+    def mark_all_read(cls, user):
+        """Mark all of a user's notifications as read under a single change sequence"""
+        with transaction.atomic():
+            sequence = NotificationState.next_sequence(user.id)
+            updated = cls.objects.filter(user=user, is_read=False).update(is_read=True, sequence=sequence)
+            NotificationState.objects.filter(user=user).update(unread_count=0)
+            return updated
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored read flag so signals can report unread count deltas
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
+
+    @property
+    def unread_delta(self):
+        """How saving this instance changes its user's unread count"""
+        was_unread = getattr(self, '_loaded_is_read', True) is False
+        return int(not self.is_read) - int(was_unread)
+
     @property
     def is_past_due(self):
         """Check if the notification is past due"""
@@ -39,129 +98,177 @@ class Notification(models.Model):
         return False
 
     @classmethod
-    def create_goal_reminder(cls, goal):
-        """Create a notification for a goal reminder"""
+    def upsert(cls, notifications, update_fields):
+        """
+        Insert or update notifications keyed on (user, notification_type, source_id).
+
+        Each user's batch is written with a single INSERT ... ON CONFLICT DO UPDATE
+        under their NotificationState lock, so the number of queries doesn't grow
+        with the batch and concurrent saves can't create duplicates. Change sequence,
+        unread counter and WebSocket pushes are maintained as save() would.
+        Returns the stored notifications.
+        """
+        from .realtime import push_notification
+
+        by_user = {}
+        for notification in notifications:
+            # A key may only appear once per ON CONFLICT statement; the last one wins
+            key = (notification.notification_type, notification.source_id)
+            by_user.setdefault(notification.user_id, {})[key] = notification
+
+        saved_filter, previous_read = models.Q(pk__in=[]), {}
+        with transaction.atomic():
+            for user_id, batch in by_user.items():
+                sequence = NotificationState.next_sequence(user_id)
+                batch_filter = models.Q(
+                    user_id=user_id,
+                    notification_type__in={key[0] for key in batch},
+                    source_id__in={key[1] for key in batch}
+                )
+                existing = cls.objects.filter(batch_filter).values_list('notification_type', 'source_id', 'is_read')
+                previous = {(kind, source_id): is_read for kind, source_id, is_read in existing}
+
+                unread_delta = 0
+                for key, notification in batch.items():
+                    notification.sequence = sequence
+                    was_unread = previous.get(key) is False
+                    unread_delta += int(not notification.is_read) - int(was_unread)
+                    previous_read[(user_id,) + key] = previous.get(key)
+
+                cls.objects.bulk_create(
+                    list(batch.values()),
+                    update_conflicts=True,
+                    unique_fields=['user', 'notification_type', 'source_id'],
+                    update_fields=list(update_fields) + ['sequence'],
+                )
+                saved_filter |= batch_filter
+                if unread_delta:
+                    NotificationState.objects.filter(user_id=user_id).update(
+                        unread_count=models.F('unread_count') + unread_delta
+                    )
+
+            # Read the rows back (the filters may match a few extra keys, which are dropped)
+            saved = [
+                notification for notification in cls.objects.filter(saved_filter).order_by('id')
+                if (notification.user_id, notification.notification_type, notification.source_id) in previous_read
+            ]
+            for notification in saved:
+                was_read = previous_read[(notification.user_id, notification.notification_type, notification.source_id)]
+                notification._loaded_is_read = was_read
+                event = 'notification_created' if was_read is None else 'notification_updated'
+                push_notification(notification, event, unread_delta=notification.unread_delta)
+                notification._loaded_is_read = notification.is_read
+        return saved
+
+    @classmethod
+    def build_goal_reminder(cls, goal):
+        """Unsaved reminder notification for a goal, or None if it has no reminder"""
         if not goal.has_reminder or not goal.reminder_date_time:
             return None
-
-        # Check if a notification for this goal already exists
-        existing = cls.objects.filter(
-            user=goal.user,
+        return cls(
+            user_id=goal.user_id,
+            title=f"Goal Reminder: {goal.title}",
+            message=f"Reminder for your goal: {goal.title}",
             notification_type='goal_reminder',
-            source_id=goal.id
-        ).first()
-
-        if existing:
-            # Update existing notification
-            existing.title = f"Goal Reminder: {goal.title}"
-            existing.message = f"Reminder for your goal: {goal.title}"
-            existing.due_date_time = goal.reminder_date_time
-            existing.is_read = False
-            existing.save()
-            return existing
-        else:
-            # Create new notification
-            return cls.objects.create(
-                user=goal.user,
-                title=f"Goal Reminder: {goal.title}",
-                message=f"Reminder for your goal: {goal.title}",
-                notification_type='goal_reminder',
-                due_date_time=goal.reminder_date_time,
-                source_id=goal.id
-            )
+            due_date_time=goal.reminder_date_time,
+            source_id=goal.id,
+            is_read=False
+        )
 
     @classmethod
-    def remove_goal_reminder(cls, goal_id):
-        """Remove notifications for a goal"""
-        cls.objects.filter(
+    def build_task_reminder(cls, task):
+        """Unsaved reminder notification for a goal or independent task, or None if it has no reminder or is completed"""
+        # Import Task models here to avoid circular import
+        from goals.models import Task as GoalTask
+
+        if not task.has_reminder or not task.reminder_date_time or task.status == 'completed':
+            return None
+
+        # Create appropriate message based on whether it's a goal task. Goal tasks and
+        # independent tasks are separate tables whose ids overlap, so they need their
+        # own notification type to keep their keys apart.
+        notification_type = 'task_due'
+        title = f"Task Reminder: {task.title}"
+        message = f"Reminder for your task: {task.title}"
+        if isinstance(task, GoalTask):
+            notification_type = 'goal_task_due'
+            if task.goal_id:
+                title = f"Goal Task Reminder: {task.title}"
+                message = f"Reminder for your goal task: {task.title} (Goal: {task.goal.title})"
+
+        return cls(
+            user_id=task.user_id,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            due_date_time=task.reminder_date_time,
+            source_id=task.id,
+            is_read=False
+        )
+
+    @classmethod
+    def bulk_upsert_reminders(cls, goals_or_tasks):
+        """
+        Create or refresh the reminder notifications for many goals and tasks at once.
+
+        Items without an active reminder are skipped. The query count is constant per
+        user, so importing or editing hundreds of tasks doesn't cost two queries each.
+        For goal tasks, select_related('goal') avoids a query per task for the goal title.
+        """
+        from goals.models import Goal
+
+        reminders = []
+        for item in goals_or_tasks:
+            build = cls.build_goal_reminder if isinstance(item, Goal) else cls.build_task_reminder
+            reminder = build(item)
+            if reminder is not None:
+                reminders.append(reminder)
+        if not reminders:
+            return []
+        return cls.upsert(reminders, update_fields=['title', 'message', 'due_date_time', 'is_read'])
+
+    @classmethod
+    def create_goal_reminder(cls, goal):
+        """Create or update the notification for a goal reminder"""
+        saved = cls.bulk_upsert_reminders([goal])
+        return saved[0] if saved else None
+
+    @classmethod
+    def remove_goal_reminder(cls, goal_id, user=None):
+        """Remove notifications for a goal; pass the owner to use the (user, type, source) index"""
+        reminders = cls.objects.filter(
             notification_type='goal_reminder',
             source_id=goal_id
-        ).delete()
+        )
+        if user is not None:
+            reminders = reminders.filter(user=user)
+        reminders.delete()
 
     @classmethod
     def create_task_reminder(cls, task):
-        """Create a notification for a task reminder"""
-        # Import Task models here to avoid circular import
+        """Create or update the notification for a task reminder"""
         try:
-            from task.models import Task as IndependentTask
-            from goals.models import Task as GoalTask
-
-            print(f"Creating task reminder for task ID: {task.id}, title: {task.title}")
-
-            # Check if task has the required attributes
-            if not hasattr(task, 'has_reminder') or not hasattr(task, 'reminder_date_time'):
-                print(f"Task {task.id} missing required attributes")
-                return None
-
-            # Check if task has reminder enabled
-            if not task.has_reminder or not task.reminder_date_time:
-                print(f"Task {task.id} has no reminder or reminder_date_time is None")
-                return None
-
-            print(f"Task {task.id} has reminder: {task.has_reminder}, time: {task.reminder_date_time}")
-
-            # Check if task has user attribute
-            if not hasattr(task, 'user'):
-                print(f"Task {task.id} has no user attribute")
-                return None
-
-            print(f"Task {task.id} has user: {task.user}")
-
-            # Check if a notification for this task already exists
-            existing = cls.objects.filter(
-                user=task.user,
-                notification_type='task_due',
-                source_id=task.id
-            ).first()
-
-            # Check if this is a goal task (has goal attribute)
-            goal_title = None
-            if hasattr(task, 'goal') and task.goal:
-                try:
-                    goal_title = task.goal.title
-                    print(f"Task {task.id} belongs to goal: {goal_title}")
-                except Exception as e:
-                    print(f"Error getting goal title: {e}")
-
-            # Create appropriate message based on whether it's a goal task
-            title = f"Task Reminder: {task.title}"
-            if isinstance(task, GoalTask) and goal_title:
-                message = f"Reminder for your goal task: {task.title} (Goal: {goal_title})"
-                title = f"Goal Task Reminder: {task.title}"
-            else:
-                message = f"Reminder for your task: {task.title}"
-
-            if existing:
-                # Update existing notification
-                print(f"Updating existing notification for task {task.id}")
-                existing.title = title
-                existing.message = message
-                existing.due_date_time = task.reminder_date_time
-                existing.is_read = False
-                existing.save()
-                return existing
-            else:
-                # Create new notification
-                print(f"Creating new notification for task {task.id}")
-                return cls.objects.create(
-                    user=task.user,
-                    title=title,
-                    message=message,
-                    notification_type='task_due',
-                    due_date_time=task.reminder_date_time,
-                    source_id=task.id
-                )
+            saved = cls.bulk_upsert_reminders([task])
+            return saved[0] if saved else None
         except Exception as e:
             print(f"Error creating task reminder: {e}")
             return None
 
     @classmethod
-    def remove_task_reminder(cls, task_id):
-        """Remove notifications for a task"""
-        cls.objects.filter(
-            notification_type='task_due',
+    def remove_task_reminder(cls, task_id, user=None, notification_type='task_due'):
+        """Remove notifications for an independent task; pass the owner to use the (user, type, source) index"""
+        reminders = cls.objects.filter(
+            notification_type=notification_type,
             source_id=task_id
-        ).delete()
+        )
+        if user is not None:
+            reminders = reminders.filter(user=user)
+        reminders.delete()
+
+    @classmethod
+    def remove_goal_task_reminder(cls, task_id, user=None):
+        """Remove notifications for a goal task"""
+        cls.remove_task_reminder(task_id, user=user, notification_type='goal_task_due')
 
     @classmethod
     def create_invitation_notification(cls, invitation, action):
@@ -175,36 +282,24 @@ class Notification(models.Model):
         if action not in ['accepted', 'rejected']:
             return None
 
-        notification_type = f'invitation_{action}'
-
         # Create notification for the sender of the invitation
         title = f"Invitation {action.capitalize()}"
         message = f"{invitation.recipient.full_name} has {action} your invitation to join project '{invitation.project.name}'"
 
-        # Check if a notification for this invitation already exists
-        existing = cls.objects.filter(
-            user=invitation.sender,
-            notification_type=notification_type,
-            source_id=invitation.id
-        ).first()
-
-        if existing:
-            # Update existing notification
-            existing.title = title
-            existing.message = message
-            existing.is_read = False
-            existing.created_at = timezone.now()  # Update timestamp to bring to top
-            existing.save()
-            return existing
-        else:
-            # Create new notification
-            return cls.objects.create(
-                user=invitation.sender,
+        # Responding again refreshes the existing notification and brings it to the top
+        return cls.upsert([
+            cls(
+                user_id=invitation.sender_id,
                 title=title,
                 message=message,
-                notification_type=notification_type,
-                source_id=invitation.id
+                notification_type=f'invitation_{action}',
+                source_id=invitation.id,
+                project_id=invitation.project_id,
+                invitation=invitation,
+                is_read=False,
+                created_at=timezone.now()
             )
+        ], update_fields=['title', 'message', 'is_read', 'created_at', 'project', 'invitation'])[0]
 
     @classmethod
     def create_project_invitation_notification(cls, invitation, is_reinvitation=False):
@@ -215,20 +310,18 @@ class Notification(models.Model):
             invitation: The TeamInvitation object
             is_reinvitation: Whether this is a re-invitation after the user left
         """
-        # Delete any existing project invitation notifications for this project and recipient
-        from django.db.models import Q
+        # Delete any existing project invitation notifications for this invitation and recipient
         cls.objects.filter(
-            Q(notification_type='project_invitation'),
-            Q(user=invitation.recipient),
-            Q(source_id=invitation.id)
+            notification_type='project_invitation',
+            user=invitation.recipient,
+            source_id=invitation.id
         ).delete()
 
-        # Also delete any accepted/rejected invitation notifications
+        # Also delete any accepted/rejected invitation notifications for this project
         cls.objects.filter(
-            Q(notification_type='invitation_accepted') |
-            Q(notification_type='invitation_rejected'),
-            Q(user=invitation.recipient),
-            Q(message__contains=f"project '{invitation.project.name}'")
+            notification_type__in=['invitation_accepted', 'invitation_rejected'],
+            user=invitation.recipient,
+            project=invitation.project
         ).delete()
 
         # Create the notification message based on whether this is a re-invitation
@@ -245,5 +338,118 @@ class Notification(models.Model):
             title=title,
             message=message,
             notification_type='project_invitation',
-            source_id=invitation.id
+            source_id=invitation.id,
+            project=invitation.project,
+            invitation=invitation
+        )
+
+
+class NotificationState(models.Model):
+    """
+    Per-user bookkeeping for notifications.
+
+    `last_sequence` is the change counter handed out to notification writes and
+    tombstones; `tombstone_floor` is the highest sequence whose tombstones have
+    been pruned, so cursors older than it can no longer be synced incrementally.
+    `unread_count` is kept in step with the user's unread notifications so reading
+    it never has to count rows.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='notification_state')
+    last_sequence = models.BigIntegerField(default=0)
+    tombstone_floor = models.BigIntegerField(default=0)
+    unread_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Notification state for {self.user_id} (sequence {self.last_sequence})"
+
+    @classmethod
+    def next_sequence(cls, user_id, unread_delta=0):
+        """
+        Allocate the user's next change sequence and apply an unread count change.
+
+        Must be called inside a transaction: the row stays locked until commit, which
+        serializes a user's notification writes in sequence order.
+        """
+        state, _ = cls.objects.select_for_update().get_or_create(user_id=user_id)
+        state.last_sequence += 1
+        state.unread_count = max(state.unread_count + unread_delta, 0)
+        state.save(update_fields=['last_sequence', 'unread_count'])
+        return state.last_sequence
+
+    @classmethod
+    def unread_count_for(cls, user):
+        """Read a user's unread notification count without counting rows"""
+        count = cls.objects.filter(user=user).values_list('unread_count', flat=True).first()
+        if count is None:
+            count = Notification.objects.filter(user=user, is_read=False).count()
+        return count
+
+    @classmethod
+    def rebuild(cls, user):
+        """Recount a user's unread notifications, e.g. after editing rows outside the model"""
+        count = Notification.objects.filter(user=user, is_read=False).count()
+        cls.objects.update_or_create(user=user, defaults={'unread_count': count})
+        return count
+
+
+class NotificationTombstone(models.Model):
+    """
+    Record of a deleted notification so incremental sync can tell clients to drop it.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='notification_tombstones')
+    notification_id = models.BigIntegerField()
+    sequence = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sequence', 'notification_id'], name='notif_tomb_user_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted notification {self.notification_id} for {self.user_id}"
+
+
+class ScheduledReminder(models.Model):
+    """
+    Due queue for goal and task reminders.
+
+    Saving a goal or task only upserts or deletes its row here; the reminder worker
+    (`manage.py run_reminders`) reads the queue in `due_at` order from the index and
+    materializes the notifications once they are due.
+    """
+    KIND_GOAL = 'goal'
+    KIND_GOAL_TASK = 'goal_task'
+    KIND_TASK = 'task'
+    KINDS = [
+        (KIND_GOAL, 'Goal'),
+        (KIND_GOAL_TASK, 'Goal Task'),
+        (KIND_TASK, 'Task'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='scheduled_reminders')
+    due_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_scheduled_reminder'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} due {self.due_at}"
+
+    @classmethod
+    def schedule(cls, kind, obj):
+        """Queue (or move) the reminder for a goal or task in a single upsert"""
+        cls.objects.bulk_create(
+            [cls(kind=kind, object_id=obj.id, user_id=obj.user_id, due_at=obj.reminder_date_time)],
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['user', 'due_at'],
         )
+
+    @classmethod
+    def unschedule(cls, kind, object_id):
+        cls.objects.filter(kind=kind, object_id=object_id).delete()
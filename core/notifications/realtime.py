@@ -0,0 +1,53 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def user_group_name(user_id):
+    """Channel layer group that every open socket of a user joins"""
+    return f"notifications_user_{user_id}"
+
+
+def push_to_user(user_id, event, payload):
+    """
+    Send an event to all of a user's connected clients once the current transaction commits.
+
+    Delivery is best effort: a missing or failing channel layer never breaks the request
+    that created the notification, clients simply fall back to fetching the list.
+    """
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                user_group_name(user_id),
+                {'type': 'notification.event', 'event': event, 'payload': payload}
+            )
+        except Exception as e:
+            logger.error(f"Error pushing {event} to user {user_id}: {str(e)}")
+
+    transaction.on_commit(send)
+
+
+def push_notification(notification, event, unread_delta=0):
+    """Push a created/updated/deleted notification together with the unread count change"""
+    from .serializers import NotificationSerializer
+
+    if event == 'notification_deleted':
+        data = {'id': notification.id}
+    else:
+        data = NotificationSerializer(notification).data
+
+    push_to_user(notification.user_id, event, {
+        'notification': data,
+        'unread_delta': unread_delta,
+    })
+
+
+def push_unread_count(user_id, unread_count):
+    """Push an absolute unread count, used after bulk changes that bypass model signals"""
+    push_to_user(user_id, 'unread_count', {'unread_count': unread_count})
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.utils import timezone
+from goals.models import Goal, Task as GoalTask
+from task.models import Task as IndependentTask
+from .models import Notification, ScheduledReminder
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How each queued kind is loaded; related rows used in the reminder text come along
+REMINDER_SOURCES = {
+    ScheduledReminder.KIND_GOAL: Goal.objects.all(),
+    ScheduledReminder.KIND_GOAL_TASK: GoalTask.objects.select_related('goal'),
+    ScheduledReminder.KIND_TASK: IndependentTask.objects.all(),
+}
+
+
+def fire_due_reminders(now=None, batch_size=100):
+    """
+    Materialize one batch of due reminders and remove them from the queue.
+
+    Rows are claimed with SKIP LOCKED where the database supports it, so several
+    workers can drain the queue without firing the same reminder twice.
+    Returns the number of queue entries processed.
+    """
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        due = list(
+            ScheduledReminder.objects.select_for_update(skip_locked=True)
+            .filter(due_at__lte=now)
+            .order_by('due_at')[:batch_size]
+        )
+        if not due:
+            return 0
+
+        # Load each kind's targets with one query instead of one per reminder
+        targets = []
+        for kind, queryset in REMINDER_SOURCES.items():
+            ids = [reminder.object_id for reminder in due if reminder.kind == kind]
+            if ids:
+                targets += queryset.filter(pk__in=ids)
+
+        # Items that lost their reminder after being queued are skipped by the upsert
+        Notification.bulk_upsert_reminders(targets)
+
+        ScheduledReminder.objects.filter(pk__in=[reminder.pk for reminder in due]).delete()
+
+    logger.info(f"Processed {len(due)} due reminders")
+    return len(due)
+
+
+def next_due_at():
+    """When the earliest queued reminder is due, or None if the queue is empty"""
+    return ScheduledReminder.objects.order_by('due_at').values_list('due_at', flat=True).first()
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Notification
+from core.serializers import SparseFieldsMixin
 from django.utils import timezone
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     remaining_time = serializers.SerializerMethodField()
     formatted_due_date_time = serializers.SerializerMethodField()
     
@@ -10,10 +11,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = [
             'id', 'user', 'title', 'message', 'notification_type', 
-            'created_at', 'due_date_time', 'is_read', 'source_id',
+            'created_at', 'due_date_time', 'is_read', 'source_id', 'project', 'invitation',
             'remaining_time', 'formatted_due_date_time', 'is_past_due'
         ]
-        read_only_fields = ['user', 'created_at']
+        read_only_fields = ['user', 'created_at', 'project', 'invitation']
     
     def get_remaining_time(self, obj):
         """Calculate remaining time until the notification is due"""
@@ -1,93 +1,135 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import models
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from accounts.models import CustomUser
 from goals.models import Goal, Task as GoalTask
 from task.models import Task as IndependentTask
-from .models import Notification
+from .models import Notification, NotificationState, NotificationTombstone, ScheduledReminder
+from .realtime import push_notification
+
+def reminder_state(instance):
+    """The fields that decide whether and when an item is reminded (goals have no status)"""
+    return (
+        instance.__dict__.get('has_reminder'),
+        instance.__dict__.get('reminder_date_time'),
+        instance.__dict__.get('status'),
+    )
+
+def reminder_due(state):
+    """When an item in this state should be reminded, or None; completed tasks aren't"""
+    has_reminder, reminder_date_time, status = state
+    if has_reminder and reminder_date_time and status != 'completed':
+        return reminder_date_time
+    return None
+
+def sync_reminder(kind, instance, created, remove_notification):
+    """
+    Keep the reminder queue in step with a saved goal or task.
+
+    Only does work when the time the item is due to be reminded changes, so
+    ordinary edits (titles, most status changes) cost no extra queries. Turning the
+    reminder off or completing the task cancels it. Notifications are materialized
+    later by the reminder worker.
+    """
+    previous = None if created else getattr(instance, '_loaded_reminder', None)
+    current = reminder_state(instance)
+    instance._loaded_reminder = current
+    # Status changes that don't start or stop the reminder (pending -> in progress) change nothing
+    if previous is not None and reminder_due(current) == reminder_due(previous):
+        return
+
+    if reminder_due(current):
+        ScheduledReminder.schedule(kind, instance)
+    elif not created:
+        ScheduledReminder.unschedule(kind, instance.id)
+
+    # A reminder that already fired is stale once it moves, is turned off or the task is done
+    if not created and (previous is None or reminder_due(previous)):
+        remove_notification(instance.id, user=instance.user_id)
+
+@receiver(post_init, sender=Goal)
+@receiver(post_init, sender=GoalTask)
+@receiver(post_init, sender=IndependentTask)
+def remember_reminder_state(sender, instance, **kwargs):
+    """
+    Snapshot the reminder fields as loaded so saves can tell whether they changed.
+    """
+    instance._loaded_reminder = reminder_state(instance)
 
 @receiver(post_save, sender=Goal)
-def create_or_update_goal_notification(sender, instance, created, **kwargs):
+def schedule_goal_reminder(sender, instance, created, **kwargs):
     """
-    Create or update a notification when a goal is created or updated with a reminder.
+    Queue, move or cancel a goal's reminder when its reminder fields change.
     """
-    if hasattr(instance, 'has_reminder') and instance.has_reminder and instance.reminder_date_time:
-        Notification.create_goal_reminder(instance)
-    elif hasattr(instance, 'has_reminder') and not instance.has_reminder:
-        # If reminder was removed, remove the notification
-        Notification.remove_goal_reminder(instance.id)
+    sync_reminder(ScheduledReminder.KIND_GOAL, instance, created, Notification.remove_goal_reminder)
 
 @receiver(post_delete, sender=Goal)
 def delete_goal_notification(sender, instance, **kwargs):
     """
-    Delete notifications when a goal is deleted.
+    Delete the queued reminder and notifications when a goal is deleted.
     """
-    Notification.remove_goal_reminder(instance.id)
+    ScheduledReminder.unschedule(ScheduledReminder.KIND_GOAL, instance.id)
+    Notification.remove_goal_reminder(instance.id, user=instance.user_id)
 
 @receiver(post_save, sender=GoalTask)
-def create_or_update_goal_task_notification(sender, instance, created, **kwargs):
+def schedule_goal_task_reminder(sender, instance, created, **kwargs):
     """
-    Create or update a notification when a goal task is created or updated with a reminder.
+    Queue, move or cancel a goal task's reminder when its reminder fields change.
     """
-    print(f"Signal received for Goal Task {instance.id} - {instance.title}")
-
-    # Check if the Task model has the required attributes
-    has_reminder_attr = hasattr(instance, 'has_reminder')
-    has_reminder_time_attr = hasattr(instance, 'reminder_date_time')
-
-    print(f"Goal Task has 'has_reminder' attribute: {has_reminder_attr}")
-    print(f"Goal Task has 'reminder_date_time' attribute: {has_reminder_time_attr}")
-
-    # Only proceed if the task has both required attributes
-    if has_reminder_attr and has_reminder_time_attr:
-        print(f"Goal Task has reminder: {instance.has_reminder}, Reminder time: {instance.reminder_date_time}")
-
-        if instance.has_reminder and instance.reminder_date_time:
-            print(f"Creating notification for goal task {instance.id}")
-            Notification.create_task_reminder(instance)
-        elif not instance.has_reminder or instance.status == 'completed':
-            print(f"Removing notification for goal task {instance.id}")
-            Notification.remove_task_reminder(instance.id)
-    else:
-        print(f"Goal Task {instance.id} does not have reminder attributes, skipping notification handling")
+    sync_reminder(ScheduledReminder.KIND_GOAL_TASK, instance, created, Notification.remove_goal_task_reminder)
 
 @receiver(post_save, sender=IndependentTask)
-def create_or_update_independent_task_notification(sender, instance, created, **kwargs):
+def schedule_independent_task_reminder(sender, instance, created, **kwargs):
     """
-    Create or update a notification when an independent task is created or updated with a reminder.
+    Queue, move or cancel an independent task's reminder when its reminder fields change.
     """
-    print(f"Signal received for Independent Task {instance.id} - {instance.title}")
-
-    # Check if the Task model has the required attributes
-    has_reminder_attr = hasattr(instance, 'has_reminder')
-    has_reminder_time_attr = hasattr(instance, 'reminder_date_time')
-
-    print(f"Independent Task has 'has_reminder' attribute: {has_reminder_attr}")
-    print(f"Independent Task has 'reminder_date_time' attribute: {has_reminder_time_attr}")
-
-    # Only proceed if the task has both required attributes
-    if has_reminder_attr and has_reminder_time_attr:
-        print(f"Independent Task has reminder: {instance.has_reminder}, Reminder time: {instance.reminder_date_time}")
-
-        if instance.has_reminder and instance.reminder_date_time:
-            print(f"Creating notification for independent task {instance.id}")
-            Notification.create_task_reminder(instance)
-        elif not instance.has_reminder or instance.status == 'completed':
-            print(f"Removing notification for independent task {instance.id}")
-            Notification.remove_task_reminder(instance.id)
-    else:
-        print(f"Independent Task {instance.id} does not have reminder attributes, skipping notification handling")
+    sync_reminder(ScheduledReminder.KIND_TASK, instance, created, Notification.remove_task_reminder)
 
 @receiver(post_delete, sender=GoalTask)
 def delete_goal_task_notification(sender, instance, **kwargs):
     """
-    Delete notifications when a goal task is deleted.
+    Delete the queued reminder and notifications when a goal task is deleted.
     """
-    print(f"Deleting notifications for goal task {instance.id}")
-    Notification.remove_task_reminder(instance.id)
+    ScheduledReminder.unschedule(ScheduledReminder.KIND_GOAL_TASK, instance.id)
+    Notification.remove_goal_task_reminder(instance.id, user=instance.user_id)
 
 @receiver(post_delete, sender=IndependentTask)
 def delete_independent_task_notification(sender, instance, **kwargs):
     """
-    Delete notifications when an independent task is deleted.
+    Delete the queued reminder and notifications when an independent task is deleted.
+    """
+    ScheduledReminder.unschedule(ScheduledReminder.KIND_TASK, instance.id)
+    Notification.remove_task_reminder(instance.id, user=instance.user_id)
+
+@receiver(post_save, sender=Notification)
+def push_saved_notification(sender, instance, created, **kwargs):
+    """
+    Push new and updated notifications to the user's open WebSocket connections.
     """
-    print(f"Deleting notifications for independent task {instance.id}")
-    Notification.remove_task_reminder(instance.id)
+    event = 'notification_created' if created else 'notification_updated'
+    push_notification(instance, event, unread_delta=instance.unread_delta)
+
+@receiver(post_delete, sender=Notification)
+def push_deleted_notification(sender, instance, **kwargs):
+    """
+    Tell the user's open WebSocket connections that a notification was removed.
+    """
+    push_notification(instance, 'notification_deleted', unread_delta=-int(not instance.is_read))
+
+@receiver(post_delete, sender=Notification)
+def record_notification_tombstone(sender, instance, origin=None, **kwargs):
+    """
+    Leave a tombstone so incremental sync can report the deletion, and drop the
+    notification from the unread counter. Skipped when the whole user is being
+    deleted, since their sync state goes with them.
+    """
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if issubclass(origin_model, CustomUser):
+        return
+
+    # post_delete runs inside the delete transaction, so the state lock covers both
+    NotificationTombstone.objects.create(
+        user_id=instance.user_id,
+        notification_id=instance.id,
+        sequence=NotificationState.next_sequence(instance.user_id, unread_delta=-int(not instance.is_read)),
+    )
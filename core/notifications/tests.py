@@ -0,0 +1,281 @@
+from datetime import timedelta
+from io import StringIO
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import CustomUser
+from goals.models import Task as GoalTask
+from task.models import Task
+from .middleware import JWTAuthMiddleware
+from .models import Notification, NotificationState, NotificationTombstone, ScheduledReminder
+from .routing import websocket_urlpatterns
+from .scheduler import fire_due_reminders
+
+
+class ReminderScheduleTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='reminded@example.com', full_name='Reminded')
+        self.task = Task.objects.create(
+            user=self.user, title='Water plants',
+            has_reminder=True, reminder_date_time=timezone.now() + timedelta(minutes=5),
+        )
+
+    def fire(self, batch_size=100):
+        return fire_due_reminders(now=timezone.now() + timedelta(minutes=10), batch_size=batch_size)
+
+    def test_reminder_fires_when_due(self):
+        self.assertTrue(ScheduledReminder.objects.filter(kind=ScheduledReminder.KIND_TASK, object_id=self.task.pk).exists())
+        self.assertEqual(self.fire(), 1)
+        self.assertEqual(
+            list(Notification.objects.filter(user=self.user).values_list('title', flat=True)), ['Task Reminder: Water plants']
+        )
+
+    def test_completing_a_task_cancels_its_reminder(self):
+        self.task.status = 'completed'
+        self.task.save()
+        self.assertFalse(ScheduledReminder.objects.exists())
+        self.fire()
+        self.assertFalse(Notification.objects.exists())
+
+        # Reopening it schedules the reminder again
+        self.task.status = 'pending'
+        self.task.save()
+        self.fire()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_completing_a_task_removes_a_fired_reminder(self):
+        self.fire()
+        self.task.status = 'in_progress'
+        self.task.save()
+        self.assertEqual(Notification.objects.count(), 1)
+
+        self.task.status = 'completed'
+        self.task.save()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_reminders_of_tasks_completed_outside_the_model_are_skipped(self):
+        Task.objects.filter(pk=self.task.pk).update(status='completed')
+        self.assertEqual(self.fire(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_due_reminders_are_fired_in_batches(self):
+        for number in range(4):
+            Task.objects.create(
+                user=self.user, title=f'Task {number}',
+                has_reminder=True, reminder_date_time=timezone.now() + timedelta(minutes=number),
+            )
+        # Not due yet
+        Task.objects.create(user=self.user, title='Later', has_reminder=True, reminder_date_time=timezone.now() + timedelta(days=1))
+
+        self.assertEqual(self.fire(batch_size=3), 3)
+        self.assertEqual(self.fire(batch_size=3), 2)
+        self.assertEqual(self.fire(batch_size=3), 0)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(list(ScheduledReminder.objects.values_list('kind', flat=True)), [ScheduledReminder.KIND_TASK])
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_workers_claim_reminders_with_skip_locked(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.fire()
+        claim = next(query['sql'] for query in queries.captured_queries if 'notifications_scheduledreminder' in query['sql'])
+        self.assertIn('SKIP LOCKED', claim)
+
+    def test_goal_task_and_task_with_the_same_id_keep_separate_reminders(self):
+        goal_task = GoalTask.objects.create(
+            pk=self.task.pk, user=self.user, title='Review',
+            has_reminder=True, reminder_date_time=self.task.reminder_date_time,
+        )
+        self.fire()
+        self.assertEqual(
+            sorted(Notification.objects.values_list('notification_type', 'source_id')),
+            [('goal_task_due', goal_task.pk), ('task_due', self.task.pk)],
+        )
+
+        goal_task.delete()
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['Task Reminder: Water plants'])
+
+
+class NotificationSyncTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='synced@example.com', full_name='Synced')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.first, self.second = [
+            Notification.objects.create(user=self.user, title=title, message='', notification_type='system')
+            for title in ('First', 'Second')
+        ]
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get('/api/notifications/notifications/sync/', params)
+
+    def test_changes_since_the_cursor(self):
+        initial = self.sync().data
+        self.assertTrue(initial['reset'])
+        self.assertEqual([item['title'] for item in initial['changed']], ['First', 'Second'])
+
+        self.first.is_read = True
+        self.first.save()
+        deleted_id = self.second.id
+        self.second.delete()
+        Notification.objects.create(user=self.user, title='Third', message='', notification_type='system')
+
+        changes = self.sync(initial['cursor']).data
+        self.assertFalse(changes['reset'])
+        self.assertEqual([(item['title'], item['is_read']) for item in changes['changed']], [('First', True), ('Third', False)])
+        self.assertEqual(changes['deleted'], [deleted_id])
+        self.assertFalse(self.sync(changes['cursor']).data['changed'])
+
+    def test_changes_are_paged(self):
+        page = self.sync(limit=1).data
+        self.assertTrue(page['has_more'])
+        rest = self.sync(page['cursor'], limit=1).data
+        self.assertEqual([item['title'] for item in page['changed'] + rest['changed']], ['First', 'Second'])
+        self.assertFalse(self.sync(rest['cursor'], limit=1).data['has_more'])
+
+    def test_tampered_cursors_are_rejected(self):
+        cursor = self.sync().data['cursor']
+        self.assertEqual(self.sync(cursor[:-2] + 'xx').status_code, 400)
+        self.assertEqual(self.sync('not-a-cursor').status_code, 400)
+
+    def test_cursors_older_than_the_pruned_tombstones_reset(self):
+        cursor = self.sync().data['cursor']
+        self.second.delete()
+        recent = self.sync(cursor).data['cursor']
+
+        call_command('prune_notification_tombstones', days=0, stdout=StringIO())
+        self.assertFalse(NotificationTombstone.objects.exists())
+
+        stale = self.sync(cursor).data
+        self.assertTrue(stale['reset'])
+        self.assertEqual([item['title'] for item in stale['changed']], ['First'])
+        # Cursors taken after the pruned deletions keep syncing incrementally
+        self.assertFalse(self.sync(recent).data['reset'])
+
+
+class UnreadCountTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='counted@example.com', full_name='Counted')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f'Note {number}', message='', notification_type='system')
+            for number in range(3)
+        ]
+
+    def unread_count(self):
+        with self.assertNumQueries(1):
+            count = self.client.get('/api/notifications/notifications/unread_count/').data['unread_count']
+        self.assertEqual(count, Notification.objects.filter(user=self.user, is_read=False).count())
+        return count
+
+    def test_count_follows_reads_and_deletes(self):
+        self.assertEqual(self.unread_count(), 3)
+        self.client.post(f'/api/notifications/notifications/{self.notifications[0].pk}/mark_as_read/')
+        self.assertEqual(self.unread_count(), 2)
+        # Saving an already read notification changes nothing
+        read = Notification.objects.get(pk=self.notifications[0].pk)
+        read.title = 'Renamed'
+        read.save()
+        self.assertEqual(self.unread_count(), 2)
+
+        read.delete()
+        self.assertEqual(self.unread_count(), 2)
+        self.notifications[1].delete()
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_count_follows_upserts(self):
+        source = Notification(user=self.user, title='Invite', message='', notification_type='project_invitation', source_id=7)
+        Notification.upsert([source], update_fields=['title', 'is_read'])
+        self.assertEqual(self.unread_count(), 4)
+
+        # Refreshing an unread notification doesn't count it twice; marking it read through an upsert does
+        Notification.upsert([source], update_fields=['title', 'is_read'])
+        self.assertEqual(self.unread_count(), 4)
+        read = Notification(user=self.user, title='Invite', message='', notification_type='project_invitation', source_id=7, is_read=True)
+        Notification.upsert([read], update_fields=['title', 'is_read'])
+        self.assertEqual(self.unread_count(), 3)
+
+    def test_mark_all_read_uses_one_change_sequence(self):
+        state = NotificationState.objects.get(user=self.user)
+        response = self.client.post('/api/notifications/notifications/mark_all_as_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread_count(), 0)
+
+        sequences = set(Notification.objects.filter(user=self.user).values_list('sequence', flat=True))
+        self.assertEqual(sequences, {state.last_sequence + 1})
+
+    def test_rebuild_repairs_a_drifted_count(self):
+        NotificationState.objects.filter(user=self.user).update(unread_count=42)
+        self.assertEqual(NotificationState.rebuild(self.user), 3)
+        self.assertEqual(self.unread_count(), 3)
+
+
+class NotificationSocketTests(TestCase):
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='listener@example.com', full_name='Listener')
+        self.other = CustomUser.objects.create_user(email='bystander@example.com', full_name='Bystander')
+        Notification.objects.create(user=self.user, title='Waiting', message='', notification_type='system')
+
+    def communicator(self, token):
+        path = '/ws/notifications/' if token is None else f'/ws/notifications/?token={token}'
+        return WebsocketCommunicator(self.application, path)
+
+    @database_sync_to_async
+    def notify(self, user, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=user, title=title, message='', notification_type='system')
+
+    async def connect(self, user):
+        communicator = self.communicator(str(AccessToken.for_user(user)))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_missing_or_invalid_tokens_are_rejected(self):
+        for token in (None, 'not-a-token', str(AccessToken.for_user(self.user))[:-4] + 'abcd'):
+            communicator = self.communicator(token)
+            with self.assertLogs('notifications', 'WARNING'):
+                connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+    async def test_connecting_sends_the_unread_count(self):
+        communicator = await self.connect(self.user)
+        self.assertEqual(await communicator.receive_json_from(), {'event': 'unread_count', 'unread_count': 1})
+        await communicator.send_json_to({'action': 'ping'})
+        self.assertEqual(await communicator.receive_json_from(), {'event': 'pong'})
+        await communicator.disconnect()
+
+    async def test_new_notifications_are_pushed_with_the_unread_delta(self):
+        communicator = await self.connect(self.user)
+        await communicator.receive_json_from()
+
+        notification = await self.notify(self.user, 'Hello')
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['event'], 'notification_created')
+        self.assertEqual(message['unread_delta'], 1)
+        self.assertEqual((message['notification']['id'], message['notification']['title']), (notification.pk, 'Hello'))
+        await communicator.disconnect()
+
+    async def test_sockets_only_receive_their_own_users_notifications(self):
+        listener = await self.connect(self.user)
+        bystander = await self.connect(self.other)
+        await listener.receive_json_from()
+        self.assertEqual(await bystander.receive_json_from(), {'event': 'unread_count', 'unread_count': 0})
+
+        await self.notify(self.other, 'Not yours')
+        self.assertEqual((await bystander.receive_json_from())['notification']['title'], 'Not yours')
+        self.assertTrue(await listener.receive_nothing())
+        await listener.disconnect()
+        await bystander.disconnect()
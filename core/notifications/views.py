@@ -2,8 +2,10 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Notification
+from .models import Notification, NotificationState
 from .serializers import NotificationSerializer
+from .realtime import push_unread_count
+from .sync import collect_changes, encode_cursor, InvalidCursor, DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT
 import logging
 
 # Set up logging
@@ -15,6 +17,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         """Return notifications for the current user"""
@@ -27,7 +30,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get the count of unread notifications"""
-        count = self.get_queryset().filter(is_read=False).count()
+        count = NotificationState.unread_count_for(request.user)
         return Response({'unread_count': count})
 
     @action(detail=False, methods=['get'])
@@ -42,9 +45,42 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         """Mark all notifications as read"""
-        self.get_queryset().update(is_read=True)
+        Notification.mark_all_read(request.user)
+        # Queryset updates don't send post_save, so tell connected clients directly
+        push_unread_count(request.user.id, 0)
         return Response({'status': 'All notifications marked as read'})
 
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Return notifications created, updated or deleted since `cursor`.
+
+        Call without a cursor for the first sync, then pass back the returned cursor.
+        When `reset` is true the response is a full snapshot and replaces local state;
+        keep calling while `has_more` is true.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_SYNC_LIMIT)), MAX_SYNC_LIMIT)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changed, deleted, position, has_more, reset = collect_changes(
+                request.user, request.query_params.get('cursor'), limit
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'changed': self.get_serializer(changed, many=True).data,
+            'deleted': deleted,
+            'cursor': encode_cursor(*position),
+            'has_more': has_more,
+            'reset': reset,
+        })
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         """Mark a specific notification as read"""
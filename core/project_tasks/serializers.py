@@ -1,10 +1,11 @@
 from rest_framework import serializers
 from .models import ProjectTask
+from core.serializers import SparseFieldsMixin
 from accounts.serializers import CustomUserSerializer # Use your existing user serializer
 from work.models import Project # Needed for validation
 from accounts.models import CustomUser # Import the CustomUser model
 
-class ProjectTaskSerializer(serializers.ModelSerializer):
+class ProjectTaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the ProjectTask model.
     """
@@ -29,6 +29,7 @@ class ProjectTaskViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ProjectTaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsProjectMemberOrOwner]
+    ordering = ('-date_created', '-id')
 
     def get_queryset(self):
         """ Filter tasks by the project_pk from the URL """
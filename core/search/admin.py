@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import SearchEntry
+
+class SearchEntryAdmin(admin.ModelAdmin):
+    list_display = ('title', 'kind', 'object_id', 'user', 'updated_at')
+    list_filter = ('kind',)
+    search_fields = ('title', 'user__email')
+
+admin.site.register(SearchEntry, SearchEntryAdmin)
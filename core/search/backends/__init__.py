@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+_backend = None
+
+def get_backend():
+    """
+    The configured search backend, created once per process.
+
+    settings.SEARCH_BACKEND can name a backend class; otherwise PostgreSQL databases
+    use full-text search and anything else (SQLite in local and CI runs) uses the
+    in-process inverted index.
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path is None:
+            if connection.vendor == 'postgresql':
+                path = 'search.backends.postgres.PostgresBackend'
+            else:
+                path = 'search.backends.memory.InMemoryBackend'
+        _backend = import_string(path)()
+    return _backend
@@ -0,0 +1,25 @@
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+class SearchBackend:
+    """
+    Where search entries are stored and how they are queried.
+
+    Entries are unsaved search.models.SearchEntry instances built by
+    search.sources.entry_for(); results are dicts with kind, id, title,
+    title_highlight, snippet, rank and updated_at, best match first.
+    """
+
+    def index(self, entries):
+        """Add entries or replace the stored versions of them"""
+        raise NotImplementedError
+
+    def remove(self, kind, object_id):
+        raise NotImplementedError
+
+    def clear(self):
+        """Forget every entry, e.g. before a full rebuild"""
+        raise NotImplementedError
+
+    def search(self, user, text, kinds=None, limit=DEFAULT_LIMIT):
+        raise NotImplementedError
@@ -0,0 +1,204 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from .base import DEFAULT_LIMIT, SearchBackend
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the this to was were will with'.split()
+)
+# Title terms count this many times towards an entry's term frequencies (BM25F-style)
+TITLE_WEIGHT = 3
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+SNIPPET_WORDS = 30
+
+def stem(word):
+    """A light English suffix stripper, so "tasks" finds "task" and "planning" finds "plan" """
+    for suffix, replacement in (('sses', 'ss'), ('ies', 'y'), ('ing', ''), ('ed', ''), ('s', '')):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith('ss'):
+            word = word[:-len(suffix)] + replacement
+            if suffix in ('ing', 'ed') and len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                word = word[:-1]
+            break
+    return word
+
+def terms(text):
+    """Normalized index terms of text, in order"""
+    return [stem(word) for word in TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+def parse_query(text):
+    """
+    Parse a websearch-style query into (alternatives, excluded). Words are ANDed,
+    "or" separates alternatives and a leading "-" excludes a word; quotes are ignored.
+    """
+    alternatives = [[]]
+    excluded = set()
+    for word in text.replace('"', ' ').split():
+        if word.lower() == 'or':
+            alternatives.append([])
+        elif word.startswith('-') and len(word) > 1:
+            excluded.update(terms(word[1:]))
+        else:
+            alternatives[-1].extend(terms(word))
+    return [set(group) for group in alternatives if group], excluded
+
+def highlight(text, wanted, window=None):
+    """Wrap words of text whose term is wanted in <mark>, optionally cut to a window around the first hit"""
+    words = list(TOKEN_RE.finditer(text))
+    hits = [i for i, match in enumerate(words) if stem(match.group().lower()) in wanted]
+    start, end = 0, len(text)
+    if window is not None and words:
+        first = hits[0] if hits else 0
+        lo = max(first - window // 3, 0)
+        hi = min(lo + window, len(words)) - 1
+        start, end = words[lo].start(), words[hi].end()
+
+    parts = []
+    position = start
+    for i in hits:
+        match = words[i]
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(text[position:match.start()])
+        parts.append(f"<mark>{match.group()}</mark>")
+        position = match.end()
+    parts.append(text[position:end])
+    return ''.join(parts)
+
+
+class UserIndex:
+    """Postings and statistics for one user's entries"""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)  # term -> {key: weighted term frequency}
+        self.lengths = {}                  # key -> weighted entry length
+        self.entries = {}                  # key -> entry
+        self.total_length = 0
+
+    def add(self, key, entry):
+        self.discard(key)
+        frequencies = Counter(terms(entry.body))
+        for term in terms(entry.title):
+            frequencies[term] += TITLE_WEIGHT
+        for term, frequency in frequencies.items():
+            self.postings[term][key] = frequency
+        length = sum(frequencies.values())
+        self.lengths[key] = length
+        self.total_length += length
+        self.entries[key] = entry
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_length -= self.lengths.pop(key)
+        for term in set(terms(entry.title)) | set(terms(entry.body)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[term]
+
+    def score(self, query_terms, candidates):
+        """BM25 scores of the candidates for the query terms"""
+        count = len(self.entries)
+        average_length = self.total_length / count if count else 0
+        scores = defaultdict(float)
+        for term in query_terms:
+            postings = self.postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key in candidates & postings.keys():
+                frequency = postings[key]
+                norm = K1 * (1 - B + B * self.lengths[key] / average_length) if average_length else K1
+                scores[key] += idf * frequency * (K1 + 1) / (frequency + norm)
+        return scores
+
+
+class InMemoryBackend(SearchBackend):
+    """
+    A pure-Python inverted index kept in the process, for databases without full-text
+    search (SQLite in local and CI runs). A user's index is built from the source
+    tables on their first search and kept current by the model signals afterwards.
+    Every process holds its own copy, so it suits single-process deployments.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.users = {}   # user id -> UserIndex, for users loaded so far
+        self.owners = {}  # (kind, object id) -> user id
+
+    def user_index(self, user_id):
+        with self.lock:
+            index = self.users.get(user_id)
+            if index is None:
+                from search.sources import entries_for_user
+                index = self.users[user_id] = UserIndex()
+                for entry in entries_for_user(user_id):
+                    self.owners[(entry.kind, entry.object_id)] = user_id
+                    index.add((entry.kind, entry.object_id), entry)
+            return index
+
+    def index(self, entries):
+        with self.lock:
+            for entry in entries:
+                key = (entry.kind, entry.object_id)
+                previous_owner = self.owners.get(key)
+                if previous_owner is not None and previous_owner != entry.user_id and previous_owner in self.users:
+                    self.users[previous_owner].discard(key)
+                self.owners[key] = entry.user_id
+                # Users that haven't searched yet will read the entry when their index is built
+                if entry.user_id in self.users:
+                    self.users[entry.user_id].add(key, entry)
+
+    def remove(self, kind, object_id):
+        with self.lock:
+            user_id = self.owners.pop((kind, object_id), None)
+            if user_id in self.users:
+                self.users[user_id].discard((kind, object_id))
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+            self.owners.clear()
+
+    def search(self, user, text, kinds=None, limit=DEFAULT_LIMIT):
+        alternatives, excluded = parse_query(text)
+        if not alternatives:
+            return []
+
+        with self.lock:
+            index = self.user_index(user.pk)
+            scores = {}
+            for required in alternatives:
+                # Entries containing every required term, found from the shortest postings list up
+                postings = sorted((index.postings.get(term, {}) for term in required), key=len)
+                candidates = set(postings[0])
+                for other in postings[1:]:
+                    candidates &= other.keys()
+                for term in excluded:
+                    candidates -= index.postings.get(term, {}).keys()
+                if kinds:
+                    candidates = {key for key in candidates if key[0] in kinds}
+                for key, score in index.score(required, candidates).items():
+                    scores[key] = max(score, scores.get(key, 0))
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -index.entries[item[0]].updated_at.timestamp()))[:limit]
+            wanted = set().union(*alternatives)
+            results = []
+            for key, score in ranked:
+                entry = index.entries[key]
+                results.append({
+                    'kind': entry.kind,
+                    'id': entry.object_id,
+                    'title': entry.title,
+                    'title_highlight': highlight(entry.title, wanted),
+                    'snippet': highlight(entry.body, wanted, window=SNIPPET_WORDS) if entry.body else '',
+                    'rank': score,
+                    'updated_at': entry.updated_at,
+                })
+            return results
@@ -0,0 +1,84 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Q
+from search.models import SearchEntry
+from .base import DEFAULT_LIMIT, SearchBackend
+
+# Text search configuration used for both indexing and queries
+SEARCH_CONFIG = 'english'
+
+def search_vector():
+    """Title matches rank above body matches"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('body', weight='B', config=SEARCH_CONFIG)
+    )
+
+def entry_keys(entries):
+    """A filter matching the stored rows of the given entries"""
+    keys = Q()
+    for kind in {entry.kind for entry in entries}:
+        keys |= Q(kind=kind, object_id__in=[entry.object_id for entry in entries if entry.kind == kind])
+    return keys
+
+class PostgresBackend(SearchBackend):
+    """
+    Full-text search on PostgreSQL: entries are rows of SearchEntry with a stored,
+    GIN-indexed tsvector.
+    """
+
+    def index(self, entries):
+        """Insert or refresh entries, then recompute their tsvectors in the database"""
+        if not entries:
+            return
+        SearchEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['user', 'title', 'body', 'updated_at'],
+        )
+        SearchEntry.objects.filter(entry_keys(entries)).update(vector=search_vector())
+
+    def remove(self, kind, object_id):
+        SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+    def clear(self):
+        SearchEntry.objects.all().delete()
+
+    def search(self, user, text, kinds=None, limit=DEFAULT_LIMIT):
+        """
+        The user's best matches for text, best first, with highlighted title and snippet.
+
+        Ranking runs over the GIN-indexed matches; the costly ts_headline calls are only
+        made for the rows that are returned.
+        """
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        matches = SearchEntry.objects.filter(user=user, vector=query)
+        if kinds:
+            matches = matches.filter(kind__in=kinds)
+        top = list(
+            matches.annotate(rank=SearchRank(F('vector'), query))
+            .order_by('-rank', '-updated_at')
+            .values('id', 'rank')[:limit]
+        )
+        if not top:
+            return []
+
+        highlight = {'config': SEARCH_CONFIG, 'start_sel': '<mark>', 'stop_sel': '</mark>'}
+        rows = SearchEntry.objects.filter(pk__in=[row['id'] for row in top]).annotate(
+            title_highlight=SearchHeadline('title', query, highlight_all=True, **highlight),
+            snippet=SearchHeadline('body', query, max_fragments=2, **highlight),
+        ).in_bulk()
+
+        results = []
+        for row in top:
+            entry = rows[row['id']]
+            results.append({
+                'kind': entry.kind,
+                'id': entry.object_id,
+                'title': entry.title,
+                'title_highlight': entry.title_highlight,
+                'snippet': entry.snippet if entry.body else '',
+                'rank': row['rank'],
+                'updated_at': entry.updated_at,
+            })
+        return results
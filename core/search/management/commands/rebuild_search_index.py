@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from search.backends import get_backend
+from search.sources import SEARCH_SOURCES, entry_for
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index from pages, diary entries, tasks, goals and calendar events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows to index per query')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        batch_size = options['batch_size']
+        # Entries for rows that no longer exist go with the old index
+        backend.clear()
+        for model, (kind, _, _) in SEARCH_SOURCES.items():
+            indexed = 0
+            batch = []
+            for instance in model.objects.iterator(chunk_size=batch_size):
+                entry = entry_for(instance)
+                if entry is not None:
+                    batch.append(entry)
+                if len(batch) >= batch_size:
+                    backend.index(batch)
+                    indexed += len(batch)
+                    batch = []
+            backend.index(batch)
+            indexed += len(batch)
+
+            self.stdout.write(f"Indexed {indexed} {kind} entries")
+
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
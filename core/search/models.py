@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+class SearchEntry(models.Model):
+    """
+    The searchable text of one page, diary entry, task, goal or calendar event.
+
+    Kept in step with the source rows by signals, so a search covering every kind of
+    item is a single query over this table. On PostgreSQL `vector` holds the weighted
+    tsvector of title and body, with a GIN index created by the migration.
+    """
+    KIND_PAGE = 'page'
+    KIND_DIARY = 'diary'
+    KIND_TASK = 'task'
+    KIND_GOAL = 'goal'
+    KIND_GOAL_TASK = 'goal_task'
+    KIND_EVENT = 'event'
+    KIND_CHOICES = [
+        (KIND_PAGE, 'Page'),
+        (KIND_DIARY, 'Diary entry'),
+        (KIND_TASK, 'Task'),
+        (KIND_GOAL, 'Goal'),
+        (KIND_GOAL_TASK, 'Goal task'),
+        (KIND_EVENT, 'Calendar event'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='search_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField()
+    vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'kind'], name='search_entry_user_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}: {self.title}"
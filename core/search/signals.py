@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from api.models import Doc, page_compacted
+from diary.models import Diary
+from events.models import CalendarEvent
+from goals.models import Goal, Task as GoalTask
+from task.models import Task as IndependentTask
+from .backends import get_backend
+from .sources import SEARCH_SOURCES, entry_for
+
+def reindex(instance):
+    entry = entry_for(instance)
+    if entry is None:
+        kind = SEARCH_SOURCES[type(instance)][0]
+        get_backend().remove(kind, instance.pk)
+    else:
+        get_backend().index([entry])
+
+@receiver(post_save, sender=Doc)
+@receiver(post_save, sender=Diary)
+@receiver(post_save, sender=IndependentTask)
+@receiver(post_save, sender=Goal)
+@receiver(post_save, sender=GoalTask)
+@receiver(post_save, sender=CalendarEvent)
+def index_saved_item(sender, instance, update_fields=None, **kwargs):
+    """
+    Refresh an item's search entry when it is saved. Saves that only touch fields
+    outside the indexed text (page moves, counters, reminders) are skipped.
+    """
+    if update_fields is not None and not {'title', 'content', 'description'} & set(update_fields):
+        return
+    reindex(instance)
+
+@receiver(page_compacted, sender=Doc)
+def index_compacted_page(sender, instance, **kwargs):
+    """
+    Pick up Delta patches once they are folded into a page's body.
+    """
+    reindex(instance)
+
+@receiver(post_delete, sender=Doc)
+@receiver(post_delete, sender=Diary)
+@receiver(post_delete, sender=IndependentTask)
+@receiver(post_delete, sender=Goal)
+@receiver(post_delete, sender=GoalTask)
+@receiver(post_delete, sender=CalendarEvent)
+def remove_deleted_item(sender, instance, **kwargs):
+    """
+    Drop a deleted item from search.
+    """
+    kind = SEARCH_SOURCES[sender][0]
+    get_backend().remove(kind, instance.pk)
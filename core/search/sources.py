@@ -0,0 +1,59 @@
+from django.utils import timezone
+from api.delta import document_ops
+from api.models import Doc
+from diary.models import Diary
+from events.models import CalendarEvent
+from goals.models import Goal, Task as GoalTask
+from task.models import Task as IndependentTask
+from .models import SearchEntry
+
+def quill_plain_text(content):
+    """The text of a Quill Delta document, without formatting or embeds"""
+    if isinstance(content, str):
+        return content
+    return ''.join(op['insert'] for op in document_ops(content) if isinstance(op['insert'], str))
+
+def page_fields(page):
+    return {'title': page.title, 'body': quill_plain_text(page.current_content()), 'updated_at': page.updated_at}
+
+def diary_fields(entry):
+    return {'title': entry.title, 'body': entry.content, 'updated_at': entry.updated_at}
+
+def task_fields(task):
+    return {'title': task.title, 'body': '', 'updated_at': task.date_created}
+
+def goal_fields(goal):
+    return {'title': goal.title, 'body': '', 'updated_at': goal.last_modified_at}
+
+def event_fields(event):
+    return {'title': event.title, 'body': event.description or '', 'updated_at': event.updated_at}
+
+# Which models are searchable: their kind, the field holding their owner, and how
+# each row turns into entry fields
+SEARCH_SOURCES = {
+    Doc: (SearchEntry.KIND_PAGE, 'owner', page_fields),
+    Diary: (SearchEntry.KIND_DIARY, 'user', diary_fields),
+    IndependentTask: (SearchEntry.KIND_TASK, 'user', task_fields),
+    Goal: (SearchEntry.KIND_GOAL, 'user', goal_fields),
+    GoalTask: (SearchEntry.KIND_GOAL_TASK, 'user', task_fields),
+    CalendarEvent: (SearchEntry.KIND_EVENT, 'user', event_fields),
+}
+
+def entry_for(instance):
+    """An unsaved SearchEntry for a source row, or None if it can't be searched"""
+    kind, user_field, fields = SEARCH_SOURCES[type(instance)]
+    user_id = getattr(instance, f'{user_field}_id')
+    if user_id is None:
+        return None
+    values = fields(instance)
+    values['title'] = (values['title'] or '')[:255]
+    values['updated_at'] = values['updated_at'] or timezone.now()
+    return SearchEntry(user_id=user_id, kind=kind, object_id=instance.pk, **values)
+
+def entries_for_user(user_id):
+    """Search entries for everything a user owns, read straight from the source tables"""
+    for model, (_, user_field, _) in SEARCH_SOURCES.items():
+        for instance in model.objects.filter(**{f'{user_field}_id': user_id}).iterator():
+            entry = entry_for(instance)
+            if entry is not None:
+                yield entry
@@ -0,0 +1,128 @@
+import time
+import unittest
+from datetime import date
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from diary.models import Diary
+from task.models import Task
+from .backends.memory import InMemoryBackend
+from .backends.postgres import PostgresBackend
+from .sources import entry_for
+
+WORDS = (
+    'morning coffee walk river garden budget meeting project notes travel recipe bread '
+    'music practice reading chapter report deadline family dinner weekend running plan'
+).split()
+
+
+class SearchBackendTests:
+    """
+    Relevance and latency checks every search backend has to pass. Subclasses set
+    backend_class; the backend is swapped in for the signals and the view.
+    """
+    backend_class = None
+
+    def setUp(self):
+        self.backend = self.backend_class()
+        patcher = mock.patch('search.backends._backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend.clear()
+
+        self.user = CustomUser.objects.create_user(email='writer@example.com', full_name='Writer')
+        self.other = CustomUser.objects.create_user(email='other@example.com', full_name='Other')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def diary(self, title, content='', user=None):
+        return Diary.objects.create(user=user or self.user, title=title, content=content, date=date(2024, 5, 1))
+
+    def search(self, text, **kwargs):
+        return self.backend.search(self.user, text, **kwargs)
+
+    def test_title_match_outranks_body_match(self):
+        in_body = self.diary('Saturday', 'Went to the garden centre for seeds')
+        in_title = self.diary('Garden plans', 'Tomatoes along the fence')
+        self.assertEqual([r['id'] for r in self.search('garden')], [in_title.pk, in_body.pk])
+
+    def test_more_occurrences_rank_higher(self):
+        once = self.diary('Monday', 'Bread for lunch, then a long afternoon of emails and calls')
+        often = self.diary('Tuesday', 'Bread dough, bread rolls and more bread')
+        self.assertEqual([r['id'] for r in self.search('bread')], [often.pk, once.pk])
+
+    def test_all_words_must_match_and_minus_excludes(self):
+        both = self.diary('Budget meeting', 'Went over the travel budget')
+        self.diary('Budget', 'Groceries only')
+        cancelled = self.diary('Budget meeting', 'Cancelled, travel on hold')
+        self.assertEqual({r['id'] for r in self.search('budget travel')}, {both.pk, cancelled.pk})
+        self.assertEqual([r['id'] for r in self.search('budget travel -cancelled')], [both.pk])
+
+    def test_stemmed_words_match(self):
+        entry = self.diary('Planning the week', 'Tasks for the project')
+        self.assertEqual([r['id'] for r in self.search('plans task')], [entry.pk])
+
+    def test_results_are_scoped_to_the_user_and_kinds(self):
+        mine = self.diary('Recipe ideas', 'Lentil soup')
+        task = Task.objects.create(user=self.user, title='Try the soup recipe')
+        self.diary('Recipe ideas', 'Lentil soup', user=self.other)
+
+        self.assertEqual({(r['kind'], r['id']) for r in self.search('recipe')}, {('diary', mine.pk), ('task', task.pk)})
+        self.assertEqual([r['id'] for r in self.search('recipe', kinds=['task'])], [task.pk])
+
+    def test_signals_keep_the_index_current(self):
+        entry = self.diary('River walk', 'Saw a heron')
+        self.assertEqual(len(self.search('heron')), 1)
+
+        entry.content = 'Saw a kingfisher'
+        entry.save()
+        self.assertEqual(self.search('heron'), [])
+        self.assertEqual([r['id'] for r in self.search('kingfisher')], [entry.pk])
+
+        entry.delete()
+        self.assertEqual(self.search('kingfisher'), [])
+
+    def test_matches_are_highlighted(self):
+        self.diary('Practice log', 'Scales first, then the piano piece twice')
+        result = self.search('piano practice')[0]
+        self.assertIn('<mark>Practice</mark>', result['title_highlight'])
+        self.assertIn('<mark>piano</mark>', result['snippet'])
+
+    def test_view_returns_results(self):
+        entry = self.diary('Reading list', 'Chapter three of the novel')
+        response = self.client.get('/api/search/', {'q': 'chapter'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.data['results']], [entry.pk])
+
+    def test_search_latency(self):
+        entries = Diary.objects.bulk_create(
+            Diary(
+                user=self.user, date=date(2024, 1, 1),
+                title=' '.join(WORDS[(i + j) % len(WORDS)] for j in range(3)),
+                content=' '.join(WORDS[(i * 7 + j * 3) % len(WORDS)] for j in range(60)),
+            )
+            for i in range(2000)
+        )
+        self.backend.index([entry_for(entry) for entry in entries])
+        queries = ['garden', 'budget meeting', 'music -reading', 'river or travel', 'deadline report plan']
+        self.search(queries[0])
+
+        timings = []
+        for _ in range(10):
+            for text in queries:
+                start = time.perf_counter()
+                self.search(text)
+                timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.assertLess(timings[int(len(timings) * 0.95)], 0.05)
+
+
+class InMemoryBackendTests(SearchBackendTests, TestCase):
+    backend_class = InMemoryBackend
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL full-text search')
+class PostgresBackendTests(SearchBackendTests, TestCase):
+    backend_class = PostgresBackend
@@ -0,0 +1,37 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .backends import get_backend
+from .backends.base import DEFAULT_LIMIT, MAX_LIMIT
+from .models import SearchEntry
+
+class SearchView(APIView):
+    """
+    Search the user's pages, diary entries, tasks, goals and calendar events.
+
+    GET /api/search/?q=<words>&kinds=page,diary&limit=20
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        kinds = [kind.strip() for kind in request.query_params.get('kinds', '').split(',') if kind.strip()]
+        valid_kinds = {kind for kind, _ in SearchEntry.KIND_CHOICES}
+        unknown = set(kinds) - valid_kinds
+        if unknown:
+            return Response(
+                {'error': f"Unknown kinds: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        return Response({'results': get_backend().search(request.user, text, kinds=kinds, limit=limit)})
@@ -26,9 +26,17 @@ class Task(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')  # Task priority
     due_date = models.DateField(null=True, blank=True)  # Optional due date
     date_created = models.DateTimeField(auto_now_add=True)  # Auto-created timestamp
+    updated_at = models.DateTimeField(auto_now=True)  # Last change, used to validate calendar feeds
     has_reminder = models.BooleanField(default=False)  # Whether the task has a reminder
     reminder_date_time = models.DateTimeField(null=True, blank=True)  # When to send the reminder
 
+    class Meta:
+        indexes = [
+            # Date range lookups for the calendar agenda
+            models.Index(fields=['user', 'due_date'], name='task_user_due_idx'),
+            models.Index(fields=['user', 'reminder_date_time'], condition=models.Q(has_reminder=True), name='task_user_reminder_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import Task
+from core.serializers import SparseFieldsMixin
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = '__all__'  # Serialize all fields
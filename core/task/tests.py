@@ -1,3 +1,68 @@
+from datetime import datetime, timezone
 from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from .models import Task
 
-# Create your tests here.
+
+class TaskListTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='lister@example.com', full_name='Lister')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_tasks(self, count):
+        tasks = [Task.objects.create(user=self.user, title=f'Task {number}') for number in range(count)]
+        # Tasks saved in one batch often share a timestamp; make every one of them do
+        Task.objects.filter(user=self.user).update(date_created=datetime(2024, 5, 1, 9, 0, tzinfo=timezone.utc))
+        return tasks
+
+    def pages(self, **params):
+        pages, url, params = [], '/task/tasks/', params
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([task['id'] for task in response.data['results']])
+            url, params = response.data['next'], None
+        return pages
+
+    def test_pages_with_equal_timestamps_cover_every_task_once(self):
+        tasks = self.create_tasks(7)
+        pages = self.pages(page_size=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [task.pk for task in reversed(tasks)])
+
+        # Walking back from the last page gives the same pages
+        response = self.client.get('/task/tasks/', {'page_size': 3})
+        response = self.client.get(response.data['next'])
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([task['id'] for task in previous.data['results']], pages[0])
+
+    def test_malformed_cursors_are_rejected(self):
+        self.create_tasks(2)
+        self.assertEqual(self.client.get('/task/tasks/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_plain_list_uses_the_same_order(self):
+        tasks = self.create_tasks(3)
+        response = self.client.get('/task/tasks/')
+        self.assertEqual([task['id'] for task in response.data['active_tasks']], [task.pk for task in reversed(tasks)])
+
+    def test_fields_trims_the_payload(self):
+        self.create_tasks(2)
+        response = self.client.get('/task/tasks/', {'fields': 'id,title'})
+        self.assertEqual([set(task) for task in response.data['active_tasks']], [{'id', 'title'}] * 2)
+
+        paged = self.client.get('/task/tasks/', {'fields': 'id', 'page_size': 1})
+        self.assertEqual(paged.data['results'], [{'id': Task.objects.order_by('-id').first().pk}])
+
+    def test_unknown_fields_are_ignored(self):
+        task = self.create_tasks(1)[0]
+        response = self.client.get(f'/task/tasks/{task.pk}/', {'fields': 'title, nonsense ,'})
+        self.assertEqual(response.data, {'title': 'Task 0'})
+
+    def test_fields_does_not_affect_writes(self):
+        task = self.create_tasks(1)[0]
+        response = self.client.patch(f'/task/tasks/{task.pk}/?fields=id', {'title': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Renamed')
+        self.assertIn('status', response.data)
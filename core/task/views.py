@@ -8,19 +8,24 @@ from .serializers import TaskSerializer
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]  # Ensure only logged-in users can access tasks
+    ordering = ('-date_created', '-id')
 
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user).order_by('-date_created')
+        return Task.objects.filter(user=self.request.user).order_by(*self.ordering)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  # Set the task's user to the logged-in user
 
     def list(self, request, *args, **kwargs):
+        # Paginated requests get one keyset-paged list; each task carries its status
+        if self.paginator.is_requested(request):
+            return super().list(request, *args, **kwargs)
+
         queryset = self.get_queryset()
         active_tasks = queryset.exclude(status="completed")
         completed_tasks = queryset.filter(status="completed")
 
         return Response({
-            "active_tasks": TaskSerializer(active_tasks, many=True).data,
-            "completed_tasks": TaskSerializer(completed_tasks, many=True).data
+            "active_tasks": self.get_serializer(active_tasks, many=True).data,
+            "completed_tasks": self.get_serializer(completed_tasks, many=True).data
         })
\ No newline at end of file
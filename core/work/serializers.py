@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Project, TeamInvitation
+from core.serializers import SparseFieldsMixin
 from django.contrib.auth import get_user_model
 from accounts.serializers import CustomUserSerializer
 
@@ -10,7 +11,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'email', 'full_name']
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = UserSerializer(source='user', read_only=True)
     members = CustomUserSerializer(many=True, read_only=True)
     is_hosted_by_user = serializers.SerializerMethodField()  # Add this field
@@ -23,10 +24,10 @@ class ProjectSerializer(serializers.ModelSerializer):
     def get_is_hosted_by_user(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         return False
 
-class TeamInvitationSerializer(serializers.ModelSerializer):
+class TeamInvitationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     recipient = UserSerializer(read_only=True)
     project = ProjectSerializer(read_only=True)
@@ -39,7 +40,7 @@ class TeamInvitationSerializer(serializers.ModelSerializer):
         read_only_fields = ['sender', 'status', 'created_at', 'updated_at']
 
     def validate_recipient_email(self, value):
-        if CustomUser.objects.filter(email=value).exists():
+        if User.objects.filter(email=value).exists():
             return value
         # Log the validation error
         import logging
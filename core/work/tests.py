@@ -0,0 +1,54 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from .models import Project, TeamInvitation
+
+
+class WorkListQueryCountTests(TestCase):
+    """
+    The project and invitation lists nest owners, members, senders and recipients.
+    Listing them must take the same number of queries however many rows there are.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='owner@example.com', full_name='Owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_projects(self, count, start=0):
+        for i in range(start, start + count):
+            sender = CustomUser.objects.create_user(email=f'host{i}@example.com', full_name=f'Host {i}')
+            owned = Project.objects.create(user=self.user, name=f'Owned {i}', description='')
+            shared = Project.objects.create(user=sender, name=f'Shared {i}', description='')
+            for j in range(3):
+                member = CustomUser.objects.create_user(email=f'member{i}-{j}@example.com', full_name=f'Member {i} {j}')
+                owned.members.add(member)
+                shared.members.add(member)
+            shared.members.add(self.user)
+            TeamInvitation.objects.create(project=shared, sender=sender, recipient=self.user, recipient_email=self.user.email)
+
+    def test_project_list_query_count_is_constant(self):
+        self.create_projects(1)
+        # Projects and their prefetched members; the owner is joined in
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/work/projects/')
+        self.assertEqual(len(response.data), 2)
+
+        self.create_projects(10, start=1)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/work/projects/')
+        self.assertEqual(len(response.data), 22)
+        self.assertTrue(all(len(project['members']) >= 3 for project in response.data))
+
+    def test_invitation_list_query_count_is_constant(self):
+        self.create_projects(1)
+        # Invitations with sender, recipient and project owner joined, then project members
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/work/invitations/', {'include_sent': 'true'})
+        self.assertEqual(len(response.data), 1)
+
+        self.create_projects(10, start=1)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/work/invitations/', {'include_sent': 'true'})
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(response.data[0]['project']['owner']['email'], 'host10@example.com')
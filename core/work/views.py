@@ -271,12 +271,15 @@ User = get_user_model()
 class ProjectViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ProjectSerializer
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
+        # Load owners and members with the projects so serializing a list takes
+        # a fixed number of queries instead of two per project
         return Project.objects.filter(
             models.Q(user=self.request.user) |
             models.Q(members=self.request.user)
-        ).distinct()
+        ).distinct().select_related('user').prefetch_related('members')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -452,48 +455,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            # Get all users associated with the project (owner and members)
-            project_users = list(project.members.all())
-            project_users.append(project.user)
-
-            # Delete all notifications related to this project for all users
-            try:
-                from notifications.models import Notification
-                from django.db.models import Q
-
-                # First, delete notifications where source_id matches the project ID
-                direct_notifications_deleted, _ = Notification.objects.filter(
-                    source_id=project.id).delete()
-
-                # Next, delete invitation notifications that mention this project's name
-                invitation_notifications_deleted, _ = Notification.objects.filter(
-                    Q(notification_type='invitation_accepted') |
-                    Q(notification_type='invitation_rejected'),
-                    Q(message__contains=f"project '{project.name}'")).delete()
-
-                # Also delete notifications for invitations related to this project
-                project_invitations = project.invitations.all()
-                invitation_ids = [inv.id for inv in project_invitations]
-
-                if invitation_ids:
-                    inv_source_notifications_deleted, _ = Notification.objects.filter(
-                        Q(source_id__in=invitation_ids),
-                        Q(notification_type='invitation_accepted') |
-                        Q(notification_type='invitation_rejected')).delete()
-                else:
-                    inv_source_notifications_deleted = 0
-
-                total_deleted = direct_notifications_deleted + invitation_notifications_deleted + inv_source_notifications_deleted
-                logger.info(f"{total_deleted} notifications deleted for project {project.id} ({project.name})")
-                logger.info(f"  - Direct: {direct_notifications_deleted}")
-                logger.info(f"  - By message: {invitation_notifications_deleted}")
-                logger.info(f"  - By invitation source: {inv_source_notifications_deleted}")
-            except Exception as notification_error:
-                logger.error(f"Error deleting project notifications: {str(notification_error)}", exc_info=True)
-                # Continue with project deletion even if notification deletion fails
-
-            # Perform the standard delete operation
+            # Notifications about the project and its invitations reference them by
+            # foreign key, so they are removed by the delete cascade
+            project_id = project.id
             project.delete()
+            logger.info(f"Project {project_id} ({project.name}) deleted with its notifications")
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -517,39 +483,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
         try:
             from notifications.models import Notification
 
-            from django.db.models import Q
-
-            # First, delete notifications for the user who is leaving
-            user_notifications_deleted, _ = Notification.objects.filter(
-                user=request.user, source_id=project.id).delete()
-            logger.info(f"{user_notifications_deleted} notifications deleted for user {request.user.id} in project {project.id}")
-
-            # Also delete any invitation notifications related to this project and user
-            # This ensures that invitation notifications are also cleaned up
-            invitation_notifications_deleted, _ = Notification.objects.filter(
-                Q(notification_type='invitation_accepted') |
-                Q(notification_type='invitation_rejected'),
-                Q(user=request.user),
-                Q(message__contains=f"project '{project.name}'")).delete()
-
-            # Also delete notifications for invitations related to this project for this user
-            project_invitations = project.invitations.filter(
-                Q(sender=request.user) | Q(recipient=request.user)
-            )
-            invitation_ids = [inv.id for inv in project_invitations]
-
-            if invitation_ids:
-                inv_source_notifications_deleted, _ = Notification.objects.filter(
-                    Q(source_id__in=invitation_ids),
-                    Q(user=request.user),
-                    Q(notification_type='invitation_accepted') |
-                    Q(notification_type='invitation_rejected')).delete()
-
-                if inv_source_notifications_deleted > 0:
-                    logger.info(f"{inv_source_notifications_deleted} invitation source notifications deleted for user {request.user.id} in project {project.id}")
-
-            if invitation_notifications_deleted > 0:
-                logger.info(f"{invitation_notifications_deleted} invitation notifications deleted for user {request.user.id} in project {project.id}")
+            # Delete the leaving user's notifications about this project
+            notifications_deleted, _ = Notification.objects.filter(
+                user=request.user, project=project).delete()
+            logger.info(f"{notifications_deleted} notifications deleted for user {request.user.id} in project {project.id}")
 
             project.members.remove(request.user)
             logger.info(f"User {request.user.id} left project {project.id}")
@@ -570,21 +507,25 @@ class ProjectViewSet(viewsets.ModelViewSet):
 class TeamInvitationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = TeamInvitationSerializer
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         include_sent = self.request.query_params.get('include_sent', 'false').lower() == 'true'
 
         if include_sent:
             # Return all invitations where the user is either sender or recipient
-            return TeamInvitation.objects.filter(
+            queryset = TeamInvitation.objects.filter(
                 models.Q(recipient=self.request.user) |
                 models.Q(sender=self.request.user)
-            ).order_by('-created_at')
+            )
         else:
             # Return only invitations where the user is the recipient
-            return TeamInvitation.objects.filter(
-                recipient=self.request.user
-            ).order_by('-created_at')
+            queryset = TeamInvitation.objects.filter(recipient=self.request.user)
+
+        # Each invitation nests its sender, recipient and full project (owner and members)
+        return queryset.select_related(
+            'sender', 'recipient', 'project__user'
+        ).prefetch_related('project__members').order_by(*self.ordering)
 
     @action(detail=True, methods=['post'])
     def respond(self, request, pk=None):
@@ -651,35 +592,7 @@ class TeamInvitationViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Delete any notifications related to this invitation
-            try:
-                from notifications.models import Notification
-                from django.db.models import Q
-
-                # Delete notifications where source_id matches the invitation ID
-                source_notifications_deleted, _ = Notification.objects.filter(
-                    Q(notification_type='invitation_accepted') |
-                    Q(notification_type='invitation_rejected'),
-                    Q(source_id=invitation.id)).delete()
-
-                # Also delete notifications that mention this project
-                project_name = invitation.project.name
-                message_notifications_deleted, _ = Notification.objects.filter(
-                    Q(notification_type='invitation_accepted') |
-                    Q(notification_type='invitation_rejected'),
-                    Q(message__contains=f"project '{project_name}'"),
-                    Q(user=invitation.sender) | Q(user=invitation.recipient)).delete()
-
-                total_deleted = source_notifications_deleted + message_notifications_deleted
-
-                if total_deleted > 0:
-                    logger.info(f"{total_deleted} invitation notifications deleted for invitation {pk}")
-                    logger.info(f"  - By source: {source_notifications_deleted}")
-                    logger.info(f"  - By message: {message_notifications_deleted}")
-            except Exception as notification_error:
-                logger.error(f"Error deleting invitation notifications: {str(notification_error)}", exc_info=True)
-                # Continue with invitation deletion even if notification deletion fails
-
+            # Notifications about this invitation are removed by the delete cascade
             invitation.delete()
             logger.info(f"Invitation {pk} deleted by user {request.user.id}")
             return Response(
@@ -317,6 +317,8 @@ class NotificationService {
             type = NotificationType.goalReminder;
             break;
           case 'task_due':
+          // Reminders of a goal's tasks; the server keeps them apart from plain tasks
+          case 'goal_task_due':
             type = NotificationType.taskDue;
             break;
           case 'invitation_accepted':